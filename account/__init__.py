@@ -8,5 +8,11 @@ class Gender(models.TextChoices):
     OTHER = "other"
 
 
+class DevicePlatform(models.TextChoices):
+    ANDROID = "android"
+    IOS = "ios"
+    WEB = "web"
+
+
 class AccountErrorCode(CoreErrorCode):
     INACTIVE = "inactive"
@@ -0,0 +1,107 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from base.db.pool import PooledDatabaseWrapperMixin, close_pools
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from ...models import Salon
+
+MODES = {
+    "close": {"CONN_MAX_AGE": 0, "POOL_SIZE": 0},
+    "persistent": {"CONN_MAX_AGE": 60, "POOL_SIZE": 0},
+    "pool": {"CONN_MAX_AGE": 0, "POOL_SIZE": None},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks the per-request latency of a salon list query with "
+        "connections closed after each request, persistent connections and the "
+        "in-process pool. --connect-latency adds a delay to every new "
+        "connection, standing in for the TLS and auth handshake of a remote "
+        "MySQL server."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="per thread")
+        parser.add_argument("--threads", type=int, default=4)
+        parser.add_argument(
+            "--connect-latency", type=float, default=20, help="ms per new connection"
+        )
+        parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+
+    def handle(self, *args, **options):
+        wrapper_class = type(connections[DEFAULT_DB_ALIAS])
+        if not issubclass(wrapper_class, PooledDatabaseWrapperMixin):
+            raise CommandError(
+                "The default database must use a base.db.backends engine"
+            )
+        mro = wrapper_class.__mro__
+        backend_class = mro[mro.index(PooledDatabaseWrapperMixin) + 1]
+        get_new_connection = backend_class.get_new_connection
+        latency = options["connect_latency"] / 1000
+        connects = []
+
+        def slow_get_new_connection(wrapper, conn_params):
+            connects.append(1)
+            time.sleep(latency)
+            return get_new_connection(wrapper, conn_params)
+
+        settings_dict = connections.databases[DEFAULT_DB_ALIAS]
+        original = dict(settings_dict)
+        connections.close_all()
+        backend_class.get_new_connection = slow_get_new_connection
+        try:
+            for mode in options["modes"]:
+                settings_dict.update(MODES[mode])
+                if mode == "pool":
+                    settings_dict["POOL_SIZE"] = options["threads"]
+                connects.clear()
+                timings = self.run(options["threads"], options["requests"])
+                timings.sort()
+                self.stdout.write(
+                    "%-10s %s requests: mean %.2fms, p50 %.2fms, p95 %.2fms, "
+                    "%s connections opened"
+                    % (
+                        mode,
+                        len(timings),
+                        statistics.mean(timings) * 1000,
+                        statistics.median(timings) * 1000,
+                        timings[int(len(timings) * 0.95) - 1] * 1000,
+                        len(connects),
+                    )
+                )
+                close_pools()
+        finally:
+            backend_class.get_new_connection = get_new_connection
+            settings_dict.clear()
+            settings_dict.update(original)
+
+    def run(self, threads, requests):
+        timings = []
+        lock = threading.Lock()
+
+        def worker():
+            local = []
+            try:
+                for _ in range(requests):
+                    started = time.perf_counter()
+                    # The signals drive Django's connection handling as the
+                    # request handler does
+                    request_started.send(sender=self.__class__)
+                    list(Salon.objects.order_by("-created_at")[:20])
+                    request_finished.send(sender=self.__class__)
+                    local.append(time.perf_counter() - started)
+            finally:
+                connections.close_all()
+            with lock:
+                timings.extend(local)
+
+        with ThreadPoolExecutor(threads) as executor:
+            for future in [executor.submit(worker) for _ in range(threads)]:
+                future.result()
+        return timings
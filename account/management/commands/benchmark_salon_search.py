@@ -0,0 +1,87 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIClient
+
+from ...models import Address, Salon, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks the nearby salon search on randomly placed salons. The "
+        "salons are created in a transaction that is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--salons", type=int, default=20000)
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--radius", type=float, default=5, help="km")
+        parser.add_argument(
+            "--center",
+            default="10.7769,106.7009",
+            help="lat,lng around which the salons are placed",
+        )
+        parser.add_argument(
+            "--spread", type=float, default=0.5, help="degrees around the center"
+        )
+
+    def handle(self, *args, **options):
+        lat, lng = (float(part) for part in options["center"].split(","))
+        spread = options["spread"]
+        with transaction.atomic():
+            self.create_salons(options["salons"], lat, lng, spread)
+            client = APIClient()
+            client.force_authenticate(
+                User.objects.create(username="benchmark", email="benchmark@local")
+            )
+            timings = []
+            results = 0
+            for _ in range(options["queries"]):
+                near = "%s,%s" % (
+                    lat + random.uniform(-spread, spread),
+                    lng + random.uniform(-spread, spread),
+                )
+                started = time.perf_counter()
+                response = client.get(
+                    "/salons/", {"near": near, "radius": options["radius"]}
+                )
+                timings.append(time.perf_counter() - started)
+                results += len(response.data["data"] or [])
+            transaction.set_rollback(True)
+
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        self.stdout.write(
+            "%s salons, %s queries, %.1f salons per page: "
+            "p50 %.1fms, p95 %.1fms, max %.1fms"
+            % (
+                options["salons"],
+                len(timings),
+                results / len(timings),
+                statistics.median(timings) * 1000,
+                p95 * 1000,
+                timings[-1] * 1000,
+            )
+        )
+
+    def create_salons(self, count, lat, lng, spread):
+        addresses = Address.objects.bulk_create(
+            Address(
+                address="benchmark",
+                lat=lat + random.uniform(-spread, spread),
+                lng=lng + random.uniform(-spread, spread),
+            )
+            for _ in range(count)
+        )
+        for i, address in enumerate(addresses):
+            # Multi-table inheritance rules out bulk_create
+            Salon.objects.create(
+                username="benchmark-salon-%s" % i,
+                email="benchmark-salon-%s@local" % i,
+                salon_name="Benchmark salon %s" % i,
+                address=address,
+                is_salon=True,
+            )
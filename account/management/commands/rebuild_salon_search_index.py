@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from ...models import Salon
+from ...services.search import index_salon
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the salon search index from the salons' searchable fields"
+
+    def handle(self, *args, **options):
+        indexed = 0
+        for salon in Salon.objects.all().order_by().iterator():
+            index_salon(salon)
+            indexed += 1
+        self.stdout.write("Indexed %s salons" % indexed)
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from ...models import Address
+from ...services.maps import resolve_address_position
+
+
+class Command(BaseCommand):
+    help = (
+        "Resolves the coordinates of addresses whose Google Maps link was not "
+        "resolved yet, e.g. because the background resolution failed"
+    )
+
+    def handle(self, *args, **options):
+        address_ids = list(
+            Address.objects.filter(position_url__isnull=False, lat__isnull=True)
+            .exclude(position_url="")
+            .values_list("id", flat=True)
+        )
+        for address_id in address_ids:
+            resolve_address_position(address_id)
+        resolved = Address.objects.filter(id__in=address_ids, lat__isnull=False).count()
+        self.stdout.write("Resolved %s of %s addresses" % (resolved, len(address_ids)))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from ...models import DeviceToken
+from ...services.firebase import validate_device_tokens
+
+
+class Command(BaseCommand):
+    help = (
+        "Validates stored FCM tokens against FCM and invalidates the stale ones. "
+        "Meant to run periodically, e.g. from a scheduler."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of tokens validated per batch",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Also validate tokens that were validated recently",
+        )
+
+    def handle(self, *args, **options):
+        queryset = DeviceToken.objects.valid()
+        if not options["force"]:
+            queryset = queryset.needs_validation()
+        queryset = queryset.order_by("id").only("id", "token")
+        checked = invalidated = 0
+        last_id = None
+        while True:
+            batch = queryset
+            if last_id:
+                batch = batch.filter(id__gt=last_id)
+            batch = list(batch[: options["batch_size"]])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            checked += len(batch)
+            invalidated += len(validate_device_tokens(batch))
+        self.stdout.write(
+            "Checked %s FCM tokens, invalidated %s" % (checked, invalidated)
+        )
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.12 on 2026-10-18 13:58
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0021_salon_total_reviews'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salon',
+            name='closing_time',
+            field=models.TimeField(default=datetime.time(20, 0), help_text='Giờ đóng cửa (giờ địa phương)'),
+        ),
+        migrations.AddField(
+            model_name='salon',
+            name='opening_time',
+            field=models.TimeField(default=datetime.time(8, 0), help_text='Giờ mở cửa (giờ địa phương)'),
+        ),
+    ]
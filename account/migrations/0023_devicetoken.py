@@ -0,0 +1,36 @@
+# Generated by Django 3.2.12 on 2026-10-18 14:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0022_auto_20261018_1358'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceToken',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('token', models.CharField(max_length=255, unique=True)),
+                ('platform', models.CharField(blank=True, choices=[('android', 'Android'), ('ios', 'Ios'), ('web', 'Web')], max_length=16, null=True)),
+                ('last_seen', models.DateTimeField(default=django.utils.timezone.now)),
+                ('invalidated_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='device_tokens', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ('-last_seen',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='devicetoken',
+            index=models.Index(fields=['user', 'last_seen'], name='account_dev_user_id_38db19_idx'),
+        ),
+    ]
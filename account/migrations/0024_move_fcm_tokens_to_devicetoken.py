@@ -0,0 +1,67 @@
+# Generated by Django 3.2.12 on 2026-10-18 14:20
+
+import datetime
+
+from django.conf import settings
+from django.db import migrations
+from django.utils import timezone
+
+
+def move_fcm_tokens_to_devicetoken(apps, schema_editor):
+    BaseUser = apps.get_model("account", "BaseUser")
+    DeviceToken = apps.get_model("account", "DeviceToken")
+    now = timezone.now()
+    seen_tokens = set()
+    for user in BaseUser.objects.exclude(private_metadata__isnull=True).iterator():
+        metadata = user.private_metadata or {}
+        fcm_tokens = metadata.pop("fcm_tokens", None)
+        if fcm_tokens is None:
+            continue
+        device_tokens = []
+        # The newest token was stored first
+        for fcm_token in fcm_tokens:
+            if not fcm_token or fcm_token in seen_tokens:
+                continue
+            if len(device_tokens) >= settings.FCM_TOKENS_PER_USER_LIMIT:
+                break
+            seen_tokens.add(fcm_token)
+            device_tokens.append(
+                DeviceToken(
+                    user_id=user.id,
+                    token=fcm_token,
+                    last_seen=now - datetime.timedelta(seconds=len(device_tokens)),
+                )
+            )
+        DeviceToken.objects.bulk_create(device_tokens)
+        user.private_metadata = metadata
+        user.save(update_fields=("private_metadata",))
+
+
+def move_devicetoken_to_fcm_tokens(apps, schema_editor):
+    BaseUser = apps.get_model("account", "BaseUser")
+    DeviceToken = apps.get_model("account", "DeviceToken")
+    fcm_tokens = {}
+    for user_id, token in (
+        DeviceToken.objects.filter(invalidated_at__isnull=True)
+        .order_by("user_id", "-last_seen")
+        .values_list("user_id", "token")
+    ):
+        fcm_tokens.setdefault(user_id, []).append(token)
+    for user in BaseUser.objects.filter(id__in=fcm_tokens.keys()).iterator():
+        metadata = user.private_metadata or {}
+        metadata["fcm_tokens"] = fcm_tokens[user.id]
+        user.private_metadata = metadata
+        user.save(update_fields=("private_metadata",))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0023_devicetoken'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            move_fcm_tokens_to_devicetoken, move_devicetoken_to_fcm_tokens
+        ),
+    ]
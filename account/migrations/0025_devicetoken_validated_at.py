@@ -0,0 +1,18 @@
+# Generated by Django 3.2.12 on 2026-10-18 14:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0024_move_fcm_tokens_to_devicetoken'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='devicetoken',
+            name='validated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
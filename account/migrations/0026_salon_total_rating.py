@@ -0,0 +1,38 @@
+# Generated by Django 3.2.12 on 2026-10-18 14:11
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_total_rating(apps, schema_editor):
+    Salon = apps.get_model("account", "Salon")
+    Booking = apps.get_model("booking", "Booking")
+    aggregates = (
+        Booking.objects.filter(rating__isnull=False)
+        .order_by()
+        .values("salon_id")
+        .annotate(count=Count("id"), total=Sum("rating"))
+    )
+    for row in aggregates.iterator():
+        Salon.objects.filter(pk=row["salon_id"]).update(
+            total_reviews=row["count"],
+            total_rating=row["total"],
+            vote_rate=row["total"] / row["count"],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0025_devicetoken_validated_at'),
+        ('booking', '0009_auto_20261018_1407'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salon',
+            name='total_rating',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_total_rating, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.12 on 2026-10-18 14:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0026_salon_total_rating'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='address',
+            index=models.Index(fields=['lat', 'lng'], name='account_add_lat_4cd111_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 3.2.12 on 2026-10-18 14:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from account.services.search import get_salon_terms
+
+
+def build_salon_search_index(apps, schema_editor):
+    Salon = apps.get_model("account", "Salon")
+    SalonSearchTerm = apps.get_model("account", "SalonSearchTerm")
+    for salon in Salon.objects.order_by().iterator():
+        SalonSearchTerm.objects.bulk_create(
+            SalonSearchTerm(salon_id=salon.pk, term=term, weight=weight)
+            for term, weight in get_salon_terms(salon).items()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0027_address_account_add_lat_4cd111_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalonSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.PositiveSmallIntegerField(default=1)),
+                ('salon', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='account.salon')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='salonsearchterm',
+            constraint=models.UniqueConstraint(fields=('term', 'salon'), name='unique_salon_search_term'),
+        ),
+        migrations.RunPython(build_salon_search_index, migrations.RunPython.noop),
+    ]
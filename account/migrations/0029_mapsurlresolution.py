@@ -0,0 +1,24 @@
+# Generated by Django 3.2.12 on 2026-10-18 14:17
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0028_auto_20261018_1415'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MapsUrlResolution',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.CharField(max_length=512, unique=True)),
+                ('lat', models.FloatField()),
+                ('lng', models.FloatField()),
+                ('resolved_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
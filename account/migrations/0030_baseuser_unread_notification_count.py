@@ -0,0 +1,38 @@
+# Generated by Django 3.2.12 on 2026-10-18 14:35
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_unread_notification_count(apps, schema_editor):
+    BaseUser = apps.get_model("account", "BaseUser")
+    ConcatNotification = apps.get_model("notification", "ConcatNotification")
+    counts = (
+        ConcatNotification.objects.filter(unread=True, deleted=False)
+        .order_by()
+        .values("recipient_id")
+        .annotate(count=Count("id"))
+    )
+    for row in counts.iterator():
+        BaseUser.objects.filter(pk=row["recipient_id"]).update(
+            unread_notification_count=row["count"]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0029_mapsurlresolution'),
+        ('notification', '0004_concatnotification_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='baseuser',
+            name='unread_notification_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(
+            backfill_unread_notification_count, migrations.RunPython.noop
+        ),
+    ]
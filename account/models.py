@@ -1,12 +1,15 @@
+import datetime
 from typing import Any
 
 from base.models import ModelWithMetadata, TimeStampedModel
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.contrib.auth.validators import UnicodeUsernameValidator
-from django.db import models
+from django.db import IntegrityError, models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
-from . import Gender
+from . import DevicePlatform, Gender
 
 
 class Address(TimeStampedModel):
@@ -37,6 +40,10 @@ class Address(TimeStampedModel):
         help_text="Url của vị trí trên google map",
     )
 
+    class Meta:
+        # Bounding-box range scans of nearby searches
+        indexes = [models.Index(fields=["lat", "lng"])]
+
     def save(self, *args, **kwargs):
         self.address = (
             self.hamlet + ", " + self.ward + ", " + self.district + ", " + self.province
@@ -81,6 +88,8 @@ class BaseUser(AbstractUser, TimeStampedModel, ModelWithMetadata):
     phone_number = models.CharField(max_length=15, unique=True, null=True, blank=True)
     is_active = models.BooleanField(default=True)
     total_completed_booking = models.PositiveIntegerField(default=0)
+    # Unread, not deleted in-app notifications, kept by notification.models
+    unread_notification_count = models.PositiveIntegerField(default=0)
     is_salon = models.BooleanField(default=False)
     address = models.ForeignKey(
         Address, related_name="+", null=True, blank=True, on_delete=models.SET_NULL
@@ -93,13 +102,15 @@ class BaseUser(AbstractUser, TimeStampedModel, ModelWithMetadata):
 
     @property
     def fcm_tokens(self):
-        return self.get_value_from_private_metadata("fcm_tokens", [])
+        # Reads the prefetched device tokens when available
+        return [
+            device_token.token
+            for device_token in self.device_tokens.all()
+            if device_token.invalidated_at is None
+        ]
 
-    def store_fcm_token(self, fcm_token):
-        fcm_tokens = self.fcm_tokens
-        fcm_tokens.insert(0, fcm_token)
-        self.store_value_in_private_metadata({"fcm_tokens": fcm_tokens})
-        self.save(update_fields=("private_metadata",))
+    def store_fcm_token(self, fcm_token, platform=None):
+        return DeviceToken.objects.register(self, fcm_token, platform)
 
 
 class User(BaseUser):
@@ -115,9 +126,118 @@ class Salon(BaseUser):
     salon_name = models.CharField(max_length=255, unique=True, null=True, blank=True)
     background_image = models.CharField(max_length=256, null=True, blank=True)
     total_reviews = models.IntegerField(default=0)
+    # Sum of all review ratings, vote_rate is total_rating / total_reviews
+    total_rating = models.IntegerField(default=0)
     vote_rate = models.FloatField(blank=True, null=True)
     is_closed = models.BooleanField(default=False)
     description = models.CharField(max_length=512, null=True, blank=True)
+    opening_time = models.TimeField(
+        default=datetime.time(8, 0), help_text="Giờ mở cửa (giờ địa phương)"
+    )
+    closing_time = models.TimeField(
+        default=datetime.time(20, 0), help_text="Giờ đóng cửa (giờ địa phương)"
+    )
 
     class Meta:
         ordering = ("date_joined",)
+
+
+class DeviceTokenQueryset(models.QuerySet):
+    def valid(self):
+        return self.filter(invalidated_at__isnull=True)
+
+    def register(self, user, token, platform=None):
+        """
+        Upserts the FCM token of a device and keeps at most
+        ``FCM_TOKENS_PER_USER_LIMIT`` tokens per user, dropping the least
+        recently seen ones.
+        """
+        if platform not in DevicePlatform.values:
+            platform = None
+        defaults = {
+            "user": user,
+            "platform": platform,
+            "last_seen": timezone.now(),
+            "invalidated_at": None,
+        }
+        try:
+            device_token, _ = self.update_or_create(token=token, defaults=defaults)
+        except IntegrityError:
+            # Inserted concurrently, e.g. by a retried request of the device,
+            # in a transaction the lookup of update_or_create could not see
+            self.filter(token=token).update(**defaults)
+            device_token = self.get(token=token)
+        stale_ids = list(
+            self.filter(user=user)
+            .order_by("-last_seen")
+            .values_list("id", flat=True)[settings.FCM_TOKENS_PER_USER_LIMIT :]
+        )
+        if stale_ids:
+            self.filter(id__in=stale_ids).delete()
+        return device_token
+
+    def needs_validation(self):
+        """
+        Valid tokens that were not checked against FCM within
+        ``FCM_TOKEN_VALIDATION_TTL`` seconds.
+        """
+        fresh_after = timezone.now() - datetime.timedelta(
+            seconds=settings.FCM_TOKEN_VALIDATION_TTL
+        )
+        return self.valid().filter(
+            models.Q(validated_at__isnull=True) | models.Q(validated_at__lt=fresh_after)
+        )
+
+    def invalidate(self, tokens):
+        return self.filter(token__in=tokens, invalidated_at__isnull=True).update(
+            invalidated_at=timezone.now()
+        )
+
+
+class DeviceToken(TimeStampedModel):
+    user = models.ForeignKey(
+        BaseUser, on_delete=models.CASCADE, related_name="device_tokens"
+    )
+    token = models.CharField(max_length=255, unique=True)
+    platform = models.CharField(
+        max_length=16, choices=DevicePlatform.choices, blank=True, null=True
+    )
+    last_seen = models.DateTimeField(default=timezone.now)
+    invalidated_at = models.DateTimeField(blank=True, null=True)
+    validated_at = models.DateTimeField(blank=True, null=True)
+    objects = DeviceTokenQueryset.as_manager()
+
+    class Meta:
+        ordering = ("-last_seen",)
+        indexes = [
+            models.Index(fields=["user", "last_seen"]),
+        ]
+
+
+class SalonSearchTerm(models.Model):
+    """
+    Inverted index of the salon search: one row per salon and folded term,
+    maintained by ``account.services.search``.
+    """
+
+    salon = models.ForeignKey(
+        Salon, on_delete=models.CASCADE, related_name="search_terms"
+    )
+    term = models.CharField(max_length=64)
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["term", "salon"], name="unique_salon_search_term"
+            )
+        ]
+
+
+class MapsUrlResolution(models.Model):
+    """Coordinates of a Google Maps short link, resolved once over the network."""
+
+    url = models.CharField(max_length=512, unique=True)
+    lat = models.FloatField()
+    lng = models.FloatField()
+    resolved_at = models.DateTimeField(default=timezone.now)
@@ -3,6 +3,7 @@ from rest_framework import serializers
 from .address import AddressSerializer, AddressSerializerInput
 from .admin import AdminSerializer
 from .salon import (
+    SalonNearInputSerializer,
     SalonRegisterInputSerializer,
     SalonRegisterSerializer,
     SalonSerializer,
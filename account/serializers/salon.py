@@ -1,6 +1,8 @@
 from account import models
 from account.email import send_otp_to_email
+from base.serializers import EagerLoadingMixin
 from booking import models as booking_models
+from django.conf import settings
 from rest_framework import serializers
 from service.serializers import ServiceSalonSerializer
 
@@ -8,8 +10,12 @@ from .address import AddressSerializerInput
 from .user import UserBaseViewSerializer
 
 
-class SalonSerializer(serializers.ModelSerializer):
+class SalonSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ["address"]
+    prefetch_related_fields = ["services__service"]
+
     services = ServiceSalonSerializer(many=True, read_only=True)
+    distance = serializers.SerializerMethodField()
 
     class Meta:
         model = models.Salon
@@ -34,9 +40,34 @@ class SalonSerializer(serializers.ModelSerializer):
             "is_salon",
             "is_superuser",
             "services",
+            "opening_time",
+            "closing_time",
+            "distance",
         ]
         depth = 1
 
+    def get_distance(self, obj):
+        # Only annotated by nearby searches, in km
+        distance = getattr(obj, "distance", None)
+        return round(distance, 3) if distance is not None else None
+
+
+class SalonNearInputSerializer(serializers.Serializer):
+    near = serializers.CharField()
+    radius = serializers.FloatField(min_value=0, required=False)
+
+    def validate_near(self, value):
+        try:
+            lat, lng = (float(part) for part in value.split(","))
+        except ValueError:
+            raise serializers.ValidationError("Must be in the format lat,lng")
+        if not -90 <= lat <= 90 or not -180 <= lng <= 180:
+            raise serializers.ValidationError("Coordinates are out of range")
+        return lat, lng
+
+    def validate_radius(self, value):
+        return min(value, settings.SALON_SEARCH_MAX_RADIUS)
+
 
 class SalonBaseViewSerializer(serializers.ModelSerializer):
     class Meta:
@@ -112,7 +143,9 @@ class SalonRegisterSerializer(serializers.ModelSerializer):
         depth = 2
 
 
-class SalonReviewSerializer(serializers.ModelSerializer):
+class SalonReviewSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ["user__address"]
+
     user = UserBaseViewSerializer(read_only=True)
 
     class Meta:
@@ -1,9 +1,12 @@
 from account import models
 from account.email import send_otp_to_email
+from base.serializers import EagerLoadingMixin
 from rest_framework import serializers
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ["address"]
+
     class Meta:
         model = models.User
         fields = [
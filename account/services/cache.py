@@ -0,0 +1,165 @@
+import functools
+import hashlib
+import time
+import uuid
+
+from base import routers
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+KEY_PREFIX = "salon-response"
+# Bumped when shared data embedded in every salon response changes, e.g. a
+# service name
+GLOBAL_VERSION_KEY = KEY_PREFIX + ":version"
+# Bumped on any salon change, for the salon list
+LIST_VERSION_KEY = KEY_PREFIX + ":list:version"
+# Response headers replayed from the cache
+CACHED_HEADERS = ("X-Next-Cursor", "Link")
+
+
+def is_enabled():
+    """The cache is only used when shared by all processes, see settings."""
+    return settings.SALON_RESPONSE_CACHE_TIMEOUT > 0
+
+
+def _version_key(salon_id):
+    return "%s:%s:version" % (KEY_PREFIX, salon_id)
+
+
+def _new_version():
+    # Time based rather than a counter, so a version evicted from the cache
+    # can never come back with a value cached responses were keyed with
+    return time.time_ns()
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def get_salon_version(salon_id):
+    """Changes whenever a response about the salon may change."""
+    return "%s.%s" % (
+        _get_version(GLOBAL_VERSION_KEY),
+        _get_version(_version_key(salon_id)),
+    )
+
+
+def get_list_version():
+    """Changes whenever any salon changes."""
+    return "%s.%s" % (
+        _get_version(GLOBAL_VERSION_KEY),
+        _get_version(LIST_VERSION_KEY),
+    )
+
+
+def is_recent(version):
+    """
+    Whether the version was bumped so recently that the replicas may not have
+    the write behind it yet.
+    """
+    changed_at = max(int(part) for part in version.split(".")) / 1e9
+    return time.time() - changed_at < settings.REPLICA_PIN_SECONDS
+
+
+def get_response_key(name, salon_id, request):
+    url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    return "%s:%s:%s:%s:%s" % (
+        KEY_PREFIX,
+        salon_id,
+        get_salon_version(salon_id),
+        name,
+        url,
+    )
+
+
+def invalidate_salons(salon_ids):
+    """
+    Drops the cached responses of the salons once the current transaction
+    commits, so a concurrent read can not cache the state before the commit.
+    """
+    keys = [_version_key(salon_id) for salon_id in set(salon_ids) if salon_id]
+    if keys:
+        keys.append(LIST_VERSION_KEY)
+        transaction.on_commit(
+            lambda: cache.set_many(dict.fromkeys(keys, _new_version()), None)
+        )
+
+
+def invalidate_all_salons():
+    transaction.on_commit(lambda: cache.set(GLOBAL_VERSION_KEY, _new_version(), None))
+
+
+def _count(name, outcome):
+    key = "%s:stats:%s:%s" % (KEY_PREFIX, name, outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def get_stats(names):
+    """Returns the hit and miss counts of the cached responses by name."""
+    stats = {}
+    for name in names:
+        hits = cache.get("%s:stats:%s:hits" % (KEY_PREFIX, name), 0)
+        misses = cache.get("%s:stats:%s:misses" % (KEY_PREFIX, name), 0)
+        total = hits + misses
+        stats[name] = {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 3) if total else None,
+        }
+    return stats
+
+
+def cache_salon_response(name):
+    """
+    Caches successful GET responses of a salon detail route for
+    ``SALON_RESPONSE_CACHE_TIMEOUT`` seconds, keyed by the salon's cache
+    version and the full url. Responses must not depend on the requester.
+    """
+
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        def wrapper(view, request, *args, **kwargs):
+            try:
+                salon_id = uuid.UUID(str(kwargs.get("pk")))
+            except ValueError:
+                salon_id = None
+            if salon_id is None or request.method != "GET" or not is_enabled():
+                return view_func(view, request, *args, **kwargs)
+            if view.check_not_modified():
+                return Response()
+
+            key = get_response_key(name, salon_id, request)
+            cached = cache.get(key)
+            if cached is not None:
+                _count(name, "hits")
+                return Response(cached["data"], headers=cached["headers"])
+            _count(name, "misses")
+            response = view_func(view, request, *args, **kwargs)
+            # A lagging replica could cache the state before the last write
+            stale = routers.get_replica() and is_recent(get_salon_version(salon_id))
+            if response.status_code == 200 and not stale:
+                headers = {
+                    header: response[header]
+                    for header in CACHED_HEADERS
+                    if response.has_header(header)
+                }
+                cache.set(
+                    key,
+                    {"data": response.data, "headers": headers},
+                    settings.SALON_RESPONSE_CACHE_TIMEOUT,
+                )
+            return response
+
+        return wrapper
+
+    return decorator
@@ -1,12 +1,26 @@
-from base.firebase import check_fcm_token_valid
+from base.firebase import send_multicast_batched
+from django.utils import timezone
 
+from ..models import DeviceToken
 
-def clean_up_user_fcm_tokens(user):
-    fcm_tokens = user.fcm_tokens
-    valid_fcm_tokens = []
-    for fcm_token in fcm_tokens:
-        if check_fcm_token_valid(fcm_token):
-            valid_fcm_tokens.append(fcm_token)
-    user.store_value_in_private_metadata({"fcm_tokens": valid_fcm_tokens})
-    user.save(update_fields=("private_metadata",))
-    return fcm_tokens != valid_fcm_tokens
+
+def validate_device_tokens(device_tokens):
+    """
+    Checks the tokens against FCM with batched dry-run sends. Tokens FCM no
+    longer knows are invalidated, the others are stamped as validated so later
+    checks skip them until ``FCM_TOKEN_VALIDATION_TTL`` expires.
+    :return: The invalidated tokens.
+    """
+    tokens = [device_token.token for device_token in device_tokens]
+    if not tokens:
+        return []
+    results = send_multicast_batched(tokens, dry_run=True)
+    valid_tokens = [result.token for result in results if result.success]
+    invalid_tokens = [result.token for result in results if result.is_invalid_token]
+    if valid_tokens:
+        DeviceToken.objects.filter(token__in=valid_tokens).update(
+            validated_at=timezone.now()
+        )
+    if invalid_tokens:
+        DeviceToken.objects.invalidate(invalid_tokens)
+    return invalid_tokens
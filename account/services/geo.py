@@ -0,0 +1,53 @@
+import math
+
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def get_bounding_box(lat: float, lng: float, radius: float):
+    """
+    Returns ``(min_lat, max_lat, min_lng, max_lng)`` of a box containing the
+    circle of ``radius`` km around the point. The longitude bounds are None
+    when the box reaches a pole or crosses the antimeridian.
+    """
+    delta_lat = math.degrees(radius / EARTH_RADIUS_KM)
+    min_lat, max_lat = lat - delta_lat, lat + delta_lat
+    if min_lat <= -90 or max_lat >= 90:
+        return max(min_lat, -90), min(max_lat, 90), None, None
+    delta_lng = math.degrees(
+        math.asin(math.sin(radius / EARTH_RADIUS_KM) / math.cos(math.radians(lat)))
+    )
+    min_lng, max_lng = lng - delta_lng, lng + delta_lng
+    if min_lng < -180 or max_lng > 180:
+        return min_lat, max_lat, None, None
+    return min_lat, max_lat, min_lng, max_lng
+
+
+def haversine_distance(lat: float, lng: float, lat_field="lat", lng_field="lng"):
+    """Database expression of the great-circle distance (km) to the point."""
+    lat1 = Radians(Value(lat, output_field=FloatField()))
+    lat2 = Radians(F(lat_field))
+    half_dlat = Radians(F(lat_field) - lat) / 2
+    half_dlng = Radians(F(lng_field) - lng) / 2
+    a = Power(Sin(half_dlat), 2) + Cos(lat1) * Cos(lat2) * Power(Sin(half_dlng), 2)
+    return 2 * EARTH_RADIUS_KM * ASin(Sqrt(a))
+
+
+def filter_near(queryset, lat: float, lng: float, radius: float, prefix=""):
+    """
+    Filters ``queryset`` to the rows whose ``<prefix>lat``/``<prefix>lng`` lie
+    within ``radius`` km of the point and annotates their ``distance``.
+
+    The bounding box is an index range scan on (lat, lng); the exact haversine
+    distance is only evaluated for the rows inside it.
+    """
+    lat_field, lng_field = prefix + "lat", prefix + "lng"
+    min_lat, max_lat, min_lng, max_lng = get_bounding_box(lat, lng, radius)
+    queryset = queryset.filter(**{lat_field + "__range": (min_lat, max_lat)})
+    if min_lng is not None:
+        queryset = queryset.filter(**{lng_field + "__range": (min_lng, max_lng)})
+    return queryset.annotate(
+        distance=haversine_distance(lat, lng, lat_field, lng_field)
+    ).filter(distance__lte=radius)
@@ -0,0 +1,158 @@
+import functools
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote, urlparse
+
+import requests
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from requests.adapters import HTTPAdapter
+
+from ..models import Address, MapsUrlResolution, Salon
+from .cache import invalidate_salons
+
+logger = logging.getLogger(__name__)
+
+# Short links only redirect to the full URL, which holds the coordinates
+SHORT_URL_HOSTS = {"goo.gl", "maps.app.goo.gl", "g.co"}
+
+# Most precise first: the place pin, then the query, then the viewport center
+POSITION_PATTERNS = [
+    re.compile(r"!3d(-?\d+(?:\.\d+)?)!4d(-?\d+(?:\.\d+)?)"),
+    re.compile(
+        r"[?&](?:q|query|ll|center|destination)=(-?\d+(?:\.\d+)?),\s*(-?\d+(?:\.\d+)?)"
+    ),
+    re.compile(r"@(-?\d+(?:\.\d+)?),(-?\d+(?:\.\d+)?)"),
+]
+
+_session = None
+_executor = None
+_lock = threading.Lock()
+
+
+def parse_position(url: str):
+    """
+    Extracts ``(lat, lng)`` from a full Google Maps URL without any network
+    call, or returns None when the URL holds no coordinates.
+    """
+    if not url:
+        return None
+    url = unquote(url)
+    for pattern in POSITION_PATTERNS:
+        match = pattern.search(url)
+        if match:
+            lat, lng = float(match.group(1)), float(match.group(2))
+            if -90 <= lat <= 90 and -180 <= lng <= 180:
+                return lat, lng
+    return None
+
+
+def is_short_url(url: str) -> bool:
+    return urlparse(url).hostname in SHORT_URL_HOSTS
+
+
+def get_session():
+    """Returns the process-wide HTTP session, so connections are pooled."""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_maxsize=settings.MAPS_RESOLVE_WORKERS)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def get_origin_url(url: str) -> str:
+    resp = get_session().head(
+        url, allow_redirects=True, timeout=settings.MAPS_RESOLVE_TIMEOUT
+    )
+    return resp.url
+
+
+@functools.lru_cache(maxsize=settings.MAPS_RESOLVE_CACHE_SIZE)
+def _resolve_short_url(url: str):
+    # Failures raise, so they are not cached
+    resolution = MapsUrlResolution.objects.filter(url=url).first()
+    if resolution:
+        return resolution.lat, resolution.lng
+    position = parse_position(get_origin_url(url))
+    if position is None:
+        raise ValueError("No coordinates in the Google Maps link %s" % url)
+    MapsUrlResolution.objects.update_or_create(
+        url=url, defaults={"lat": position[0], "lng": position[1]}
+    )
+    return position
+
+
+def get_position(url: str, resolve=True):
+    """
+    Returns ``(lat, lng)`` of a Google Maps URL. Full URLs are parsed locally;
+    short links are resolved through the in-process LRU cache, then the
+    ``MapsUrlResolution`` table and only then the network when ``resolve``.
+    Returns None when the position can not be found.
+    """
+    position = parse_position(url)
+    if position or not url or not is_short_url(url):
+        return position
+    if not resolve:
+        resolution = MapsUrlResolution.objects.filter(url=url).first()
+        return (resolution.lat, resolution.lng) if resolution else None
+    try:
+        return _resolve_short_url(url)
+    except Exception as e:
+        logger.warning("Could not resolve Google Maps link %s: %s", url, e)
+        return None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.MAPS_RESOLVE_WORKERS,
+                    thread_name_prefix="maps-resolve",
+                )
+    return _executor
+
+
+def resolve_address_position(address_id):
+    """Resolves the position of an address whose link needs the network."""
+    close_old_connections()
+    try:
+        address = Address.objects.filter(id=address_id).first()
+        if not address or not address.position_url:
+            return
+        position = get_position(address.position_url)
+        if position:
+            # Skipped if the link was changed in the meantime
+            Address.objects.filter(
+                id=address_id, position_url=address.position_url
+            ).update(lat=position[0], lng=position[1])
+            invalidate_salons(
+                Salon.objects.filter(address_id=address_id).values_list("pk", flat=True)
+            )
+    finally:
+        close_old_connections()
+
+
+def set_address_position(address):
+    """
+    Sets ``lat``/``lng`` of ``address`` from its ``position_url`` when this
+    needs no network call. Otherwise they are cleared and resolved by a
+    background thread once the current transaction commits, so the request
+    does not wait on Google. The caller saves ``address``.
+    """
+    position = get_position(address.position_url, resolve=False)
+    if position or not address.position_url:
+        address.lat, address.lng = position or (None, None)
+        return
+    address.lat = address.lng = None
+    transaction.on_commit(
+        lambda: _get_executor().submit(resolve_address_position, address.id)
+    )
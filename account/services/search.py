@@ -0,0 +1,133 @@
+import operator
+import re
+import unicodedata
+from functools import reduce
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Max, Q, When
+
+from ..models import SalonSearchTerm
+
+# Relative weight of a match in each searchable field of a salon
+SEARCH_FIELD_WEIGHTS = {
+    "salon_name": 3,
+    "username": 2,
+    "first_name": 2,
+    "last_name": 2,
+    "email": 1,
+    "phone_number": 1,
+}
+TERM_MAX_LENGTH = 64
+# Query terms beyond this are ignored, each one adds a join condition
+QUERY_MAX_TERMS = 5
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def fold(text: str) -> str:
+    """Lowercases and strips diacritics, e.g. "Đường Hoà" -> "duong hoa"."""
+    text = text.lower().replace("đ", "d")
+    return "".join(
+        char
+        for char in unicodedata.normalize("NFKD", text)
+        if not unicodedata.combining(char)
+    )
+
+
+def tokenize(text) -> list:
+    if not text:
+        return []
+    return [token[:TERM_MAX_LENGTH] for token in TOKEN_RE.findall(fold(str(text)))]
+
+
+def get_salon_terms(salon) -> dict:
+    """Returns the weight of every term of the salon's searchable fields."""
+    terms = {}
+    for field, weight in SEARCH_FIELD_WEIGHTS.items():
+        for term in tokenize(getattr(salon, field)):
+            terms[term] = max(terms.get(term, 0), weight)
+    return terms
+
+
+@transaction.atomic
+def index_salon(salon):
+    SalonSearchTerm.objects.filter(salon_id=salon.pk).delete()
+    SalonSearchTerm.objects.bulk_create(
+        SalonSearchTerm(salon_id=salon.pk, term=term, weight=weight)
+        for term, weight in get_salon_terms(salon).items()
+    )
+
+
+TERM_ALPHABET = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+def _prefix_successor(prefix: str):
+    """
+    Returns the smallest string above every term starting with ``prefix``,
+    or None. Terms only hold TERM_ALPHABET, whose order is the same under a
+    binary and a case-insensitive collation, so the bound holds on any backend.
+    """
+    while prefix:
+        position = TERM_ALPHABET.index(prefix[-1]) + 1
+        if position < len(TERM_ALPHABET):
+            return prefix[:-1] + TERM_ALPHABET[position]
+        prefix = prefix[:-1]
+    return None
+
+
+def _prefix_match(prefix: str, field: str = "term") -> Q:
+    # Terms are folded to lowercase, so the case-insensitive LIKE 'prefix%'
+    # matches exactly; it follows the column collation and is a range scan
+    # on MySQL, where startswith (LIKE BINARY) is not. The explicit bounds
+    # give the range to backends whose LIKE can not use the index (SQLite).
+    match = Q(**{"%s__istartswith" % field: prefix, "%s__gte" % field: prefix})
+    successor = _prefix_successor(prefix)
+    if successor:
+        match &= Q(**{"%s__lt" % field: successor})
+    return match
+
+
+def search_salons(queryset, query: str):
+    """
+    Filters ``queryset`` to the salons having, for every term of ``query``, a
+    term starting with it, and annotates their ``rank``: the sum over the
+    query terms of the weight of the best matching term, doubled for exact
+    matches.
+
+    The salons are joined to their matching terms once and grouped, the
+    terms being found on the (term, salon) index.
+
+    :return: The filtered queryset, or ``queryset`` untouched when the query
+        has no searchable term.
+    """
+    query_terms = list(dict.fromkeys(tokenize(query)))[:QUERY_MAX_TERMS]
+    if not query_terms:
+        return queryset
+    # The terms are read through an alias rather than lookups in the When
+    # clauses, which would turn the join into a LEFT JOIN the database has
+    # to drive from the salon table
+    salons = queryset.filter(
+        Q(
+            *(_prefix_match(term, "search_terms__term") for term in query_terms),
+            _connector=Q.OR,
+        )
+    ).alias(
+        search_term=F("search_terms__term"), search_weight=F("search_terms__weight")
+    )
+    term_ranks = {
+        "term_rank_%s"
+        % i: Max(
+            Case(
+                When(search_term=term, then=F("search_weight") * 2),
+                When(_prefix_match(term, "search_term"), then=F("search_weight")),
+                default=0,
+                output_field=IntegerField(),
+            )
+        )
+        for i, term in enumerate(query_terms)
+    }
+    return (
+        salons.annotate(**term_ranks)
+        .filter(**{"%s__gt" % name: 0 for name in term_ranks})
+        .annotate(rank=reduce(operator.add, (F(name) for name in term_ranks)))
+    )
@@ -0,0 +1,74 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from gallery.models import Gallery, GalleryPhoto
+from service.models import Service, ServiceSalon
+
+from .models import Address, BaseUser, Salon
+from .serializers.salon import SalonSerializer
+from .services import cache
+from .services.search import SEARCH_FIELD_WEIGHTS, index_salon
+
+
+@receiver(post_save, sender=Salon)
+def update_search_index_on_save(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not set(update_fields) & SEARCH_FIELD_WEIGHTS.keys():
+        return
+    index_salon(instance)
+
+
+def is_salon_response_change(update_fields):
+    # Saves of other fields, e.g. last_login on every login, keep the cache
+    return not update_fields or bool(
+        set(update_fields) & set(SalonSerializer.Meta.fields)
+    )
+
+
+@receiver(post_save, sender=Salon)
+def invalidate_salon_cache_on_save(sender, instance, update_fields=None, **kwargs):
+    if is_salon_response_change(update_fields):
+        cache.invalidate_salons([instance.pk])
+
+
+@receiver(post_delete, sender=Salon)
+def invalidate_salon_cache_on_delete(sender, instance, **kwargs):
+    cache.invalidate_salons([instance.pk])
+
+
+@receiver(post_save, sender=BaseUser)
+def invalidate_salon_cache_of_user(sender, instance, update_fields=None, **kwargs):
+    # The request user is a BaseUser, also for salons
+    if instance.is_salon and is_salon_response_change(update_fields):
+        cache.invalidate_salons([instance.pk])
+
+
+@receiver(post_save, sender=ServiceSalon)
+@receiver(post_delete, sender=ServiceSalon)
+@receiver(post_save, sender=Gallery)
+@receiver(post_delete, sender=Gallery)
+def invalidate_salon_cache_of_related(sender, instance, **kwargs):
+    cache.invalidate_salons([instance.salon_id])
+
+
+@receiver(post_save, sender=GalleryPhoto)
+@receiver(post_delete, sender=GalleryPhoto)
+def invalidate_salon_cache_of_photo(sender, instance, **kwargs):
+    salon_id = (
+        Gallery.objects.filter(id=instance.gallery_id)
+        .values_list("salon_id", flat=True)
+        .first()
+    )
+    cache.invalidate_salons([salon_id])
+
+
+@receiver(post_save, sender=Address)
+@receiver(post_delete, sender=Address)
+def invalidate_salon_cache_of_address(sender, instance, **kwargs):
+    cache.invalidate_salons(
+        Salon.objects.filter(address_id=instance.pk).values_list("pk", flat=True)
+    )
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def invalidate_all_salon_caches(sender, instance, **kwargs):
+    cache.invalidate_all_salons()
@@ -1,3 +1,436 @@
-from django.test import TestCase
+import datetime
+import json
+import math
+from importlib import import_module
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache as django_cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.db.migrations.loader import MigrationLoader
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from gallery.models import Gallery, GalleryPhoto
+from rest_framework.test import APIClient
+
+from .models import (
+    Address,
+    BaseUser,
+    DeviceToken,
+    DeviceTokenQueryset,
+    MapsUrlResolution,
+    Salon,
+    User,
+)
+from .services import cache, geo, maps
+from .services.search import search_salons
+
+
+class SearchTestCase(TestCase):
+    def setUp(self):
+        for i, name in enumerate(["Hoa Salon", "Hoaz Nails", "Spa 19", "Spa 2"]):
+            Salon.objects.create(
+                username="salon%s" % i,
+                email="salon%s@example.com" % i,
+                salon_name=name,
+                is_salon=True,
+            )
+
+    def search(self, query):
+        return set(
+            search_salons(Salon.objects.all(), query).values_list(
+                "salon_name", flat=True
+            )
+        )
+
+    def test_prefix_match(self):
+        self.assertEqual(self.search("hoa"), {"Hoa Salon", "Hoaz Nails"})
+        self.assertEqual(self.search("hoaz"), {"Hoaz Nails"})
+        self.assertEqual(self.search("Hoà"), {"Hoa Salon", "Hoaz Nails"})
+        self.assertEqual(self.search("spa 1"), {"Spa 19"})
+        self.assertEqual(self.search("spa 19"), {"Spa 19"})
+        self.assertEqual(self.search("spa 9"), set())
+
+    def test_query_plan(self):
+        # The matching terms are read by a range scan on the (term, salon)
+        # index, not by walking every salon
+        stdout = StringIO()
+        call_command("check_query_plans", stdout=stdout)
+        self.assertIn("salon search: ok", stdout.getvalue())
+
+    def test_rank(self):
+        # Exact name matches weigh 6, name prefixes 3 and username prefixes 2
+        salons = search_salons(Salon.objects.all(), "hoa salon").order_by("-rank")
+        self.assertEqual(
+            [(salon.salon_name, salon.rank) for salon in salons],
+            [("Hoa Salon", 12), ("Hoaz Nails", 5)],
+        )
+
+    def test_exact_match_ranks_first(self):
+        salons = search_salons(Salon.objects.all(), "hoa").order_by("-rank")
+        self.assertEqual(salons[0].salon_name, "Hoa Salon")
+
+
+def create_address(**kwargs):
+    return Address.objects.create(
+        hamlet="1 Le Loi",
+        ward="Ben Nghe",
+        district="1",
+        province="Ho Chi Minh",
+        **kwargs
+    )
+
+
+def get_destination(lat, lng, bearing, distance):
+    """Returns the point ``distance`` km from ``(lat, lng)`` on ``bearing``."""
+    lat, lng, bearing = map(math.radians, (lat, lng, bearing))
+    angle = distance / geo.EARTH_RADIUS_KM
+    lat2 = math.asin(
+        math.sin(lat) * math.cos(angle)
+        + math.cos(lat) * math.sin(angle) * math.cos(bearing)
+    )
+    lng2 = lng + math.atan2(
+        math.sin(bearing) * math.sin(angle) * math.cos(lat),
+        math.cos(angle) - math.sin(lat) * math.sin(lat2),
+    )
+    return math.degrees(lat2), math.degrees(lng2)
+
+
+class GeoTestCase(TestCase):
+    center = (10.7769, 106.7009)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(
+            User.objects.create(username="customer", email="customer@l")
+        )
+
+    def create_salon(self, name, lat, lng):
+        return Salon.objects.create(
+            username=name.lower().replace(" ", ""),
+            email="%s@example.com" % name.lower().replace(" ", ""),
+            salon_name=name,
+            is_salon=True,
+            address=create_address(lat=lat, lng=lng),
+        )
+
+    def create_salon_at(self, name, bearing, distance, center=None):
+        return self.create_salon(
+            name, *get_destination(*(center or self.center), bearing, distance)
+        )
+
+    def near(self, center=None, radius=10):
+        salons = geo.filter_near(
+            Salon.objects.all(), *(center or self.center), radius, prefix="address__"
+        )
+        return set(salons.values_list("salon_name", flat=True))
+
+    def test_box_corners(self):
+        min_lat, max_lat, min_lng, max_lng = geo.get_bounding_box(*self.center, 10)
+        # The corners of the box are outside the circle
+        self.create_salon("North East", max_lat, max_lng)
+        self.create_salon("South West", min_lat, min_lng)
+        self.create_salon_at("Inside", 45, 9.9)
+        self.create_salon_at("Outside", 45, 10.1)
+        self.create_salon_at("North", 0, 9.9)
+        self.create_salon_at("Past North", 0, 10.1)
+        self.assertEqual(self.near(), {"Inside", "North"})
+
+    def test_high_latitude(self):
+        center = (80, 20)
+        min_lat, max_lat, min_lng, max_lng = geo.get_bounding_box(*center, 10)
+        # A degree of longitude shrinks with the cosine of the latitude
+        self.assertGreater(max_lng - center[1], 5 * (max_lat - center[0]))
+        self.create_salon_at("East", 90, 9.9, center)
+        self.create_salon_at("West", 270, 9.9, center)
+        self.create_salon_at("Past East", 90, 10.1, center)
+        self.assertEqual(self.near(center), {"East", "West"})
+
+    def test_pole(self):
+        self.assertEqual(geo.get_bounding_box(89.95, 0, 10)[2:], (None, None))
+        self.assertEqual(geo.get_bounding_box(0, 179.95, 10)[2:], (None, None))
+        self.create_salon_at("Across", 90, 5, (0, 179.99))
+        self.assertEqual(self.near((0, 179.99)), {"Across"})
+
+    def get_near(self, **params):
+        params["near"] = "%s,%s" % self.center
+        response = self.client.get("/salons/", params)
+        self.assertEqual(response.status_code, 200)
+        return [salon["salon_name"] for salon in response.data["data"]]
+
+    def test_ordering(self):
+        for name, distance in [("Middle", 5), ("Far", 8), ("Close", 1)]:
+            self.create_salon_at(name, 120, distance)
+        self.assertEqual(self.get_near(), ["Close", "Middle", "Far"])
+
+    @override_settings(SALON_SEARCH_MAX_RADIUS=100)
+    def test_radius_cap(self):
+        self.create_salon_at("Close", 0, 90)
+        self.create_salon_at("Far", 0, 110)
+        self.assertEqual(self.get_near(radius=1000), ["Close"])
+        self.assertEqual(self.get_near(radius=95), ["Close"])
+        self.assertEqual(self.get_near(), [])
+
+
+class MapsTestCase(TestCase):
+    short_url = "https://maps.app.goo.gl/abc"
+    origin_url = (
+        "https://www.google.com/maps/place/Salon/@10.77,106.70,17z/"
+        "data=!3d10.7769!4d106.7009"
+    )
+
+    def setUp(self):
+        maps._resolve_short_url.cache_clear()
+
+    def test_parse_position(self):
+        for url, position in [
+            # The place pin wins over the viewport center
+            (self.origin_url, (10.7769, 106.7009)),
+            (
+                "https://www.google.com/maps/@-33.8688,151.2093,12z",
+                (-33.8688, 151.2093),
+            ),
+            ("https://maps.google.com/?q=10.5,-106.25", (10.5, -106.25)),
+            ("https://www.google.com/maps?ll=10.5,%20106.25&z=3", (10.5, 106.25)),
+            ("https://www.google.com/maps/dir/?api=1&destination=1,2", (1, 2)),
+            ("https://www.google.com/maps/search/?api=1&query=-1.5,2.5", (-1.5, 2.5)),
+            # Encoded separators are decoded first
+            ("https://www.google.com/maps?q=10.5%2C106.25", (10.5, 106.25)),
+            # Out of range coordinates are not positions
+            ("https://www.google.com/maps/@95.1,106.2,12z", None),
+            ("https://www.google.com/maps/@10.1,186.2,12z", None),
+            ("https://www.google.com/maps/place/Ben+Thanh+Market", None),
+            (self.short_url, None),
+            ("", None),
+            (None, None),
+        ]:
+            with self.subTest(url=url):
+                self.assertEqual(maps.parse_position(url), position)
+
+    @mock.patch("account.services.maps.close_old_connections")
+    @mock.patch("account.services.maps._get_executor")
+    @mock.patch("account.services.maps.get_origin_url", return_value=origin_url)
+    def test_resolve_on_commit(self, get_origin_url, get_executor, close):
+        # Runs the background resolution in the test's transaction
+        get_executor.return_value.submit.side_effect = lambda fn, *args: fn(*args)
+        address = create_address(position_url=self.short_url)
+        with self.captureOnCommitCallbacks() as callbacks:
+            maps.set_address_position(address)
+            address.save()
+        self.assertEqual((address.lat, address.lng), (None, None))
+        self.assertEqual(len(callbacks), 1)
+        get_origin_url.assert_not_called()
+
+        callbacks[0]()
+        get_origin_url.assert_called_once_with(self.short_url)
+        address.refresh_from_db()
+        self.assertEqual((address.lat, address.lng), (10.7769, 106.7009))
+
+        # The next address with the link is set from the resolutions table
+        maps._resolve_short_url.cache_clear()
+        other = create_address(position_url=self.short_url)
+        with self.captureOnCommitCallbacks() as callbacks:
+            maps.set_address_position(other)
+        self.assertEqual((other.lat, other.lng), (10.7769, 106.7009))
+        self.assertEqual(callbacks, [])
+        self.assertEqual(MapsUrlResolution.objects.count(), 1)
+        get_origin_url.assert_called_once()
+
+
+class SalonCacheTestCase(TestCase):
+    def setUp(self):
+        django_cache.clear()
+        self.salon = Salon.objects.create(
+            username="salon", email="salon@example.com", is_salon=True
+        )
+        self.user = User.objects.create(username="customer", email="customer@l")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertInvalidates(self, save, invalidates=True):
+        list_version = cache.get_list_version()
+        salon_version = cache.get_salon_version(self.salon.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            save()
+        self.assertEqual(cache.get_list_version() != list_version, invalidates)
+        self.assertEqual(
+            cache.get_salon_version(self.salon.pk) != salon_version, invalidates
+        )
+
+    def test_salon_save_invalidates(self):
+        self.salon.salon_name = "Hoa Salon"
+        self.assertInvalidates(self.salon.save)
+        self.assertInvalidates(lambda: BaseUser.objects.get(pk=self.salon.pk).save())
+
+    def test_other_saves_keep_cache(self):
+        self.assertInvalidates(self.user.save, invalidates=False)
+        self.assertInvalidates(
+            lambda: BaseUser.objects.get(pk=self.user.pk).save(), invalidates=False
+        )
+        self.salon.last_login = timezone.now()
+        self.assertInvalidates(
+            lambda: self.salon.save(update_fields=["last_login"]), invalidates=False
+        )
+
+    def test_cache_disabled_without_shared_backend(self):
+        self.assertFalse(settings.SHARED_CACHE)
+        self.assertEqual(settings.SALON_RESPONSE_CACHE_TIMEOUT, 0)
+        response = self.client.get("/salons/%s/" % self.salon.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header("ETag"))
+        self.assertEqual(cache.get_stats(["retrieve"])["retrieve"]["misses"], 0)
+
+    @override_settings(SALON_RESPONSE_CACHE_TIMEOUT=300)
+    def test_cached_retrieve(self):
+        url = "/salons/%s/" % self.salon.pk
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(cache.get_stats(["retrieve"])["retrieve"]["hits"], 1)
+
+
+class ActionEnvelopeTestCase(TestCase):
+    """Paginated actions keep the body keys of their unpaginated responses."""
+
+    def setUp(self):
+        self.salon = Salon.objects.create(
+            username="salon", email="salon@example.com", is_salon=True
+        )
+        self.user = User.objects.create(username="customer", email="customer@l")
+        gallery = Gallery.objects.create(salon=self.salon)
+        GalleryPhoto.objects.create(gallery=gallery, url="https://example.com/1.jpg")
+        self.client = APIClient()
+
+    def get(self, user, url):
+        self.client.force_authenticate(user)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_list_actions(self):
+        for user, url in [
+            (self.salon, "/salonBookings/"),
+            (self.user, "/userBookings/"),
+            (self.user, "/salons/%s/services/" % self.salon.pk),
+        ]:
+            response = self.get(user, url)
+            self.assertEqual(list(response.data), ["detail", "data", "error"], url)
+            self.assertIsNone(response.data["error"])
+
+    def test_gallery(self):
+        response = self.get(self.user, "/salons/%s/gallery/" % self.salon.pk)
+        self.assertEqual(list(response.data), ["data"])
+        self.assertEqual(
+            [photo["url"] for photo in response.data["data"]],
+            ["https://example.com/1.jpg"],
+        )
+        self.assertEqual(
+            list(json.loads(response.content)), ["detail", "data", "error"]
+        )
+
+
+@override_settings(FCM_TOKENS_PER_USER_LIMIT=2)
+class DeviceTokenTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="customer", email="customer@l")
+        self.other = User.objects.create(username="other", email="other@l")
+        self.now = timezone.now()
+
+    def register(self, user, token, platform=None, minutes=0):
+        with mock.patch(
+            "account.models.timezone.now",
+            return_value=self.now + datetime.timedelta(minutes=minutes),
+        ):
+            return DeviceToken.objects.register(user, token, platform)
+
+    def get_tokens(self, user):
+        return list(user.device_tokens.values_list("token", flat=True))
+
+    def test_register(self):
+        device_token = self.register(self.other, "token", "android")
+        DeviceToken.objects.invalidate(["token"])
+        # The device signed in to another account
+        self.assertEqual(self.register(self.user, "token", "desktop", 1), device_token)
+        device_token.refresh_from_db()
+        self.assertEqual(device_token.user_id, self.user.pk)
+        self.assertIsNone(device_token.platform)
+        self.assertEqual(
+            device_token.last_seen, self.now + datetime.timedelta(minutes=1)
+        )
+        self.assertIsNone(device_token.invalidated_at)
+        self.assertEqual(self.get_tokens(self.other), [])
+
+    def test_limit_per_user(self):
+        for minutes, token in [(0, "oldest"), (2, "newest"), (1, "middle")]:
+            self.register(self.user, token, minutes=minutes)
+        self.assertEqual(self.get_tokens(self.user), ["newest", "middle"])
+        # Seen again, so no longer the least recent
+        self.register(self.user, "middle", minutes=3)
+        self.register(self.user, "latest", minutes=4)
+        self.assertEqual(self.get_tokens(self.user), ["latest", "middle"])
+        self.register(self.other, "other")
+        self.assertEqual(self.get_tokens(self.other), ["other"])
+
+    def test_concurrent_insert(self):
+        # Inserted by another request after update_or_create looked it up
+        DeviceToken.objects.create(user=self.other, token="token")
+        with mock.patch.object(
+            DeviceTokenQueryset, "update_or_create", side_effect=IntegrityError
+        ):
+            device_token = self.register(self.user, "token", "ios", 1)
+        self.assertEqual(device_token.user_id, self.user.pk)
+        self.assertEqual(device_token.platform, "ios")
+        self.assertEqual(DeviceToken.objects.count(), 1)
+
+
+class DeviceTokenMigrationTestCase(TestCase):
+    migration = "0024_move_fcm_tokens_to_devicetoken"
+
+    def setUp(self):
+        self.module = import_module("account.migrations.%s" % self.migration)
+        # The models as the migration saw them
+        self.apps = (
+            MigrationLoader(connection)
+            .project_state(("account", self.migration), at_end=True)
+            .apps
+        )
+
+    @override_settings(FCM_TOKENS_PER_USER_LIMIT=2)
+    def test_forward(self):
+        user = User.objects.create(
+            username="customer",
+            email="customer@l",
+            private_metadata={"fcm_tokens": ["new", "", "new", "old", "older"], "a": 1},
+        )
+        other = User.objects.create(
+            username="other", email="other@l", private_metadata={"fcm_tokens": ["new"]}
+        )
+        User.objects.create(username="none", email="none@l", private_metadata={})
+
+        self.module.move_fcm_tokens_to_devicetoken(self.apps, None)
+        # Newest first, duplicates and the tokens past the limit dropped
+        self.assertEqual(
+            list(user.device_tokens.values_list("token", flat=True)), ["new", "old"]
+        )
+        self.assertEqual(other.device_tokens.count(), 0)
+        user.refresh_from_db()
+        self.assertEqual(user.private_metadata, {"a": 1})
+
+    def test_backward(self):
+        user = User.objects.create(username="customer", email="customer@l")
+        for minutes, token in [(0, "old"), (1, "new")]:
+            DeviceToken.objects.create(
+                user=user,
+                token=token,
+                last_seen=timezone.now() + datetime.timedelta(minutes=minutes),
+            )
+        DeviceToken.objects.create(
+            user=user, token="invalid", invalidated_at=timezone.now()
+        )
+
+        self.module.move_devicetoken_to_fcm_tokens(self.apps, None)
+        user.refresh_from_db()
+        self.assertEqual(user.private_metadata, {"fcm_tokens": ["new", "old"]})
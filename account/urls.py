@@ -19,6 +19,7 @@ urlpatterns = [
     path("salonAddress/", salon_views.AddressUpdate.as_view()),
     path("salonBookings/", salon_views.SalonViewSet.as_view({"get": "bookings"})),
     path("userBookings/", user_views.UserViewSet.as_view({"get": "bookings"})),
-    path("fcmToken/", AccountStoreFCMToken.as_view())
+    path("fcmToken/", AccountStoreFCMToken.as_view()),
+    path("salonCacheStats/", salon_views.SalonCacheStats.as_view()),
     # apis for user
 ]
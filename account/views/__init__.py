@@ -1,4 +1,3 @@
-from account.services.firebase import clean_up_user_fcm_tokens
 from base.views import BaseAPIView
 from django.contrib.auth.hashers import check_password
 from django.db import transaction
@@ -150,7 +149,6 @@ class AccountStoreFCMToken(APIView):
     def post(self, request):
         try:
             current_user = request.user
-            fcm_tokens = current_user.fcm_tokens
             fcm_token = request.data.get("fcm_token")
             if not fcm_token:
                 return Response(
@@ -160,17 +158,11 @@ class AccountStoreFCMToken(APIView):
                     },
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-            if fcm_token.strip() != "" and fcm_token not in fcm_tokens:
-                current_user.store_fcm_token(fcm_token)
-            if not clean_up_user_fcm_tokens(current_user):
-                return Response(
-                    {
-                        "code": AccountErrorCode.INVALID,
-                        "detail": "fcm_token invalid",
-                    },
-                    status=status.HTTP_400_BAD_REQUEST,
+            # Tokens are validated by the periodic validate_fcm_tokens sweep
+            if fcm_token.strip() != "":
+                current_user.store_fcm_token(
+                    fcm_token, platform=request.data.get("platform")
                 )
-
             return Response(
                 {
                     "detail": "Add fcm_token successfully",
@@ -1,6 +1,6 @@
 from urllib.parse import unquote
 
-import requests
+from ..services import maps
 
 
 class Address:
@@ -36,28 +36,17 @@ class Address:
                     if length_address >= 5:
                         self.hamlet = sub_addresses[-5]
 
-        location = types[1].replace("@", "").split(",")
-        self.lat = location[0]
-        self.lng = location[1]
+        self.lat, self.lng = maps.parse_position(url) or (None, None)
 
     @classmethod
     def get_position_from_url(self, url: str):
-        if not url:
-            return
-        url = self.get_origin_url_from_short_url(url)
-        url = unquote(url)
-        url = url.replace("https://www.google.com/maps/place/", "")
-        types = url.split("/")
-        location = types[1].replace("@", "").split(",")
-        lat = location[0]
-        lng = location[1]
-        return (lat, lng)
+        return maps.get_position(url)
 
     @classmethod
     def get_origin_url_from_short_url(self, url: str):
-        session = requests.Session()  # so connections are recycled
-        resp = session.head(url, allow_redirects=True)
-        return resp.url
+        if not maps.is_short_url(url):
+            return url
+        return maps.get_origin_url(url)
 
 
 # class AddressViewSet(viewsets.ModelViewSet):
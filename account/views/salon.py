@@ -1,10 +1,16 @@
 from account.serializers.salon import SalonReviewSerializer
 from base.services.cloudinary import CloudinaryService
 from base.views import BaseViewSet
-from booking.serializers import BookingSerializer
+from booking.serializers import (
+    BookingAvailabilityInputSerializer,
+    BookingExportInputSerializer,
+    BookingSerializer,
+)
+from booking.services import availability, export
 from django.conf import settings
 from django.db import transaction
-from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 from gallery import models as gallery_models
 from gallery.serializers import GalleryPhotoSerializer, GallerySerializer
 from rest_framework import status
@@ -19,12 +25,13 @@ from service.serializers import ServiceSalonSerializer
 from ..serializers import (
     AddressSerializer,
     AddressSerializerInput,
+    SalonNearInputSerializer,
     SalonRegisterInputSerializer,
     SalonRegisterSerializer,
     SalonSerializer,
 )
+from ..services import cache, geo, maps, search
 from . import AccountErrorCode, models
-from .address import Address
 
 
 class SalonViewSet(BaseViewSet):
@@ -35,8 +42,31 @@ class SalonViewSet(BaseViewSet):
     permission_map = {
         "destroy": [IsAdminUser],
     }
+    query_budget_map = {
+        "list": 6,
+        "retrieve": 6,
+        "services": 6,
+        "gallery": 6,
+        "reviews": 8,
+        "bookings": 8,
+    }
+
+    def get_etag_version(self, queryset=None):
+        # The versions of the response cache change with every salon write
+        if self.action in ("list", "retrieve", "services", "gallery"):
+            if not cache.is_enabled():
+                return None
+            if self.action == "list":
+                return cache.get_list_version()
+            return cache.get_salon_version(self.kwargs["pk"])
+        return super().get_etag_version(queryset)
+
+    @cache.cache_salon_response("retrieve")
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
     @action(detail=True)
+    @cache.cache_salon_response("services")
     def services(self, request, *args, **kwargs):
         """
         Returns a list of all the group names that the given
@@ -44,14 +74,14 @@ class SalonViewSet(BaseViewSet):
         """
         salon = self.get_object()
         search_query = request.query_params.get("q", "")
-        services = salon.services.filter(service__name__icontains=search_query)
-        data = [ServiceSalonSerializer(service).data for service in services]
-        response_dict = {
-            "detail": None,
-            "data": data,
-            "error": None,
-        }
-        return Response(response_dict)
+        services = ServiceSalonSerializer.setup_eager_loading(
+            salon.services.filter(service__name__icontains=search_query)
+        )
+        page = self.paginate_queryset(services)
+        data = ServiceSalonSerializer(page, many=True).data
+        return self.get_paginated_response(
+            data, body={"detail": None, "data": data, "error": None}
+        )
 
     @action(detail=True)
     def bookings(self, request, *args, **kwargs):
@@ -70,40 +100,140 @@ class SalonViewSet(BaseViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
         search_query = request.query_params.get("status", "")
-        bookings = salon.bookings.all()
+        bookings = BookingSerializer.setup_eager_loading(salon.bookings.all())
         if search_query:
             bookings = bookings.filter(status=search_query)
-        data = [BookingSerializer(booking).data for booking in bookings]
-        response_dict = {
-            "detail": None,
-            "data": data,
-            "error": None,
-        }
-        return Response(response_dict)
+        page = self.paginate_queryset(bookings)
+        data = BookingSerializer(page, many=True).data
+        return self.get_paginated_response(
+            data, body={"detail": None, "data": data, "error": None}
+        )
+
+    @action(detail=True, methods=["get"], url_path="bookings/export")
+    def export_bookings(self, request, *args, **kwargs):
+        """
+        Streams the booking history of the requesting salon as CSV or NDJSON
+        (`type`), optionally limited to a creation date range (`date_from`,
+        `date_to`, inclusive) and a `status`.
+        """
+        requester_id = request.user.id
+        salon = models.Salon.objects.filter(id=requester_id).first()
+        if not salon:
+            return Response(
+                {
+                    "code": AccountErrorCode.NOT_FOUND,
+                    "detail": "Salon %s is not exist" % requester_id,
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        serializer = BookingExportInputSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(
+                {
+                    "code": AccountErrorCode.INVALID,
+                    "detail": "Can not export the bookings of the salon",
+                    "messages": serializer.errors,
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        file_format = serializer.validated_data.pop("type")
+        bookings = export.filter_bookings(
+            salon.bookings.all(), **serializer.validated_data
+        )
+        response = StreamingHttpResponse(
+            export.stream_bookings(bookings, file_format),
+            content_type=export.CONTENT_TYPES[file_format],
+        )
+        response["Content-Disposition"] = 'attachment; filename="bookings-%s.%s"' % (
+            availability.get_local_date(timezone.now()).isoformat(),
+            file_format,
+        )
+        return response
+
+    @action(detail=True, methods=["get"])
+    def availability(self, request, *args, **kwargs):
+        """
+        Returns the free time slots of the salon on a day for the given services
+        """
+        salon = self.get_object()
+        service_ids = request.query_params.get("service_ids", "")
+        serializer = BookingAvailabilityInputSerializer(
+            data={
+                "date": request.query_params.get("date"),
+                "service_ids": [
+                    service_id for service_id in service_ids.split(",") if service_id
+                ],
+            }
+        )
+        if not serializer.is_valid():
+            return Response(
+                {
+                    "code": AccountErrorCode.INVALID,
+                    "detail": "Can not get availability of the salon",
+                    "messages": serializer.errors,
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        service_ids = serializer.validated_data["service_ids"]
+        salon_services = list(salon.services.filter(service__in=service_ids))
+        if len(salon_services) != len(set(service_ids)):
+            return Response(
+                {
+                    "code": AccountErrorCode.NOT_FOUND,
+                    "detail": "The salon has not some of the services",
+                    "messages": "The salon has not some of the services",
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        slots = availability.get_free_slots(
+            salon,
+            serializer.validated_data["date"],
+            availability.get_services_duration(salon_services),
+        )
+        data = [{"start_at": start_at, "end_at": end_at} for start_at, end_at in slots]
+        return Response(
+            {
+                "detail": None,
+                "data": data,
+                "error": None,
+            }
+        )
 
     def list(self, request):
         search_query = request.query_params.get("q", "")
         sort_query = request.query_params.get("sort", "")
-        query = (
-            Q(salon_name__icontains=search_query)
-            | Q(first_name__icontains=search_query)
-            | Q(last_name__icontains=search_query)
-            | Q(email__icontains=search_query)
-            | Q(phone_number__icontains=search_query)
-            | Q(username__icontains=search_query)
-        )
-        queryset = models.Salon.objects.filter(query)
+        queryset = search.search_salons(models.Salon.objects.filter(), search_query)
 
-        if sort_query:
+        if "near" in request.query_params:
+            serializer = SalonNearInputSerializer(data=request.query_params)
+            if not serializer.is_valid():
+                return Response(
+                    {
+                        "code": AccountErrorCode.INVALID,
+                        "detail": "Can not search salons nearby",
+                        "messages": serializer.errors,
+                    },
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            lat, lng = serializer.validated_data["near"]
+            radius = serializer.validated_data.get(
+                "radius", settings.SALON_SEARCH_RADIUS
+            )
+            queryset = geo.filter_near(queryset, lat, lng, radius, prefix="address__")
+            self.cursor_ordering = "distance"
+        elif sort_query:
             try:
                 if sort_query.startswith("-"):
-                    models.Salon._meta.get_field(sort_query[1:])
+                    field = models.Salon._meta.get_field(sort_query[1:])
                 else:
-                    models.Salon._meta.get_field(sort_query)
-                queryset = queryset.order_by(sort_query)
+                    field = models.Salon._meta.get_field(sort_query)
+                if field.concrete and not field.is_relation:
+                    self.cursor_ordering = sort_query
 
             except:
                 pass
+        elif "rank" in queryset.query.annotations:
+            self.cursor_ordering = "-rank"
         self.queryset = queryset
         return super().list(request)
 
@@ -168,10 +298,10 @@ class SalonViewSet(BaseViewSet):
             )
 
     @action(detail=True, methods=["post"], url_path="galleryUpload")
-    @transaction.atomic
     def gallery_upload(self, request, *args, **kwargs):
         """
-        Upload photos to gallery
+        Upload photos to gallery. The photos are uploaded concurrently before
+        any database write, so no transaction is held open meanwhile.
         """
         salon = self.get_object()
         if salon.id != request.user.id:
@@ -184,18 +314,29 @@ class SalonViewSet(BaseViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        gallery = salon.gallery.first()
-        if not gallery:
-            gallery = gallery_models.Gallery.objects.create(salon_id=salon.id)
-
         photos = request.FILES.getlist("photos")
         avatar_folder_path = settings.CLOUDINARY_GALLERY_FOLDER + str(salon.id) + "/"
-        gallery_photos = []
-        for photo in photos:
-            url = CloudinaryService.upload_image(photo, avatar_folder_path)
-            gallery_photo = gallery_models.GalleryPhoto(url=url, gallery_id=gallery.id)
-            gallery_photos.append(gallery_photo)
-        gallery_models.GalleryPhoto.objects.bulk_create(gallery_photos)
+        try:
+            urls = CloudinaryService.upload_images(photos, avatar_folder_path)
+        except Exception as e:
+            return Response(
+                {
+                    "code": AccountErrorCode.PROCESSING_ERROR,
+                    "detail": "Upload images to gallery failed",
+                    "messages": e.args,
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        with transaction.atomic():
+            gallery = salon.gallery.first()
+            if not gallery:
+                gallery = gallery_models.Gallery.objects.create(salon_id=salon.id)
+            gallery_models.GalleryPhoto.objects.bulk_create(
+                gallery_models.GalleryPhoto(url=url, gallery_id=gallery.id)
+                for url in urls
+            )
+            cache.invalidate_salons([salon.id])
         response_data = None
         if hasattr(gallery, "photos"):
             response = GallerySerializer(gallery)
@@ -209,6 +350,7 @@ class SalonViewSet(BaseViewSet):
         )
 
     @action(detail=True, methods=["get"])
+    @cache.cache_salon_response("gallery")
     def gallery(self, request, *args, **kwargs):
         """
         Get all photos in gallery
@@ -218,9 +360,11 @@ class SalonViewSet(BaseViewSet):
         if hasattr(salon, "gallery"):
             gallery = salon.gallery.first()
             if hasattr(gallery, "photos"):
-                qs = gallery.photos.all()
-                response = GalleryPhotoSerializer(qs, many=True)
-                response_data = response.data
+                page = self.paginate_queryset(gallery.photos.all())
+                response = GalleryPhotoSerializer(page, many=True)
+                return self.get_paginated_response(
+                    response.data, body={"data": response.data}
+                )
 
         return Response(
             {
@@ -235,14 +379,12 @@ class SalonViewSet(BaseViewSet):
         Get all reviews of salon
         """
         salon = self.get_object()
-        qs = salon.bookings.filter(rating__isnull=False)
-        response = SalonReviewSerializer(qs, many=True)
-        return Response(
-            {
-                "data": response.data,
-            },
-            status=status.HTTP_200_OK,
+        qs = SalonReviewSerializer.setup_eager_loading(
+            salon.bookings.filter(rating__isnull=False)
         )
+        page = self.paginate_queryset(qs)
+        response = SalonReviewSerializer(page, many=True)
+        return self.get_paginated_response(response.data, body={"data": response.data})
 
 
 class SalonRegister(APIView):
@@ -259,14 +401,9 @@ class SalonRegister(APIView):
                 salon.is_salon = True
                 salon.save(update_fields=("is_salon",))
 
-                if data.get("address") and data.get("address").get("position_url"):
-                    address_ref = Address()
-                    lat, lng = address_ref.get_position_from_url(
-                        data.get("address").get("position_url")
-                    )
-                    address = salon.address
-                    address.lat = lat
-                    address.lng = lng
+                if salon.address and salon.address.position_url:
+                    maps.set_address_position(salon.address)
+                    salon.address.save(update_fields=("lat", "lng"))
 
                 token = RefreshToken.for_user(salon)
                 response = SalonRegisterSerializer(salon)
@@ -315,11 +452,8 @@ class AddressUpdate(APIView):
                     if value and value.strip() != "":
                         setattr(address, key, value)
 
-                address_ref = Address()
-                position_url = data.get("position_url")
-                lat, lng = address_ref.get_position_from_url(position_url)
-                address.lat = lat
-                address.lng = lng
+                if data.get("position_url"):
+                    maps.set_address_position(address)
                 address.save()
                 response = AddressSerializer(address)
                 return Response(
@@ -346,3 +480,18 @@ class AddressUpdate(APIView):
                 },
                 status=status.HTTP_400_BAD_REQUEST,
             )
+
+
+class SalonCacheStats(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        """
+        Hit and miss counts of the cached salon responses
+        """
+        return Response(
+            {
+                "data": cache.get_stats(["retrieve", "services", "gallery"]),
+            },
+            status=status.HTTP_200_OK,
+        )
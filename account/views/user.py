@@ -116,16 +116,14 @@ class UserViewSet(BaseViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
         search_query = request.query_params.get("status", "")
-        bookings = user.bookings.all()
+        bookings = BookingSerializer.setup_eager_loading(user.bookings.all())
         if search_query:
             bookings = bookings.filter(status=search_query)
-        data = [BookingSerializer(booking).data for booking in bookings]
-        response_dict = {
-            "detail": None,
-            "data": data,
-            "error": None,
-        }
-        return Response(response_dict)
+        page = self.paginate_queryset(bookings)
+        data = BookingSerializer(page, many=True).data
+        return self.get_paginated_response(
+            data, body={"detail": None, "data": data, "error": None}
+        )
 
 
 class UserRegister(BaseAPIView):
@@ -0,0 +1,213 @@
+import logging
+import threading
+import time
+from collections import deque
+
+from django.db.utils import OperationalError
+
+logger = logging.getLogger(__name__)
+
+_pools = {}
+_lock = threading.Lock()
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of DB-API connections shared by the threads of a process.
+
+    At most `size` connections are open at once; `acquire` waits up to
+    `timeout` seconds for one to be released. Idle connections older than
+    `recycle` seconds are closed, and connections idle longer than
+    `check_after` seconds are pinged before being handed out.
+    """
+
+    def __init__(self, connect, size, timeout=10, recycle=3600, check_after=30):
+        self.connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.check_after = check_after
+        self.created = 0
+        self.reused = 0
+        # (connection, opened_at, released_at), most recently released last
+        self._idle = deque()
+        self._opened_at = {}
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise OperationalError(
+                "No database connection released within %ss, the pool size is %s"
+                % (self.timeout, self.size)
+            )
+        try:
+            while True:
+                with self._lock:
+                    if not self._idle:
+                        break
+                    connection, opened_at, released_at = self._idle.pop()
+                now = time.monotonic()
+                if now - opened_at > self.recycle:
+                    self.discard(connection)
+                elif now - released_at > self.check_after and not self.ping(connection):
+                    self.discard(connection)
+                else:
+                    self.reused += 1
+                    return connection
+            connection = self.connect()
+            self.created += 1
+            with self._lock:
+                self._opened_at[id(connection)] = time.monotonic()
+            return connection
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, connection, reusable=True):
+        with self._lock:
+            opened_at = self._opened_at.get(id(connection))
+            if opened_at is not None and reusable:
+                self._idle.append((connection, opened_at, time.monotonic()))
+        if opened_at is None:
+            # Opened by a pool that has been closed since
+            connection.close()
+            return
+        if not reusable:
+            self.discard(connection)
+        self._slots.release()
+
+    def discard(self, connection):
+        with self._lock:
+            self._opened_at.pop(id(connection), None)
+        try:
+            connection.close()
+        except Exception:
+            logger.debug("Closing a pooled connection failed", exc_info=True)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+        for connection, _, _ in idle:
+            self.discard(connection)
+
+    @staticmethod
+    def ping(connection):
+        try:
+            cursor = connection.cursor()
+            try:
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+            finally:
+                cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "open": len(self._opened_at),
+                "idle": len(self._idle),
+                "created": self.created,
+                "reused": self.reused,
+            }
+
+
+def get_pool(alias, connect, settings_dict):
+    """Returns the process-wide pool of the database alias."""
+    pool = _pools.get(alias)
+    if pool is None:
+        with _lock:
+            pool = _pools.get(alias)
+            if pool is None:
+                pool = _pools[alias] = ConnectionPool(
+                    connect,
+                    settings_dict["POOL_SIZE"],
+                    timeout=settings_dict.get("POOL_TIMEOUT", 10),
+                    recycle=settings_dict.get("POOL_RECYCLE", 3600),
+                    check_after=settings_dict.get("POOL_CHECK_AFTER", 30),
+                )
+    return pool
+
+
+def get_pools():
+    return dict(_pools)
+
+
+def close_pools():
+    """Closes the idle connections of every pool and forgets the pools."""
+    with _lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+class PooledDatabaseWrapperMixin:
+    """
+    Adds to a Django database backend:
+
+    - health checks (`CONN_HEALTH_CHECKS`): a persistent connection is pinged
+      before its first use in a request and replaced when it went away, e.g.
+      after the server's wait_timeout;
+    - an in-process pool (`POOL_SIZE` > 0): closing the connection, which
+      Django does at the end of each request when `CONN_MAX_AGE` is 0, hands
+      it back to a pool shared by all threads instead of disconnecting.
+    """
+
+    health_check_done = False
+
+    @property
+    def pool_size(self):
+        return self.settings_dict.get("POOL_SIZE") or 0
+
+    def get_new_connection(self, conn_params):
+        if not self.pool_size:
+            return super().get_new_connection(conn_params)
+        pool = get_pool(
+            self.alias,
+            lambda: super(PooledDatabaseWrapperMixin, self).get_new_connection(
+                conn_params
+            ),
+            self.settings_dict,
+        )
+        return pool.acquire()
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
+
+    def _close(self):
+        pool = _pools.get(self.alias)
+        if self.connection is None or pool is None:
+            return super()._close()
+        # A connection closed inside a transaction stays referenced by this
+        # wrapper, so it can not go back to the pool
+        reusable = not self.in_atomic_block and not self.errors_occurred
+        if reusable and not self.autocommit:
+            try:
+                with self.wrap_database_errors:
+                    self.connection.rollback()
+            except Exception:
+                reusable = False
+        pool.release(self.connection, reusable)
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def ensure_connection(self):
+        if (
+            self.connection is not None
+            and not self.health_check_done
+            and self.settings_dict.get("CONN_HEALTH_CHECKS")
+            and not self.in_atomic_block
+        ):
+            if not self.is_usable():
+                # Discarded rather than handed back to the pool
+                self.errors_occurred = True
+                self.close()
+            self.health_check_done = True
+        super().ensure_connection()
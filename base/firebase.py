@@ -1,7 +1,39 @@
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
 import firebase_admin
+from django.conf import settings
+from django.utils.module_loading import import_string
 from firebase_admin import credentials, messaging
 
-CREDENTIALS_FIREBASE_PATH = "base/services/firebase-adminsdk.json"
+# FCM accepts at most 500 registration tokens per multicast request
+FCM_MULTICAST_LIMIT = 500
+
+logger = logging.getLogger(__name__)
+
+ANDROID_CONFIG = messaging.AndroidConfig(
+    notification=messaging.AndroidNotification(
+        # priority="high", default_sound=True, notification_count=badge_number
+        priority="high",
+        default_sound=True,
+    )
+)
+APNS_CONFIG = messaging.APNSConfig(
+    payload=messaging.APNSPayload(
+        aps=messaging.Aps(
+            sound="default",
+            mutable_content=True
+            # sound="default", badge=None, mutable_content=True
+        )
+    ),
+    headers={
+        "apns-priority": "10",
+    },
+)
 
 # def get_user_on_firestore(user):
 #     if not user.firebase_uid:
@@ -15,83 +47,244 @@ CREDENTIALS_FIREBASE_PATH = "base/services/firebase-adminsdk.json"
 #     return None
 
 
+_app = None
+_transport = None
+_executor = None
+_lock = threading.RLock()
+
+
+def get_firebase_app():
+    """
+    Returns the process-wide Firebase app, initialising it on first use. Later
+    calls are a single global lookup.
+    """
+    global _app
+    if _app is None:
+        with _lock:
+            if _app is None:
+                try:
+                    _app = firebase_admin.get_app()
+                except ValueError:
+                    cred = credentials.Certificate(settings.FIREBASE_CREDENTIALS_PATH)
+                    _app = firebase_admin.initialize_app(cred)
+    return _app
+
+
 def firebase_initialize_app():
+    return get_firebase_app()
+
+
+def warm_up():
+    """
+    Initialises the Firebase app and fetches its OAuth access token so the
+    first push sent by a worker does not pay for either.
+    """
+    started = time.perf_counter()
     try:
-        app = firebase_admin.get_app()
-    except ValueError as e:
-        cred = credentials.Certificate(CREDENTIALS_FIREBASE_PATH)
-        firebase_admin.initialize_app(cred)
+        get_firebase_app().credential.get_access_token()
+    except Exception as e:
+        logger.warning("Could not warm up Firebase: %s", e)
+        return
+    logger.info("Firebase warmed up in %.3fs", time.perf_counter() - started)
 
 
-# def get_badge_number(user):
-#     user_on_firestore = get_user_on_firestore(user)
-#     total_unread_chat = (
-#         user_on_firestore.get("totalUnreadChat", 0) if user_on_firestore else 0
-#     )
-#     total_unread_other = user.concat_notifications.unread().count()
-#     return total_unread_chat + total_unread_other
+def get_badge_number(user):
+    # Kept by notification.models, no query needed
+    return user.unread_notification_count
 
 
-def send_notify_multiple_recipient(
-    recipients, message_title: str, message_body: str, data_message=None, **kwargs
-):
-    firebase_initialize_app()
-    # Create a list containing up to 500 registration tokens.
-    # These registration tokens come from the client FCM SDKs.
-    notification = messaging.Notification(
-        title=message_title, body=message_body, image=kwargs.get("image", "")
+def get_android_config(badge=None):
+    if badge is None:
+        return ANDROID_CONFIG
+    return messaging.AndroidConfig(
+        notification=messaging.AndroidNotification(
+            priority="high", default_sound=True, notification_count=badge
+        )
     )
-    success_ids = []
-    failure_count = 0
-    for recipient in recipients:
-        registration_tokens = recipient.fcm_tokens
-
-        if registration_tokens:
-            # badge_number = get_badge_number(recipient)
-            android = messaging.AndroidConfig(
-                notification=messaging.AndroidNotification(
-                    # priority="high", default_sound=True, notification_count=badge_number
-                    priority="high",
-                    default_sound=True,
-                )
-            )
-            apns = messaging.APNSConfig(
-                payload=messaging.APNSPayload(
-                    aps=messaging.Aps(
-                        sound="default",
-                        mutable_content=True
-                        # sound="default", badge=None, mutable_content=True
-                    )
-                ),
-                headers={
-                    "apns-priority": "10",
-                },
+
+
+def get_apns_config(badge=None):
+    if badge is None:
+        return APNS_CONFIG
+    return messaging.APNSConfig(
+        payload=messaging.APNSPayload(
+            aps=messaging.Aps(sound="default", badge=badge, mutable_content=True)
+        ),
+        headers=APNS_CONFIG.headers,
+    )
+
+
+class FCMTransport:
+    """Sends multicast messages through the Firebase Admin SDK."""
+
+    def send_multicast(self, message, dry_run=False):
+        return messaging.send_multicast(
+            message, dry_run=dry_run, app=get_firebase_app()
+        )
+
+
+class LocalFCMTransport:
+    """
+    In-process stand-in for FCM used by tests and benchmarks. Tokens listed in
+    ``invalid_tokens`` are answered as unregistered, a request to any of the
+    ``unavailable_tokens`` fails as a whole like during an FCM outage, and
+    ``latency`` (seconds) simulates the network round trip of each multicast
+    request.
+    """
+
+    def __init__(self, latency=0, invalid_tokens=(), unavailable_tokens=()):
+        self.latency = latency
+        self.invalid_tokens = set(invalid_tokens)
+        self.unavailable_tokens = set(unavailable_tokens)
+        self.sent_messages = []
+
+    def send_multicast(self, message, dry_run=False):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.unavailable_tokens.intersection(message.tokens):
+            raise firebase_admin.exceptions.UnavailableError(
+                "The service is currently unavailable."
             )
-            try:
-                message = messaging.MulticastMessage(
-                    tokens=registration_tokens,
-                    data=data_message,
-                    notification=notification,
-                    apns=apns,
-                    android=android,
+        self.sent_messages.append(message)
+        responses = []
+        for token in message.tokens:
+            if token in self.invalid_tokens:
+                exception = messaging.UnregisteredError(
+                    "Requested entity was not found."
                 )
-                batch_response = messaging.send_multicast(message)
+                responses.append(messaging.SendResponse(None, exception))
+            else:
+                resp = {"name": "projects/local/messages/%s" % uuid.uuid4()}
+                responses.append(messaging.SendResponse(resp, None))
+        return messaging.BatchResponse(responses)
+
+
+class TokenResult:
+    """Outcome of sending a message to one registration token."""
+
+    def __init__(self, token, message_id=None, exception=None, request_failed=False):
+        self.token = token
+        self.message_id = message_id
+        self.exception = exception
+        # The whole multicast request failed, not just this token
+        self.request_failed = request_failed
+
+    @property
+    def success(self):
+        return self.message_id is not None and self.exception is None
+
+    @property
+    def is_invalid_token(self):
+        return (
+            isinstance(self.exception, firebase_admin.exceptions.FirebaseError)
+            and self.exception.code == "NOT_FOUND"
+        )
 
-                failure_count += batch_response.failure_count
-            except Exception as e:
-                batch_response = None
-                print(">>>>>> Error send push notification: ", e)
-    return (success_ids, failure_count)
 
+def get_transport():
+    global _transport
+    if _transport is None:
+        with _lock:
+            if _transport is None:
+                _transport = import_string(settings.FIREBASE_TRANSPORT)()
+    return _transport
 
-def check_fcm_token_valid(fcm_token):
-    firebase_initialize_app()
-    message = messaging.Message(
-        token=fcm_token,
+
+def set_transport(transport):
+    """Swaps the FCM transport, e.g. for ``LocalFCMTransport`` in benchmarks."""
+    global _transport
+    _transport = transport
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.FIREBASE_SEND_WORKERS,
+                    thread_name_prefix="fcm-send",
+                )
+    return _executor
+
+
+def _send_chunk(transport, tokens, notification, data_message, dry_run, badge=None):
+    message = messaging.MulticastMessage(
+        tokens=tokens,
+        data=data_message,
+        notification=notification,
+        apns=get_apns_config(badge),
+        android=get_android_config(badge),
     )
     try:
-        messaging.send(message, dry_run=True)
-    except firebase_admin.exceptions.FirebaseError as e:
-        if e.code == "NOT_FOUND":
-            return False
-    return True
+        batch_response = transport.send_multicast(message, dry_run=dry_run)
+    except Exception as e:
+        logger.warning(
+            "Error sending push notification to %s tokens: %s", len(tokens), e
+        )
+        return [
+            TokenResult(token, exception=e, request_failed=True) for token in tokens
+        ]
+    return [
+        TokenResult(token, response.message_id, response.exception)
+        for token, response in zip(tokens, batch_response.responses)
+    ]
+
+
+def send_multicast_batched(
+    tokens, notification=None, data_message=None, dry_run=False, badge=None
+):
+    """
+    Sends the same message to every token, ``FCM_MULTICAST_LIMIT`` tokens per
+    request, dispatching the requests concurrently from a bounded pool.
+    ``badge`` sets the app icon badge count.
+    :return: A ``TokenResult`` per distinct token, in input order.
+    """
+    tokens = list(dict.fromkeys(tokens))
+    chunks = [
+        tokens[i : i + FCM_MULTICAST_LIMIT]
+        for i in range(0, len(tokens), FCM_MULTICAST_LIMIT)
+    ]
+    transport = get_transport()
+    if len(chunks) <= 1:
+        return [
+            result
+            for chunk in chunks
+            for result in _send_chunk(
+                transport, chunk, notification, data_message, dry_run, badge
+            )
+        ]
+    executor = _get_executor()
+    futures = [
+        executor.submit(
+            _send_chunk, transport, chunk, notification, data_message, dry_run, badge
+        )
+        for chunk in chunks
+    ]
+    return [result for future in futures for result in future.result()]
+
+
+def send_notify_multiple_recipient(
+    recipients, message_title: str, message_body: str, data_message=None, **kwargs
+):
+    notification = messaging.Notification(
+        title=message_title, body=message_body, image=kwargs.get("image", "")
+    )
+    # One multicast per badge number, recipients usually differ in it
+    tokens_by_badge = defaultdict(list)
+    for recipient in recipients:
+        tokens_by_badge[get_badge_number(recipient)].extend(recipient.fcm_tokens)
+    results = [
+        result
+        for badge, tokens in tokens_by_badge.items()
+        for result in send_multicast_batched(
+            tokens, notification=notification, data_message=data_message, badge=badge
+        )
+    ]
+    request_errors = [result.exception for result in results if result.request_failed]
+    if request_errors and len(request_errors) == len(results):
+        # Nothing was delivered, let the caller retry
+        raise request_errors[0]
+    success_ids = [result.message_id for result in results if result.success]
+    failure_count = len(results) - len(success_ids)
+    return (success_ids, failure_count)
@@ -0,0 +1,187 @@
+import heapq
+import logging
+import re
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryStats:
+    """
+    Execute wrapper recording the number of queries, the total database time
+    and the slowest statements. Only the SQL templates are kept, never the
+    parameters.
+    """
+
+    def __init__(self, slowest=None):
+        self.slowest_size = settings.QUERY_STATS_SLOWEST if slowest is None else slowest
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.count += 1
+            self.duration += duration
+            entry = (duration, self.count, sql)
+            if len(self.slowest) < self.slowest_size:
+                heapq.heappush(self.slowest, entry)
+            elif self.slowest_size:
+                heapq.heappushpop(self.slowest, entry)
+            if duration * 1000 >= settings.SLOW_QUERY_MS:
+                logger.warning(
+                    "Slow query %.1fms: %s",
+                    duration * 1000,
+                    sql,
+                    extra={"query": {"sql": sql, "ms": round(duration * 1000, 1)}},
+                )
+
+    @contextmanager
+    def record(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+    def get_slowest(self):
+        return [
+            {"sql": sql, "ms": round(duration * 1000, 1)}
+            for duration, _, sql in sorted(self.slowest, reverse=True)
+        ]
+
+    def as_dict(self):
+        return {
+            "queries": self.count,
+            "db_ms": round(self.duration * 1000, 1),
+            "slowest": self.get_slowest(),
+        }
+
+
+@contextmanager
+def query_budget(max_queries):
+    """
+    Fails with `QueryBudgetExceeded` when the block issues more than
+    `max_queries` queries, e.g. around a test client call.
+    """
+    with QueryStats(slowest=0).record() as stats:
+        yield stats
+    if stats.count > max_queries:
+        raise QueryBudgetExceeded(
+            "%s queries issued, the budget is %s" % (stats.count, max_queries)
+        )
+
+
+def get_header_value(sql, max_length=200):
+    # Headers must stay on one line and in latin-1
+    value = WHITESPACE_RE.sub(" ", sql)[:max_length]
+    return value.encode("ascii", "backslashreplace").decode()
+
+
+class QueryStatsMiddleware:
+    """
+    Records the queries of every request and reports them as a structured
+    log line, and in `X-DB-*` response headers when QUERY_STATS_HEADERS is
+    set.
+
+    Views declare query budgets per action in `query_budget_map`. A request
+    over budget is logged as a warning, or fails with `QueryBudgetExceeded`
+    when QUERY_BUDGET_STRICT is set (always in tests).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.QUERY_STATS_ENABLED:
+            return self.get_response(request)
+
+        request.query_budget = None
+        stack = ExitStack()
+        stats = stack.enter_context(QueryStats().record())
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            stack.close()
+            raise
+        if response.streaming:
+            # Streamed bodies query the database while being consumed
+            response.streaming_content = self.stream(
+                response.streaming_content, stack, request, response, stats
+            )
+            return response
+        stack.close()
+        self.report(request, response, stats)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, "cls", None)
+        budgets = getattr(view_class, "query_budget_map", None)
+        if not budgets:
+            return None
+        # Viewsets map HTTP methods to actions, plain views use the method
+        actions = getattr(view_func, "actions", None) or {}
+        method = request.method.lower()
+        request.query_budget = budgets.get(actions.get(method, method))
+        return None
+
+    def stream(self, content, stack, request, response, stats):
+        try:
+            yield from content
+        finally:
+            stack.close()
+            self.report(request, response, stats)
+
+    def report(self, request, response, stats):
+        budget = getattr(request, "query_budget", None)
+        over_budget = budget is not None and stats.count > budget
+        if settings.QUERY_STATS_HEADERS and not response.streaming:
+            response["X-DB-Query-Count"] = str(stats.count)
+            response["X-DB-Query-Time"] = "%.1fms" % (stats.duration * 1000)
+            if budget is not None:
+                response["X-DB-Query-Budget"] = str(budget)
+            for i, query in enumerate(stats.get_slowest()):
+                response["X-DB-Slowest-Query-%s" % (i + 1)] = "%sms %s" % (
+                    query["ms"],
+                    get_header_value(query["sql"]),
+                )
+        data = dict(
+            stats.as_dict(),
+            method=request.method,
+            path=request.path,
+            status=response.status_code,
+            budget=budget,
+        )
+        if over_budget:
+            message = "%s %s issued %s queries, the budget is %s" % (
+                request.method,
+                request.path,
+                stats.count,
+                budget,
+            )
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message, extra={"query_stats": data})
+        else:
+            logger.info(
+                "%s %s status=%s queries=%s db_ms=%s",
+                request.method,
+                request.path,
+                response.status_code,
+                stats.count,
+                data["db_ms"],
+                extra={"query_stats": data},
+            )
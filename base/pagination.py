@@ -0,0 +1,143 @@
+import base64
+import datetime
+import json
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.utils.urls import replace_query_param
+
+
+class CursorPagination(BasePagination):
+    """
+    Keyset pagination: each page continues after the (ordering field, id) of
+    the last row of the previous page, so deep pages cost the same indexed
+    range scan as the first one. The cursor of the next page is returned in
+    the ``X-Next-Cursor`` and ``Link`` headers, leaving the response body as is.
+
+    Views may set ``cursor_ordering`` (e.g. ``"-created_at"``) to choose the
+    ordering field or annotation; by default ``-created_at`` is used when the
+    model has it.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+
+    def __init__(self):
+        self.page_size = settings.API_PAGE_SIZE
+        self.max_page_size = settings.API_MAX_PAGE_SIZE
+        self.next_cursor = None
+        self.request = None
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def get_ordering(self, queryset, view):
+        ordering = getattr(view, "cursor_ordering", None)
+        if ordering:
+            return ordering
+        try:
+            queryset.model._meta.get_field("created_at")
+        except FieldDoesNotExist:
+            return "pk"
+        return "-created_at"
+
+    def decode_cursor(self, request, field):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            if value is not None:
+                value = field.to_python(value)
+        except Exception:
+            raise NotFound("Invalid cursor")
+        return value, pk
+
+    def encode_cursor(self, instance, field_name):
+        value = getattr(instance, field_name)
+        if isinstance(value, (datetime.datetime, datetime.time)):
+            # DjangoJSONEncoder would truncate microseconds
+            value = value.isoformat()
+        return base64.urlsafe_b64encode(
+            json.dumps([value, instance.pk], cls=DjangoJSONEncoder).encode()
+        ).decode()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        ordering = self.get_ordering(queryset, view)
+        descending = ordering.startswith("-")
+        field_name = ordering.lstrip("-")
+        if field_name == "pk":
+            field_name = queryset.model._meta.pk.name
+        if field_name in queryset.query.annotations:
+            # Computed orderings, e.g. the distance of a nearby search
+            field = queryset.query.annotations[field_name].output_field
+        else:
+            field = queryset.model._meta.get_field(field_name)
+            field_name = field.attname
+        pk_name = queryset.model._meta.pk.attname
+
+        # NULLs always sort last so the keyset condition below stays simple. The
+        # modifier is only added for nullable fields since it defeats the index
+        # on backends that emulate it (MySQL).
+        nulls_last = True if field.null else None
+        order_by = [
+            F(field_name).desc(nulls_last=nulls_last)
+            if descending
+            else F(field_name).asc(nulls_last=nulls_last)
+        ]
+        if field_name != pk_name:
+            order_by.append(F(pk_name).desc() if descending else F(pk_name).asc())
+        queryset = queryset.order_by(*order_by)
+
+        cursor = self.decode_cursor(request, field)
+        if cursor:
+            value, pk = cursor
+            after = "lt" if descending else "gt"
+            after_pk = Q(**{"%s__%s" % (pk_name, after): pk})
+            if field_name == pk_name:
+                queryset = queryset.filter(after_pk)
+            elif value is None:
+                queryset = queryset.filter(
+                    Q(**{"%s__isnull" % field_name: True}), after_pk
+                )
+            else:
+                condition = Q(**{"%s__%s" % (field_name, after): value}) | Q(
+                    Q(**{field_name: value}), after_pk
+                )
+                if field.null:
+                    condition |= Q(**{"%s__isnull" % field_name: True})
+                queryset = queryset.filter(condition)
+
+        results = list(queryset[: page_size + 1])
+        self.next_cursor = None
+        if len(results) > page_size:
+            results = results[:page_size]
+            self.next_cursor = self.encode_cursor(results[-1], field_name)
+        return results
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.next_cursor,
+        )
+
+    def get_headers(self):
+        if not self.next_cursor:
+            return {}
+        return {
+            "X-Next-Cursor": self.next_cursor,
+            "Link": '<%s>; rel="next"' % self.get_next_link(),
+        }
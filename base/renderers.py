@@ -1,8 +1,58 @@
+import decimal
+
 from rest_framework.renderers import JSONRenderer
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# orjson handles str, int, float, dict, list, tuple and UUID natively; datetimes
+# are passed through to `default` so they keep DRF's ECMA 262 formatting
+ORJSON_OPTIONS = (
+    orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME if orjson else 0
+)
+
+# U+2028 and U+2029 are valid JSON but not valid javascript, DRF escapes them
+LINE_SEPARATORS = (
+    ("\u2028".encode(), b"\\u2028"),
+    ("\u2029".encode(), b"\\u2029"),
+)
+
 
 class ApiRenderer(JSONRenderer):
-    def render(self, data, accepted_media_type=None, renderer_context=None):
+    """
+    Wraps every response in the `{"detail", "data", "error"}` envelope.
+
+    Encodes with orjson and falls back to DRF's encoder for everything it does
+    not know, so the output is byte-identical to `JSONRenderer` except for
+    floats written in exponent notation (`1e-7` instead of `1e-07`) and NaN,
+    which renders as null instead of failing. Indented output and payloads
+    orjson rejects (e.g. integers over 64 bits) are rendered by `JSONRenderer`
+    itself.
+    """
+
+    def __init__(self):
+        self.encoder = self.encoder_class()
+
+    def default(self, obj):
+        if type(obj) is decimal.Decimal:
+            return float(obj)
+        return self.encoder.default(obj)
+
+    def dumps(self, data):
+        if orjson is None:
+            return super().render(data)
+        try:
+            ret = orjson.dumps(data, default=self.default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data)
+        for separator, escaped in LINE_SEPARATORS:
+            if separator in ret:
+                ret = ret.replace(separator, escaped)
+        return ret
+
+    def get_envelope(self, data):
         response_dict = {
             "detail": None,
             "data": None,
@@ -19,4 +69,10 @@ class ApiRenderer(JSONRenderer):
             error["code"] = data.get("code")
         if error:
             response_dict["error"] = error
-        return super().render(response_dict, accepted_media_type, renderer_context)
+        return response_dict
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response_dict = self.get_envelope(data)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(response_dict, accepted_media_type, renderer_context)
+        return self.dumps(response_dict)
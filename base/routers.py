@@ -0,0 +1,124 @@
+import random
+from contextlib import contextmanager
+
+from asgiref.local import Local
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_KEY = "db:pin:%s"
+
+_state = Local()
+
+
+def get_replicas():
+    return [
+        alias for alias in settings.DATABASE_REPLICAS if alias in settings.DATABASES
+    ]
+
+
+def reset_state():
+    _state.replica = None
+    _state.wrote = False
+
+
+def use_replica_reads():
+    """
+    Sends the reads of the current request to one replica, picked once so a
+    request sees a consistent snapshot.
+    """
+    replicas = get_replicas()
+    _state.replica = random.choice(replicas) if replicas else None
+
+
+def get_replica():
+    """Returns the replica the current reads go to, if any."""
+    if has_written():
+        return None
+    return getattr(_state, "replica", None)
+
+
+def has_written():
+    return getattr(_state, "wrote", False)
+
+
+@contextmanager
+def replica_reads():
+    previous = getattr(_state, "replica", None)
+    use_replica_reads()
+    try:
+        yield _state.replica
+    finally:
+        _state.replica = previous
+
+
+def pin_to_primary(user_id):
+    """
+    Reads of the user go to the primary for REPLICA_PIN_SECONDS, long enough
+    for the replicas to catch up with the user's own writes.
+    """
+    cache.set(PIN_KEY % user_id, True, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user_id):
+    return bool(cache.get(PIN_KEY % user_id))
+
+
+class ReplicaRouter:
+    """
+    Routes reads to the replica chosen for the current request, if any, and
+    everything else to the primary. Reads fall back to the primary once the
+    request has written or while a transaction is open on the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        replica = getattr(_state, "replica", None)
+        if (
+            not replica
+            or has_written()
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas hold the same rows as the primary
+        return True
+
+
+class ReplicaMiddleware:
+    """
+    Starts every request on the primary and pins users who wrote to it.
+    Views opt their safe requests into replica reads, see
+    `BaseViewSet.use_replica`.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        reset_state()
+        try:
+            response = self.get_response(request)
+            user = getattr(request, "user", None)
+            if has_written() and user is not None and user.is_authenticated:
+                pin_to_primary(user.pk)
+            if response.streaming and _state.replica:
+                response.streaming_content = self.stream(
+                    response.streaming_content, _state.replica
+                )
+            return response
+        finally:
+            reset_state()
+
+    def stream(self, content, replica):
+        # Streamed bodies query the database while being consumed
+        _state.replica = replica
+        try:
+            yield from content
+        finally:
+            reset_state()
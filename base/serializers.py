@@ -19,3 +19,21 @@ class MoneyField(serializers.Field):
         amount = data.get("amount")
         currency = data.get("currency")
         return Money(amount, currency)
+
+
+class EagerLoadingMixin:
+    """
+    Declares the relations a serializer walks so the queryset feeding it can be
+    shaped up-front instead of issuing one query per nested object.
+    """
+
+    select_related_fields = []
+    prefetch_related_fields = []
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        if cls.select_related_fields:
+            queryset = queryset.select_related(*cls.select_related_fields)
+        if cls.prefetch_related_fields:
+            queryset = queryset.prefetch_related(*cls.prefetch_related_fields)
+        return queryset
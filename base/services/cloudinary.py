@@ -1,22 +1,35 @@
-import cloudinary
-import cloudinary.api
-import cloudinary.uploader
+from .images import prepare_image
+from .storage import get_storage
 
 
 class CloudinaryService:
+    """
+    Media uploads of the API. Files go to the storage configured by
+    ``MEDIA_STORAGE``, Cloudinary in production.
+    """
+
     @classmethod
     def upload_image(cls, image, folder: str):
-        url = cloudinary.uploader.upload(image, folder=folder).get("url")
-        return url
+        """Resizes and re-encodes the image locally, then uploads it."""
+        staged = prepare_image(image)
+        try:
+            return get_storage().upload(staged, folder)
+        finally:
+            staged.close()
 
     @classmethod
     def upload_images(cls, images, folder: str):
-        urls = []
-        for image in images:
-            url = cls.upload_image(image, folder)
-            urls.append(url)
-        return urls
+        """
+        Uploads the images concurrently.
+        :return: The urls, in input order. If any upload fails, the uploaded
+            images are deleted and the first error is raised.
+        """
+        return get_storage().upload_many(images, folder, upload=cls.upload_image)
+
+    @classmethod
+    def delete_image(cls, url: str):
+        return get_storage().delete(url)
 
     @classmethod
-    def delete_image(cls, public_id, folder: str):
-        return cloudinary.uploader.destroy(public_id, folder=folder)
+    def delete_images(cls, urls):
+        return get_storage().delete_many(urls)
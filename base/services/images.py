@@ -0,0 +1,49 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+
+def prepare_image(image):
+    """
+    Re-encodes an uploaded image so its longest side is at most
+    ``IMAGE_MAX_DIMENSION`` pixels: JPEG, or PNG when it has transparency.
+    The result is a ``File`` spooled to a temporary file, on disk once it
+    outgrows ``IMAGE_SPOOL_MAX_MEMORY`` bytes; the caller closes it.
+
+    Formats Pillow can not open (e.g. HEIC from iPhones) are returned as is,
+    left to the storage to convert.
+    """
+    if hasattr(image, "seek"):
+        image.seek(0)
+    try:
+        opened = Image.open(image)
+    except UnidentifiedImageError:
+        if hasattr(image, "seek"):
+            image.seek(0)
+        return image
+    with opened as source:
+        source = ImageOps.exif_transpose(source)
+        max_size = settings.IMAGE_MAX_DIMENSION
+        source.thumbnail((max_size, max_size))
+        has_alpha = source.mode in ("RGBA", "LA") or (
+            source.mode == "P" and "transparency" in source.info
+        )
+        staged = tempfile.SpooledTemporaryFile(max_size=settings.IMAGE_SPOOL_MAX_MEMORY)
+        if has_alpha:
+            source.convert("RGBA").save(staged, format="PNG", optimize=True)
+            extension = ".png"
+        else:
+            source.convert("RGB").save(
+                staged,
+                format="JPEG",
+                quality=settings.IMAGE_JPEG_QUALITY,
+                optimize=True,
+                progressive=True,
+            )
+            extension = ".jpg"
+    staged.seek(0)
+    name = os.path.splitext(os.path.basename(getattr(image, "name", "") or "image"))
+    return File(staged, name=name[0] + extension)
@@ -0,0 +1,175 @@
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import cloudinary.api
+import cloudinary.uploader
+from django.conf import settings
+from django.core.files import File
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Cloudinary deletes at most 100 resources per Admin API call
+CLOUDINARY_DELETE_LIMIT = 100
+
+_storage = None
+_executor = None
+_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.MEDIA_UPLOAD_WORKERS,
+                    thread_name_prefix="media-upload",
+                )
+    return _executor
+
+
+def _chunks(file):
+    """Reads ``file`` in ``MEDIA_CHUNK_SIZE`` chunks, never all at once."""
+    if not isinstance(file, File):
+        file = File(file)
+    if hasattr(file, "seek"):
+        file.seek(0)
+    return file.chunks(settings.MEDIA_CHUNK_SIZE)
+
+
+class Storage:
+    """
+    Where uploaded media is kept. Drivers implement ``upload`` and ``delete``;
+    files are addressed by the url ``upload`` returns.
+    """
+
+    def upload(self, file, folder: str) -> str:
+        raise NotImplementedError
+
+    def delete(self, url: str):
+        raise NotImplementedError
+
+    def delete_many(self, urls):
+        for url in urls:
+            self.delete(url)
+
+    def upload_many(self, files, folder: str, upload=None):
+        """
+        Uploads ``files`` concurrently from a bounded pool, through ``upload``
+        (default ``self.upload``) when the files need pre-processing.
+        :return: The urls, in input order. If any upload fails, the uploaded
+            files are deleted and the first error is raised.
+        """
+        upload = upload or self.upload
+        futures = [_get_executor().submit(upload, file, folder) for file in files]
+        urls = []
+        error = None
+        for future in futures:
+            try:
+                urls.append(future.result())
+            except Exception as e:
+                logger.warning("Error uploading file to %s: %s", folder, e)
+                error = error or e
+        if error:
+            if urls:
+                self.delete_many(urls)
+            raise error
+        return urls
+
+
+class CloudinaryStorage(Storage):
+    # e.g. https://res.cloudinary.com/<cloud>/image/upload/v123/<public id>.jpg
+    url_re = re.compile(r"/upload/(?:v\d+/)?(?P<public_id>.+?)(?:\.\w+)?$")
+
+    def upload(self, file, folder: str) -> str:
+        # Sent as chunked requests, the file is never read in one piece
+        result = cloudinary.uploader.upload_large(
+            file, folder=folder, chunk_size=settings.MEDIA_CHUNK_SIZE
+        )
+        return result.get("url")
+
+    def get_public_id(self, url: str):
+        match = self.url_re.search(url or "")
+        return match.group("public_id") if match else None
+
+    def delete(self, url: str):
+        self.delete_many([url])
+
+    def delete_many(self, urls):
+        public_ids = [
+            public_id for public_id in map(self.get_public_id, urls) if public_id
+        ]
+        for i in range(0, len(public_ids), CLOUDINARY_DELETE_LIMIT):
+            cloudinary.api.delete_resources(public_ids[i : i + CLOUDINARY_DELETE_LIMIT])
+
+
+class FileSystemStorage(Storage):
+    """
+    Keeps files under ``root`` (``MEDIA_ROOT``), e.g. for offline development
+    and load tests. ``latency`` (seconds) simulates the network round trip of
+    each upload.
+    """
+
+    def __init__(self, root=None, base_url=None, latency=0):
+        self.root = root or settings.MEDIA_ROOT
+        self.base_url = base_url or settings.MEDIA_URL
+        self.latency = latency
+
+    def upload(self, file, folder: str) -> str:
+        if self.latency:
+            time.sleep(self.latency)
+        extension = os.path.splitext(getattr(file, "name", "") or "")[1]
+        name = os.path.join(folder or "", uuid.uuid4().hex + extension)
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as destination:
+            for chunk in _chunks(file):
+                destination.write(chunk)
+        return self.base_url + name
+
+    def delete(self, url: str):
+        if not url.startswith(self.base_url):
+            return
+        path = os.path.join(self.root, url[len(self.base_url) :])
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class MemoryStorage(Storage):
+    """Keeps files in ``self.files`` by url, for tests and benchmarks."""
+
+    def __init__(self, latency=0):
+        self.latency = latency
+        self.files = {}
+
+    def upload(self, file, folder: str) -> str:
+        if self.latency:
+            time.sleep(self.latency)
+        extension = os.path.splitext(getattr(file, "name", "") or "")[1]
+        url = "memory://%s%s%s" % (folder or "", uuid.uuid4().hex, extension)
+        self.files[url] = b"".join(_chunks(file))
+        return url
+
+    def delete(self, url: str):
+        self.files.pop(url, None)
+
+
+def get_storage() -> Storage:
+    global _storage
+    if _storage is None:
+        with _lock:
+            if _storage is None:
+                _storage = import_string(settings.MEDIA_STORAGE)()
+    return _storage
+
+
+def set_storage(storage):
+    """Swaps the storage, e.g. for ``MemoryStorage`` in benchmarks."""
+    global _storage
+    _storage = storage
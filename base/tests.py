@@ -1,3 +1,515 @@
-from django.test import TestCase
+import datetime
+import decimal
+import os
+import runpy
+import tempfile
+import time
+import uuid
+import warnings
+from unittest import mock
 
-# Create your tests here.
+from account.models import Address, Salon, User
+from account.serializers.salon import SalonSerializer
+from booking.models import Booking, BookingService
+from booking.serializers import BookingSerializer
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.utils import OperationalError
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from notification.models import ConcatNotification
+from notification.views import NotificationViewSet
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from service.models import Service
+
+from .db.backends.sqlite3.base import DatabaseWrapper
+from .db.pool import ConnectionPool, close_pools, get_pools
+from .middleware import QueryBudgetExceeded, query_budget
+from .renderers import ApiRenderer
+from .services.images import prepare_image
+from .services import storage as storage_module
+from .services.storage import FileSystemStorage, MemoryStorage
+from .routers import ReplicaRouter, is_pinned
+
+REPLICA = "replica_1"
+
+
+@override_settings(REPLICA_PIN_SECONDS=1)
+class ReplicaRoutingTestCase(TransactionTestCase):
+    # The router keeps reads on the primary inside transactions, so the tests
+    # can not run in one
+
+    def setUp(self):
+        cache.clear()
+        databases = dict(settings.DATABASES)
+        databases[REPLICA] = dict(databases[DEFAULT_DB_ALIAS])
+        override = override_settings(DATABASES=databases, DATABASE_REPLICAS=[REPLICA])
+        with warnings.catch_warnings():
+            # Django warns that connections are not rebuilt, see below
+            warnings.simplefilter("ignore")
+            override.enable()
+        self.addCleanup(override.disable)
+        # The replica reads the test database through the primary's connection
+        connections[REPLICA] = connections[DEFAULT_DB_ALIAS]
+        self.addCleanup(connections.__delitem__, REPLICA)
+
+        self.routes = []
+        self.patch_router("db_for_read", "read")
+        self.patch_router("db_for_write", "write")
+
+        Salon.objects.create(username="salon", email="salon@l", is_salon=True)
+        self.user = User.objects.create(username="customer", email="customer@l")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.routes.clear()
+
+    def patch_router(self, name, kind):
+        method = getattr(ReplicaRouter, name)
+
+        def route(router, model, **hints):
+            alias = method(router, model, **hints)
+            self.routes.append((kind, alias))
+            return alias
+
+        patcher = mock.patch.object(ReplicaRouter, name, route)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_aliases(self, kind):
+        return {alias for route_kind, alias in self.routes if route_kind == kind}
+
+    def request(self, method, url, **kwargs):
+        self.routes.clear()
+        response = getattr(self.client, method)(url, **kwargs)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_get_reads_from_replica(self):
+        response = self.request("get", "/salons/")
+        self.assertEqual(len(response.data["data"]), 1)
+        self.assertEqual(self.get_aliases("read"), {REPLICA})
+        self.assertFalse(is_pinned(self.user.pk))
+
+    def test_write_goes_to_primary(self):
+        self.request("post", "/fcmToken/", data={"fcm_token": "token"})
+        self.assertEqual(self.get_aliases("write"), {DEFAULT_DB_ALIAS})
+        self.assertEqual(self.user.device_tokens.count(), 1)
+
+    def test_user_pinned_to_primary_after_write(self):
+        self.request("post", "/fcmToken/", data={"fcm_token": "token"})
+        self.assertTrue(is_pinned(self.user.pk))
+
+        self.request("get", "/salons/")
+        self.assertEqual(self.get_aliases("read"), {DEFAULT_DB_ALIAS})
+
+        time.sleep(settings.REPLICA_PIN_SECONDS + 0.1)
+        self.assertFalse(is_pinned(self.user.pk))
+        self.request("get", "/salons/")
+        self.assertEqual(self.get_aliases("read"), {REPLICA})
+
+    def test_replicas_need_shared_cache(self):
+        # A per-process cache would lose the pins set by the other processes
+        path = str(settings.BASE_DIR / "core" / "settings.py")
+        shared = "django.core.cache.backends.memcached.PyMemcacheCache"
+        with mock.patch.dict(os.environ, {"MYSQL_REPLICA_HOSTS": "replica"}):
+            with mock.patch.dict(os.environ, {"CACHE_BACKEND": ""}):
+                with self.assertRaisesMessage(
+                    ImproperlyConfigured, "MYSQL_REPLICA_HOSTS"
+                ):
+                    runpy.run_path(path)
+            with mock.patch.dict(os.environ, {"CACHE_BACKEND": shared}):
+                replicas = runpy.run_path(path)["DATABASE_REPLICAS"]
+        self.assertEqual(replicas, [REPLICA])
+
+
+class ConditionalGetTestCase(TestCase):
+    def setUp(self):
+        self.salon = Salon.objects.create(
+            username="salon", email="salon@l", is_salon=True
+        )
+        self.user = User.objects.create(username="customer", email="customer@l")
+        Booking.objects.create(user=self.user, salon=self.salon)
+        self.notification = ConcatNotification.objects.create(
+            recipient=self.user, verb="booking_placed"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_root_rows_only_list(self):
+        response = self.client.get("/notifications/")
+        etag = response["ETag"]
+        response = self.client.get("/notifications/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.notification.mark_as_read()
+        response = self.client.get("/notifications/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_nested_lists_not_conditional(self):
+        # A rename of the nested salon would not change their validator
+        for user, url in [(self.user, "/bookings/"), (self.salon, "/salonBookings/")]:
+            self.client.force_authenticate(user)
+            response = self.client.get(url, HTTP_IF_NONE_MATCH="*")
+            self.assertEqual(response.status_code, 200, url)
+            self.assertFalse(response.has_header("ETag"), url)
+
+
+@mock.patch("base.db.pool.time.monotonic", return_value=0)
+class ConnectionPoolTestCase(SimpleTestCase):
+    def setUp(self):
+        self.opened = []
+
+    def connect(self):
+        connection = mock.Mock()
+        self.opened.append(connection)
+        return connection
+
+    def test_acquire_release(self, monotonic):
+        pool = ConnectionPool(self.connect, 2)
+        connection = pool.acquire()
+        pool.release(connection)
+        self.assertIs(pool.acquire(), connection)
+        self.assertIsNot(pool.acquire(), connection)
+        self.assertEqual(
+            pool.get_stats(),
+            {"size": 2, "open": 2, "idle": 0, "created": 2, "reused": 1},
+        )
+
+    def test_exhausted(self, monotonic):
+        pool = ConnectionPool(self.connect, 1, timeout=0.01)
+        connection = pool.acquire()
+        with self.assertRaises(OperationalError):
+            pool.acquire()
+        pool.release(connection)
+        self.assertIs(pool.acquire(), connection)
+
+    def test_release_unusable(self, monotonic):
+        pool = ConnectionPool(self.connect, 1, timeout=0.01)
+        connection = pool.acquire()
+        pool.release(connection, reusable=False)
+        connection.close.assert_called_once()
+        # The slot is free again
+        self.assertIsNot(pool.acquire(), connection)
+        self.assertEqual(pool.get_stats()["open"], 1)
+
+    def test_recycle(self, monotonic):
+        pool = ConnectionPool(self.connect, 1, recycle=60, check_after=3600)
+        connection = pool.acquire()
+        monotonic.return_value = 59
+        pool.release(connection)
+        self.assertIs(pool.acquire(), connection)
+        pool.release(connection)
+        monotonic.return_value = 61
+        self.assertIsNot(pool.acquire(), connection)
+        connection.close.assert_called_once()
+        self.assertEqual(pool.get_stats()["open"], 1)
+
+    def test_health_check(self, monotonic):
+        pool = ConnectionPool(self.connect, 1, check_after=30)
+        connection = pool.acquire()
+        pool.release(connection)
+        # Recently released, handed out without a ping
+        monotonic.return_value = 10
+        self.assertIs(pool.acquire(), connection)
+        connection.cursor.assert_not_called()
+        pool.release(connection)
+
+        monotonic.return_value = 50
+        self.assertIs(pool.acquire(), connection)
+        connection.cursor.assert_called_once()
+        pool.release(connection)
+
+        connection.cursor.side_effect = OperationalError
+        monotonic.return_value = 100
+        self.assertIsNot(pool.acquire(), connection)
+        connection.close.assert_called_once()
+
+
+class PooledDatabaseWrapperTestCase(SimpleTestCase):
+    alias = "pooled"
+
+    def setUp(self):
+        # Closing an in-memory SQLite database is a no-op, hence the file
+        path = tempfile.mkstemp(suffix=".sqlite3")[1]
+        self.addCleanup(os.remove, path)
+        settings_dict = dict(
+            connections[DEFAULT_DB_ALIAS].settings_dict,
+            NAME=path,
+            CONN_MAX_AGE=None,
+            CONN_HEALTH_CHECKS=True,
+            POOL_SIZE=1,
+            POOL_TIMEOUT=0.01,
+        )
+        self.wrapper = DatabaseWrapper(settings_dict, self.alias)
+        connections[self.alias] = self.wrapper
+        self.addCleanup(close_pools)
+        self.addCleanup(connections.__delitem__, self.alias)
+        self.addCleanup(self.wrapper.close)
+
+    def connect(self):
+        self.wrapper.ensure_connection()
+        return self.wrapper.connection
+
+    def get_stats(self):
+        return get_pools()[self.alias].get_stats()
+
+    def test_reused(self):
+        connection = self.connect()
+        self.wrapper.close()
+        self.assertEqual(self.get_stats()["idle"], 1)
+        self.assertIs(self.connect(), connection)
+
+    def test_rolled_back_before_reuse(self):
+        connection = self.connect()
+        self.wrapper.cursor().execute("CREATE TABLE item (id integer)")
+        self.wrapper.set_autocommit(False)
+        self.wrapper.cursor().execute("INSERT INTO item VALUES (1)")
+        self.wrapper.close()
+        self.assertIs(self.connect(), connection)
+        with self.wrapper.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM item")
+            self.assertEqual(cursor.fetchone(), (0,))
+
+    def test_discarded_after_errors(self):
+        connection = self.connect()
+        self.wrapper.errors_occurred = True
+        self.wrapper.close()
+        self.assertEqual(self.get_stats()["open"], 0)
+        self.assertIsNot(self.connect(), connection)
+
+    def test_discarded_in_transaction(self):
+        connection = self.connect()
+        with transaction.atomic(using=self.alias):
+            self.wrapper.close()
+            self.assertEqual(self.get_stats()["open"], 0)
+        self.assertIsNot(self.connect(), connection)
+
+    def test_health_check_replaces_connection(self):
+        connection = self.connect()
+        # Request boundary, the next use checks the connection
+        self.wrapper.close_if_unusable_or_obsolete()
+        with mock.patch.object(self.wrapper, "is_usable", return_value=False):
+            self.assertIsNot(self.connect(), connection)
+        self.assertEqual(self.get_stats()["created"], 2)
+        self.assertEqual(self.get_stats()["open"], 1)
+
+
+class QueryStatsTestCase(TestCase):
+    url = "/notifications/"
+
+    def setUp(self):
+        self.user = User.objects.create(username="customer", email="customer@l")
+        ConcatNotification.objects.create(recipient=self.user, verb="booking_placed")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_headers_off_by_default(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(
+            [header for header in response.headers if header.startswith("X-DB-")]
+        )
+
+    @override_settings(QUERY_STATS_HEADERS=True)
+    def test_headers(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(int(response["X-DB-Query-Count"]), 5)
+        self.assertRegex(response["X-DB-Query-Time"], r"^\d+\.\dms$")
+        self.assertEqual(response["X-DB-Query-Budget"], "5")
+        self.assertRegex(response["X-DB-Slowest-Query-1"], r"^[\d.]+ms SELECT ")
+
+    def test_budget_enforced_in_tests(self):
+        self.assertTrue(settings.QUERY_BUDGET_STRICT)
+        with mock.patch.dict(NotificationViewSet.query_budget_map, {"list": 0}):
+            with self.assertRaisesMessage(QueryBudgetExceeded, "the budget is 0"):
+                self.client.get(self.url)
+
+    @override_settings(QUERY_BUDGET_STRICT=False)
+    def test_budget_logged(self):
+        with mock.patch.dict(NotificationViewSet.query_budget_map, {"list": 0}):
+            with self.assertLogs("base.middleware", "WARNING") as logs:
+                response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("the budget is 0", logs.output[0])
+
+    def test_query_budget(self):
+        with query_budget(1):
+            User.objects.count()
+        with self.assertRaises(QueryBudgetExceeded):
+            with query_budget(1):
+                User.objects.count()
+                User.objects.count()
+
+
+class ApiRendererTestCase(TestCase):
+    def setUp(self):
+        address = Address.objects.create(
+            hamlet="12 Nguyễn Huệ",
+            ward="Bến Nghé",
+            district="1",
+            province="Hồ Chí Minh",
+        )
+        self.salon = Salon.objects.create(
+            username="salon",
+            email="salon@example.com",
+            salon_name="Salon Hoà \u2028 ✂",
+            is_salon=True,
+            vote_rate=4.25,
+            address=address,
+        )
+        user = User.objects.create(
+            username="customer", email="customer@l", first_name="Đức", address=address
+        )
+        self.booking = Booking.objects.create(
+            user=user,
+            salon=self.salon,
+            total_net_amount=decimal.Decimal("150000.50"),
+            start_at=timezone.now(),
+            review="Rất tốt",
+            rating=5,
+        )
+        BookingService.objects.create(
+            booking=self.booking, service=Service.objects.create(name="Gội đầu")
+        )
+
+    def assertRendersLikeJSONRenderer(self, data):
+        renderer = ApiRenderer()
+        self.assertEqual(
+            renderer.render(data), JSONRenderer().render(renderer.get_envelope(data))
+        )
+
+    def test_booking(self):
+        data = BookingSerializer(self.booking).data
+        self.assertIsInstance(data["total_net"]["amount"], decimal.Decimal)
+        self.assertRendersLikeJSONRenderer({"detail": None, "data": data})
+
+    def test_salon(self):
+        self.assertRendersLikeJSONRenderer(
+            {"data": [SalonSerializer(self.salon).data], "detail": "Xong"}
+        )
+
+    def test_python_values(self):
+        self.assertRendersLikeJSONRenderer(
+            {
+                "data": {
+                    "id": uuid.uuid4(),
+                    "amount": decimal.Decimal("12.30"),
+                    "created_at": datetime.datetime(
+                        2022, 6, 1, 10, 30, 15, 123456, tzinfo=timezone.utc
+                    ),
+                    "date": datetime.date(2022, 6, 1),
+                    "time": datetime.time(9, 30),
+                    "label": gettext_lazy("Booking"),
+                    "text": "Đặt lịch \u2029 thành công",
+                    1: [1.5, None, True],
+                },
+                "code": "invalid",
+                "messages": {"name": [gettext_lazy("This field is required.")]},
+            }
+        )
+
+
+class ImageUploadTestCase(SimpleTestCase):
+    def test_unknown_format_passed_through(self):
+        # The header of a HEIC photo, which Pillow can not open
+        content = b"\x00\x00\x00\x18ftypheic\x00\x00\x00\x00mif1heic" + b"\x00" * 64
+        image = SimpleUploadedFile("photo.heic", content, "image/heic")
+        image.read(10)
+        self.assertIs(prepare_image(image), image)
+        self.assertEqual(image.read(), content)
+
+    def test_upload_many_rolls_back(self):
+        class FailingStorage(MemoryStorage):
+            def upload(self, file, folder):
+                # Uploads run concurrently, the failing one is chosen by name
+                if file.name == "second.jpg":
+                    raise IOError("Upload failed")
+                return super().upload(file, folder)
+
+        storage = FailingStorage()
+        files = [
+            SimpleUploadedFile(name, b"content")
+            for name in ("first.jpg", "second.jpg", "third.jpg")
+        ]
+        with self.assertLogs("base.services.storage", "WARNING"):
+            with self.assertRaisesMessage(IOError, "Upload failed"):
+                storage.upload_many(files, "gallery/")
+        self.assertEqual(storage.files, {})
+
+        urls = storage.upload_many(files[:1] + files[2:], "gallery/")
+        # The urls keep the order of the files, the uploads finish in any
+        self.assertEqual(len(urls), 2)
+        self.assertEqual(set(storage.files), set(urls))
+
+
+# Files span several chunks
+@override_settings(MEDIA_CHUNK_SIZE=4)
+class StorageTestCase(SimpleTestCase):
+    content = b"0123456789"
+
+    def get_file(self, name="photo.jpg"):
+        return ContentFile(self.content, name=name)
+
+    def test_file_system(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        storage = FileSystemStorage(root.name, "https://cdn.example.com/media/")
+        file = self.get_file()
+        # Read from the start, whatever was read before
+        file.read(3)
+        url = storage.upload(file, "gallery/")
+        self.assertRegex(url, r"^https://cdn\.example\.com/media/gallery/\w{32}\.jpg$")
+        path = os.path.join(root.name, url[len(storage.base_url) :])
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertNotEqual(storage.upload(self.get_file(), "gallery/"), url)
+
+        # Urls of other storages are left alone
+        storage.delete("https://res.cloudinary.com/demo/image/upload/gallery/a.jpg")
+        self.assertTrue(os.path.exists(path))
+        storage.delete(url)
+        self.assertFalse(os.path.exists(path))
+        # Deleting twice is a no-op
+        storage.delete(url)
+
+    def test_file_system_defaults(self):
+        with override_settings(MEDIA_ROOT="/tmp/media", MEDIA_URL="/files/"):
+            storage = FileSystemStorage()
+        self.assertEqual((storage.root, storage.base_url), ("/tmp/media", "/files/"))
+
+    def test_memory(self):
+        storage = MemoryStorage()
+        url = storage.upload(self.get_file("photo.png"), "avatar/")
+        self.assertRegex(url, r"^memory://avatar/\w{32}\.png$")
+        other = storage.upload(self.get_file("no-extension"), "")
+        self.assertRegex(other, r"^memory://\w{32}$")
+        self.assertEqual(storage.files, {url: self.content, other: self.content})
+
+        storage.delete_many([url, "memory://missing.jpg"])
+        self.assertEqual(list(storage.files), [other])
+        storage.delete(other)
+        self.assertEqual(storage.files, {})
+
+    @override_settings(MEDIA_STORAGE="base.services.storage.MemoryStorage")
+    def test_get_storage(self):
+        self.addCleanup(storage_module.set_storage, storage_module._storage)
+        storage_module.set_storage(None)
+        storage = storage_module.get_storage()
+        self.assertIsInstance(storage, MemoryStorage)
+        self.assertIs(storage_module.get_storage(), storage)
+        replacement = MemoryStorage()
+        storage_module.set_storage(replacement)
+        self.assertIs(storage_module.get_storage(), replacement)
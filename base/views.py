@@ -1,19 +1,58 @@
-from django.core.exceptions import ValidationError
+import hashlib
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Count, Max
+from django.http import HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
 from rest_framework import status, views, viewsets
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.response import Response
 
-from base import CoreErrorCode
+from base import CoreErrorCode, routers
+from base.pagination import CursorPagination
 
 
 class BaseViewSet(viewsets.ModelViewSet):
     serializer_class = None
+    pagination_class = CursorPagination
+    cursor_ordering = None
+    # Actions answering conditional GETs from the default validator, only
+    # those rendering nothing but the rows of their queryset: it does not see
+    # changes to related rows, e.g. the user nested in a booking
+    conditional_get_actions = ()
+    # Conditional GET state of the current request
+    etag = None
+    last_modified = None
+    not_modified = False
     required_alternate_scopes = {}
     serializer_map = {}
     permission_map = {}
+    # Maximum number of queries per action, see base.middleware
+    query_budget_map = {}
+    # Safe requests read from a replica unless the user wrote recently
+    use_replica = True
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (
+            self.use_replica
+            and request.method in SAFE_METHODS
+            and not (
+                request.user.is_authenticated and routers.is_pinned(request.user.pk)
+            )
+        ):
+            routers.use_replica_reads()
 
     def get_serializer_class(self):
         return self.serializer_map.get(self.action, self.serializer_class)
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        serializer_class = self.get_serializer_class()
+        if hasattr(serializer_class, "setup_eager_loading"):
+            queryset = serializer_class.setup_eager_loading(queryset)
+        return queryset
+
     def get_permissions(self):
         return [
             permission()
@@ -41,17 +80,105 @@ class BaseViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-    def list(self, request, *args, **kwargs):
-        response = super().list(request, *args, **kwargs)
-        return Response(
-            {
-                "detail": kwargs.get("success_detail"),
-                "data": response.data,
+    def get_etag_version(self, queryset=None):
+        """
+        Returns a cheap validator of the response content, or None to disable
+        conditional GET. By default, for ``conditional_get_actions``, the
+        latest ``updated_at`` and the row count of ``queryset``, one aggregate
+        over the indexed filter; sets ``self.last_modified`` as well.
+        """
+        if queryset is None or self.action not in self.conditional_get_actions:
+            return None
+        try:
+            queryset.model._meta.get_field("updated_at")
+        except FieldDoesNotExist:
+            return None
+        aggregate = queryset.order_by().aggregate(
+            last_modified=Max("updated_at"), count=Count("pk")
+        )
+        self.last_modified = aggregate["last_modified"]
+        return "%s:%s" % (
+            self.last_modified.isoformat() if self.last_modified else "",
+            aggregate["count"],
+        )
+
+    def check_not_modified(self, queryset=None):
+        """
+        Computes the ETag of a GET response from ``get_etag_version`` and
+        returns whether the client's copy (``If-None-Match``, or else
+        ``If-Modified-Since``) is still fresh. The response is then replaced
+        by a 304 in ``finalize_response``, so callers can skip serialising.
+        """
+        if self.request.method != "GET" or self.etag:
+            return self.not_modified
+        version = self.get_etag_version(queryset)
+        if version is None:
+            return False
+        # The same url serves different content to different users
+        key = "%s|%s|%s" % (version, self.request.user.pk, self.request.get_full_path())
+        self.etag = quote_etag(hashlib.md5(key.encode()).hexdigest())
+        if_none_match = self.request.headers.get("If-None-Match")
+        if if_none_match:
+            self.not_modified = if_none_match.strip() == "*" or self.etag in [
+                tag.strip().replace("W/", "", 1) for tag in if_none_match.split(",")
+            ]
+        else:
+            if_modified_since = parse_http_date_safe(
+                self.request.headers.get("If-Modified-Since", "")
+            )
+            self.not_modified = bool(
+                if_modified_since
+                and self.last_modified
+                and int(self.last_modified.timestamp()) <= if_modified_since
+            )
+        return self.not_modified
+
+    def paginate_queryset(self, queryset):
+        if self.check_not_modified(queryset):
+            return []
+        return super().paginate_queryset(queryset)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if not self.etag or response.status_code != status.HTTP_200_OK:
+            return response
+        if self.not_modified:
+            response = HttpResponseNotModified()
+        response["ETag"] = self.etag
+        response["Cache-Control"] = "private, no-cache"
+        if self.last_modified:
+            response["Last-Modified"] = http_date(self.last_modified.timestamp())
+        return response
+
+    def get_paginated_response(self, data, detail=None, body=None):
+        """
+        Returns the page with the next cursor headers, in ``body`` when given
+        so actions keep the keys of their unpaginated responses.
+        """
+        if body is None:
+            body = {
+                "detail": detail,
+                "data": data,
             }
+        return Response(body, headers=self.paginator.get_headers())
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(
+            serializer.data, detail=kwargs.get("success_detail")
         )
 
     def retrieve(self, request, *args, **kwargs):
         try:
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            if self.check_not_modified(
+                self.filter_queryset(self.get_queryset()).filter(
+                    **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+                )
+            ):
+                return Response()
             response = super().retrieve(request, *args, **kwargs)
             return Response(
                 {
@@ -3,7 +3,7 @@ from django.db import models
 
 
 class BookingErrorCode(CoreErrorCode):
-    pass
+    UNAVAILABLE = "unavailable"
 
 
 class BookingStatus(models.TextChoices):
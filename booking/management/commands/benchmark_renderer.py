@@ -0,0 +1,112 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from account.models import Address, Salon, User
+from base.renderers import ApiRenderer
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from service.models import Service
+
+from ... import BookingStatus
+from ...models import Booking, BookingService
+from ...serializers import BookingSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks ApiRenderer against DRF's JSONRenderer on serialized "
+        "bookings. The bookings are created in a transaction that is rolled "
+        "back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bookings", type=int, default=1000)
+        parser.add_argument("--services", type=int, default=3, help="per booking")
+        parser.add_argument("--rounds", type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.create_bookings(options["bookings"], options["services"])
+            queryset = BookingSerializer.setup_eager_loading(Booking.objects.all())
+            data = BookingSerializer(queryset, many=True).data
+            transaction.set_rollback(True)
+
+        payload = {"detail": "Danh sách lịch hẹn", "data": data}
+        renderer = ApiRenderer()
+        reference = JSONRenderer().render(renderer.get_envelope(payload))
+        rendered = renderer.render(payload)
+        if rendered != reference:
+            raise CommandError("ApiRenderer output differs from JSONRenderer")
+
+        candidates = [
+            (
+                "JSONRenderer",
+                lambda: JSONRenderer().render(renderer.get_envelope(payload)),
+            ),
+            ("ApiRenderer", lambda: renderer.render(payload)),
+        ]
+        self.stdout.write(
+            "%s bookings, %.0f KB per response" % (len(data), len(reference) / 1024)
+        )
+        baseline = None
+        for name, render in candidates:
+            timings = []
+            for _ in range(options["rounds"]):
+                started = time.perf_counter()
+                render()
+                timings.append(time.perf_counter() - started)
+            median = statistics.median(timings)
+            baseline = baseline or median
+            self.stdout.write(
+                "%-20s median %.2fms, min %.2fms (%.1fx)"
+                % (name, median * 1000, min(timings) * 1000, baseline / median)
+            )
+
+    def create_bookings(self, count, services_per_booking):
+        salon = Salon.objects.create(
+            username="benchmark-salon",
+            email="benchmark-salon@local",
+            salon_name="Benchmark salon",
+            address=Address.objects.create(
+                hamlet="1 Lê Duẩn",
+                ward="Bến Nghé",
+                district="Quận 1",
+                province="Hồ Chí Minh",
+                lat=10.7769,
+                lng=106.7009,
+            ),
+            is_salon=True,
+        )
+        user = User.objects.create(username="benchmark", email="benchmark@local")
+        services = Service.objects.bulk_create(
+            Service(name="Benchmark service %s" % i) for i in range(10)
+        )
+        now = timezone.now()
+        # bulk_create skips the schedule index signals
+        bookings = Booking.objects.bulk_create(
+            Booking(
+                user=user,
+                salon=salon,
+                status=random.choice(BookingStatus.values),
+                total_net_amount=Decimal(random.randrange(5, 500) * 1000),
+                start_at=now + timedelta(hours=i),
+                end_at=now + timedelta(hours=i, minutes=90),
+                rating=random.choice([None, 3, 4, 5]),
+                review="Dịch vụ tốt ✓",
+            )
+            for i in range(count)
+        )
+        BookingService.objects.bulk_create(
+            BookingService(
+                booking=booking,
+                service=service,
+                price_amount=Decimal(random.randrange(50, 500) * 1000),
+            )
+            for booking in bookings
+            for service in random.sample(services, services_per_booking)
+        )
@@ -0,0 +1,80 @@
+import re
+import uuid
+
+from account.models import Salon
+from account.services.search import search_salons
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from notification.models import ConcatNotification
+
+from ... import BookingStatus
+from ...models import Booking
+
+# Plan fragments meaning the rows are sorted after being read, or that the
+# whole table is scanned, per database vendor
+PLAN_PROBLEMS = {
+    "mysql": [
+        (re.compile(r"Using filesort"), "filesort"),
+        (re.compile(r"\bALL\b"), "full table scan"),
+    ],
+    "sqlite": [
+        (re.compile(r"USE TEMP B-TREE FOR ORDER BY"), "filesort"),
+        # Walking a whole (covering) index reads as many rows as the table
+        (re.compile(r"\bSCAN\b"), "full table scan"),
+    ],
+    "postgresql": [
+        (re.compile(r"\bSort\b"), "filesort"),
+        (re.compile(r"Seq Scan"), "full table scan"),
+    ],
+}
+
+
+def get_hot_querysets():
+    """
+    The queries behind the booking and notification listing endpoints and
+    the salon search.
+    """
+    owner_id = uuid.uuid4()
+    ordering = ("-created_at", "-id")
+    bookings = Booking.objects.order_by(*ordering)
+    notifications = ConcatNotification.objects.order_by(*ordering)
+    return {
+        "salon bookings": bookings.filter(salon_id=owner_id),
+        "salon bookings by status": bookings.filter(
+            salon_id=owner_id, status=BookingStatus.NEW
+        ),
+        "user bookings": bookings.filter(user_id=owner_id),
+        "user bookings by status": bookings.filter(
+            user_id=owner_id, status=BookingStatus.NEW
+        ),
+        "salon reviews": bookings.filter(salon_id=owner_id, rating__isnull=False),
+        "notifications": notifications.filter(recipient_id=owner_id, deleted=False),
+        "unread notifications": notifications.filter(
+            recipient_id=owner_id, deleted=False, unread=True
+        ),
+        "salon search": search_salons(Salon.objects.order_by(), "hoa spa"),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs EXPLAIN on the hot booking, notification and salon search "
+        "queries and fails "
+        "if any of them sorts rows after reading them or scans a whole table"
+    )
+
+    def handle(self, *args, **options):
+        problems = PLAN_PROBLEMS.get(connection.vendor)
+        if problems is None:
+            raise CommandError("Unsupported database vendor %s" % connection.vendor)
+        failures = []
+        for name, queryset in get_hot_querysets().items():
+            plan = queryset[:20].explain()
+            found = [label for pattern, label in problems if pattern.search(plan)]
+            if found:
+                failures.append(name)
+                self.stdout.write("%s: %s\n%s" % (name, ", ".join(found), plan))
+            else:
+                self.stdout.write("%s: ok" % name)
+        if failures:
+            raise CommandError("Inefficient query plans: %s" % ", ".join(failures))
@@ -0,0 +1,31 @@
+from account.models import Salon
+from django.core.management.base import BaseCommand
+
+from ...services.ratings import recompute_salon_ratings
+
+
+class Command(BaseCommand):
+    help = "Recomputes the review aggregates of every salon from booking ratings"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of salons updated per query",
+        )
+
+    def handle(self, *args, **options):
+        queryset = Salon.objects.order_by("pk").values_list("pk", flat=True)
+        updated = 0
+        last_id = None
+        while True:
+            batch = queryset
+            if last_id:
+                batch = batch.filter(pk__gt=last_id)
+            salon_ids = list(batch[: options["batch_size"]])
+            if not salon_ids:
+                break
+            last_id = salon_ids[-1]
+            updated += recompute_salon_ratings(salon_ids)
+        self.stdout.write("Recomputed ratings of %s salons" % updated)
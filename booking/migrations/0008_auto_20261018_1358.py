@@ -0,0 +1,27 @@
+# Generated by Django 3.2.12 on 2026-10-18 13:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0007_auto_20220622_0937'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='end_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='start_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['salon', 'start_at'], name='booking_boo_salon_i_dc7692_idx'),
+        ),
+    ]
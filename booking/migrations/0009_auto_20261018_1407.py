@@ -0,0 +1,33 @@
+# Generated by Django 3.2.12 on 2026-10-18 14:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0008_auto_20261018_1358'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['salon', 'created_at', 'id'], name='booking_boo_salon_i_72c4ae_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['salon', 'status', 'created_at', 'id'], name='booking_boo_salon_i_edb76b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='booking_boo_user_id_084a0e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', 'status', 'created_at', 'id'], name='booking_boo_user_id_1b15ed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('rating__isnull', False)), fields=['salon', 'created_at', 'id'], name='booking_salon_reviews_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.12 on 2026-10-18 14:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0009_auto_20261018_1407'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='booking',
+            name='booking_boo_salon_i_72c4ae_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='booking',
+            name='booking_salon_reviews_idx',
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['salon', 'created_at', 'id', 'rating'], name='booking_salon_reviews_idx'),
+        ),
+    ]
@@ -27,13 +27,26 @@ class Booking(TimeStampedModel):
     )
     total_net = MoneyField(amount_field="total_net_amount", currency_field="currency")
     rating = models.IntegerField(
-        blank=True, null=True,
-        validators=[MaxValueValidator(5), MinValueValidator(1)]
+        blank=True, null=True, validators=[MaxValueValidator(5), MinValueValidator(1)]
     )
     review = models.TextField(blank=True, null=True)
+    start_at = models.DateTimeField(blank=True, null=True)
+    end_at = models.DateTimeField(blank=True, null=True)
 
     class Meta:
         ordering = ("-created_at",)
+        indexes = [
+            models.Index(fields=["salon", "start_at"]),
+            # Trailing rating lets the reviews of a salon be filtered in the
+            # index, MySQL has no partial indexes
+            models.Index(
+                fields=["salon", "created_at", "id", "rating"],
+                name="booking_salon_reviews_idx",
+            ),
+            models.Index(fields=["salon", "status", "created_at", "id"]),
+            models.Index(fields=["user", "created_at", "id"]),
+            models.Index(fields=["user", "status", "created_at", "id"]),
+        ]
 
 
 class BookingService(TimeStampedModel):
@@ -1,7 +1,7 @@
 from account.serializers.salon import SalonBaseViewSerializer
 from account.serializers.user import UserBaseViewSerializer
-from base.serializers import MoneyField
-from booking import models
+from base.serializers import EagerLoadingMixin, MoneyField
+from booking import BookingStatus, models
 from rest_framework import serializers
 
 
@@ -18,7 +18,10 @@ class BookingServiceSerializer(serializers.ModelSerializer):
         depth = 1
 
 
-class BookingSerializer(serializers.ModelSerializer):
+class BookingSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ["user__address", "salon__address"]
+    prefetch_related_fields = ["booking_services__service"]
+
     total_net = MoneyField()
     booking_services = BookingServiceSerializer(many=True, read_only=True)
     user = UserBaseViewSerializer(read_only=True)
@@ -37,6 +40,8 @@ class BookingSerializer(serializers.ModelSerializer):
             "booking_services",
             "rating",
             "review",
+            "start_at",
+            "end_at",
         ]
         depth = 1
 
@@ -44,8 +49,28 @@ class BookingSerializer(serializers.ModelSerializer):
 class BookingCreateInputSerializer(serializers.Serializer):
     salon_id = serializers.CharField()
     service_ids = serializers.ListField(child=serializers.CharField())
+    start_at = serializers.DateTimeField(required=False)
+
+
+class BookingAvailabilityInputSerializer(serializers.Serializer):
+    date = serializers.DateField()
+    service_ids = serializers.ListField(child=serializers.UUIDField())
 
 
 class BookingReviewInputSerializer(serializers.Serializer):
     rating = serializers.IntegerField(min_value=1, max_value=5)
     review = serializers.CharField(required=False, allow_blank=True)
+
+
+class BookingExportInputSerializer(serializers.Serializer):
+    type = serializers.ChoiceField(choices=["csv", "ndjson"], default="csv")
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    status = serializers.ChoiceField(choices=BookingStatus.choices, required=False)
+
+    def validate(self, attrs):
+        date_from = attrs.get("date_from")
+        date_to = attrs.get("date_to")
+        if date_from and date_to and date_from > date_to:
+            raise serializers.ValidationError("date_from must not be after date_to")
+        return attrs
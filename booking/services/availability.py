@@ -0,0 +1,249 @@
+import datetime
+import threading
+import time
+from collections import OrderedDict
+
+import pytz
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .. import BookingStatus
+
+# Bookings in these statuses occupy the salon's time
+BLOCKING_STATUSES = [
+    BookingStatus.NEW,
+    BookingStatus.CONFIRMED,
+    BookingStatus.REQUEST_TO_COMPLETE,
+    BookingStatus.COMPLETED,
+]
+
+
+def get_local_timezone():
+    return pytz.timezone(settings.STR_TIMEZONE)
+
+
+def get_local_date(value: datetime.datetime) -> datetime.date:
+    return value.astimezone(get_local_timezone()).date()
+
+
+def get_day_bounds(day: datetime.date, start: datetime.time, end: datetime.time):
+    tz = get_local_timezone()
+    return (
+        tz.localize(datetime.datetime.combine(day, start)),
+        tz.localize(datetime.datetime.combine(day, end)),
+    )
+
+
+class _DaySchedule:
+    """
+    Busy intervals of one salon on one local day, kept as a sorted array of
+    merged (start, end) pairs so a day can be swept in a single pass.
+    """
+
+    def __init__(self, rows):
+        self.loaded_at = time.monotonic()
+        self.bookings = {booking_id: (start, end) for booking_id, start, end in rows}
+        self._rebuild()
+
+    def _rebuild(self):
+        busy = []
+        for start, end in sorted(self.bookings.values()):
+            if busy and start <= busy[-1][1]:
+                busy[-1] = (busy[-1][0], max(busy[-1][1], end))
+            else:
+                busy.append((start, end))
+        self.busy = busy
+
+    def add(self, booking_id, start, end):
+        self.bookings[booking_id] = (start, end)
+        if not self.busy or start > self.busy[-1][1]:
+            self.busy.append((start, end))
+        else:
+            self._rebuild()
+
+    def remove(self, booking_id):
+        if self.bookings.pop(booking_id, None):
+            self._rebuild()
+
+    def free_slots(self, open_at, close_at, duration, step):
+        slots = []
+        index = 0
+        slot_start = open_at
+        while slot_start + duration <= close_at:
+            slot_end = slot_start + duration
+            while index < len(self.busy) and self.busy[index][1] <= slot_start:
+                index += 1
+            if index < len(self.busy) and self.busy[index][0] < slot_end:
+                # Jump straight past the blocking interval
+                slot_start = max(
+                    slot_start + step, _align(self.busy[index][1], open_at, step)
+                )
+                continue
+            slots.append((slot_start, slot_end))
+            slot_start += step
+        return slots
+
+
+def _align(value, origin, step):
+    """Round ``value`` up to the next slot boundary counted from ``origin``."""
+    steps = -(-(value - origin) // step)
+    return origin + steps * step
+
+
+class SalonScheduleIndex:
+    """
+    Process-wide index of blocking bookings per (salon, local day).
+
+    Days are loaded lazily from the database and then maintained incrementally
+    from booking signals. Entries expire after ``ttl`` seconds so that writes made
+    by other worker processes are picked up, and at most ``max_days`` days are
+    kept, the least recently loaded being dropped first.
+    """
+
+    def __init__(self, ttl=None, max_days=None):
+        self.ttl = ttl if ttl is not None else settings.BOOKING_AVAILABILITY_INDEX_TTL
+        self.max_days = (
+            max_days
+            if max_days is not None
+            else settings.BOOKING_AVAILABILITY_INDEX_SIZE
+        )
+        self._lock = threading.RLock()
+        # In loading order, which is also the expiry order
+        self._days = OrderedDict()
+        self._booking_keys = {}
+
+    def clear(self):
+        with self._lock:
+            self._days.clear()
+            self._booking_keys.clear()
+
+    def _load_day(self, salon_id, day):
+        from ..models import Booking
+
+        day_start, day_end = get_day_bounds(day, datetime.time.min, datetime.time.max)
+        rows = Booking.objects.filter(
+            salon_id=salon_id,
+            status__in=BLOCKING_STATUSES,
+            start_at__lt=day_end,
+            end_at__gt=day_start,
+        ).values_list("id", "start_at", "end_at")
+        return _DaySchedule(rows)
+
+    def _forget(self, key):
+        for booking_id in self._days.pop(key).bookings:
+            keys = self._booking_keys.get(booking_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._booking_keys[booking_id]
+
+    def _evict(self):
+        expired_before = time.monotonic() - self.ttl
+        while self._days:
+            key, schedule = next(iter(self._days.items()))
+            if (
+                schedule.loaded_at >= expired_before
+                and len(self._days) <= self.max_days
+            ):
+                break
+            self._forget(key)
+
+    def get_day(self, salon_id, day) -> _DaySchedule:
+        key = (str(salon_id), day)
+        with self._lock:
+            schedule = self._days.get(key)
+            if schedule and time.monotonic() - schedule.loaded_at < self.ttl:
+                return schedule
+        schedule = self._load_day(salon_id, day)
+        if day < get_local_date(timezone.now()):
+            # Nothing can be booked on past days any more, not worth keeping
+            return schedule
+        with self._lock:
+            if key in self._days:
+                self._forget(key)
+            self._days[key] = schedule
+            for booking_id in schedule.bookings:
+                self._booking_keys.setdefault(booking_id, set()).add(key)
+            self._evict()
+        return schedule
+
+    def discard_booking(self, booking_id):
+        with self._lock:
+            for key in self._booking_keys.pop(booking_id, set()):
+                schedule = self._days.get(key)
+                if schedule:
+                    schedule.remove(booking_id)
+
+    def update_booking(self, booking):
+        """Reflect the current state of ``booking`` in the already loaded days."""
+        with self._lock:
+            self.discard_booking(booking.id)
+            if (
+                booking.status not in BLOCKING_STATUSES
+                or not booking.start_at
+                or not booking.end_at
+            ):
+                return
+            days = {get_local_date(booking.start_at), get_local_date(booking.end_at)}
+            for day in days:
+                key = (str(booking.salon_id), day)
+                schedule = self._days.get(key)
+                if schedule:
+                    schedule.add(booking.id, booking.start_at, booking.end_at)
+                    self._booking_keys.setdefault(booking.id, set()).add(key)
+
+
+schedule_index = SalonScheduleIndex()
+
+
+def get_services_duration(salon_services) -> datetime.timedelta:
+    return datetime.timedelta(
+        minutes=sum(salon_service.duration for salon_service in salon_services)
+    )
+
+
+def get_free_slots(salon, day: datetime.date, duration: datetime.timedelta):
+    """
+    Returns the list of (start_at, end_at) slots in which ``salon`` can serve a
+    booking lasting ``duration`` on the local day ``day``.
+    """
+    if salon.is_closed or duration <= datetime.timedelta(0):
+        return []
+    open_at, close_at = get_day_bounds(day, salon.opening_time, salon.closing_time)
+    now = timezone.now()
+    step = datetime.timedelta(minutes=settings.BOOKING_SLOT_STEP_MINUTES)
+    if close_at <= now:
+        return []
+    schedule = schedule_index.get_day(salon.id, day)
+    slots = schedule.free_slots(open_at, close_at, duration, step)
+    return [slot for slot in slots if slot[0] >= now]
+
+
+def is_in_opening_hours(salon, start_at, end_at):
+    day = get_local_date(start_at)
+    open_at, close_at = get_day_bounds(day, salon.opening_time, salon.closing_time)
+    return open_at <= start_at and end_at <= close_at
+
+
+def has_overlapping_booking(salon_id, start_at, end_at):
+    """
+    Authoritative overlap check against the database. Must run inside the
+    transaction that holds the salon row lock to reject double bookings.
+    """
+    from ..models import Booking
+
+    return Booking.objects.filter(
+        salon_id=salon_id,
+        status__in=BLOCKING_STATUSES,
+        start_at__lt=end_at,
+        end_at__gt=start_at,
+    ).exists()
+
+
+def refresh_booking_in_index(booking):
+    transaction.on_commit(lambda: schedule_index.update_booking(booking))
+
+
+def remove_booking_from_index(booking):
+    transaction.on_commit(lambda: schedule_index.discard_booking(booking.id))
@@ -0,0 +1,156 @@
+import csv
+import io
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from base.renderers import ApiRenderer
+from django.conf import settings
+from django.db.models import Q
+from rest_framework import serializers
+
+from ..models import BookingService
+from .availability import get_local_timezone
+
+# Export column -> lookup on Booking
+EXPORT_FIELDS = {
+    "id": "id",
+    "created_at": "created_at",
+    "status": "status",
+    "start_at": "start_at",
+    "end_at": "end_at",
+    "customer_email": "user__email",
+    "customer_phone_number": "user__phone_number",
+    "customer_first_name": "user__first_name",
+    "customer_last_name": "user__last_name",
+    "services": None,
+    "total_net_amount": "total_net_amount",
+    "currency": "currency",
+    "rating": "rating",
+    "review": "review",
+}
+
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+# Cells a spreadsheet app would evaluate as a formula
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+# Times are rendered in the salon's timezone like the date filters, not in
+# the active one
+datetime_field = serializers.DateTimeField(default_timezone=get_local_timezone())
+
+
+def get_day_start(date):
+    # Not the active timezone, which the notification code leaves switched
+    return get_local_timezone().localize(datetime.combine(date, time.min))
+
+
+def filter_bookings(queryset, date_from=None, date_to=None, status=None):
+    """
+    Filters bookings on their creation date, both ends inclusive, so the
+    range is served by the ``(salon, created_at, id)`` indexes.
+    """
+    if date_from:
+        queryset = queryset.filter(created_at__gte=get_day_start(date_from))
+    if date_to:
+        queryset = queryset.filter(
+            created_at__lt=get_day_start(date_to + timedelta(days=1))
+        )
+    if status:
+        queryset = queryset.filter(status=status)
+    return queryset
+
+
+def iter_booking_batches(queryset, batch_size=None):
+    """
+    Yields the bookings as lists of flat rows, oldest first.
+
+    Walks the ``(created_at, id)`` keyset one batch per query rather than
+    holding a cursor open: the MySQL driver buffers a whole result set on the
+    client, so a single query would not run in constant memory. The services
+    of each batch are fetched with one extra query.
+    """
+    batch_size = batch_size or settings.BOOKING_EXPORT_BATCH_SIZE
+    queryset = queryset.order_by("created_at", "id").values_list(
+        *(lookup for lookup in EXPORT_FIELDS.values() if lookup)
+    )
+    columns = [name for name, lookup in EXPORT_FIELDS.items() if lookup]
+    last = None
+    while True:
+        batch = queryset
+        if last:
+            # The redundant lower bound keeps the OR an index range scan
+            batch = batch.filter(
+                Q(created_at__gt=last["created_at"]) | Q(id__gt=last["id"]),
+                created_at__gte=last["created_at"],
+            )
+        rows = [dict(zip(columns, values)) for values in batch[:batch_size]]
+        if not rows:
+            return
+        last = rows[-1]
+
+        services = defaultdict(list)
+        for booking_id, name in (
+            BookingService.objects.filter(booking__in=[row["id"] for row in rows])
+            .order_by("created_at", "id")
+            .values_list("booking_id", "service__name")
+        ):
+            services[booking_id].append(name or "")
+        for row in rows:
+            row["services"] = "; ".join(services[row["id"]])
+        yield rows
+        if len(rows) < batch_size:
+            return
+
+
+def format_row(row):
+    row = {name: row[name] for name in EXPORT_FIELDS}
+    row["id"] = str(row["id"])
+    row["total_net_amount"] = str(row["total_net_amount"])
+    for name in ("created_at", "start_at", "end_at"):
+        if row[name]:
+            row[name] = datetime_field.to_representation(row[name])
+    return row
+
+
+def escape_formula(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def stream_csv(batches):
+    # The byte order mark makes spreadsheet apps read the file as UTF-8
+    yield "\ufeff".encode()
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(EXPORT_FIELDS))
+    writer.writeheader()
+    for rows in batches:
+        writer.writerows(
+            {name: escape_formula(value) for name, value in format_row(row).items()}
+            for row in rows
+        )
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def stream_ndjson(batches):
+    renderer = ApiRenderer()
+    for rows in batches:
+        yield b"".join(renderer.dumps(format_row(row)) + b"\n" for row in rows)
+
+
+def stream_bookings(queryset, file_format="csv", batch_size=None):
+    """
+    Renders the bookings as CSV or NDJSON, one chunk per batch, so memory
+    stays constant whatever the length of the history.
+    """
+    batches = iter_booking_batches(queryset, batch_size)
+    if file_format == "ndjson":
+        return stream_ndjson(batches)
+    return stream_csv(batches)
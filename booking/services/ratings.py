@@ -0,0 +1,54 @@
+from account.models import Salon
+from account.services.cache import invalidate_all_salons, invalidate_salons
+from django.db.models import Avg, Count, F, FloatField, OuterRef, Subquery, Sum
+from django.db.models.functions import Cast, Coalesce
+
+from ..models import Booking
+
+
+def add_salon_rating(salon_id, rating: int):
+    """
+    Adds a review rating to the salon aggregates in a single UPDATE, so
+    concurrent reviews neither lose updates nor wait on a row lock held across
+    the request.
+    """
+    invalidate_salons([salon_id])
+    return Salon.objects.filter(id=salon_id).update(
+        # Listed first: MySQL evaluates SET assignments left to right, so
+        # vote_rate must be computed before the totals are incremented
+        vote_rate=Cast(F("total_rating") + rating, FloatField())
+        / (F("total_reviews") + 1),
+        total_rating=F("total_rating") + rating,
+        total_reviews=F("total_reviews") + 1,
+    )
+
+
+def recompute_salon_ratings(salon_ids=None):
+    """
+    Recomputes the rating aggregates of the given salons (all salons by
+    default) from ``Booking.rating`` in a single UPDATE.
+    :return: Number of salons updated.
+    """
+    ratings = (
+        Booking.objects.filter(salon=OuterRef("pk"), rating__isnull=False)
+        .order_by()
+        .values("salon")
+    )
+    salons = Salon.objects.all()
+    if salon_ids is None:
+        invalidate_all_salons()
+    else:
+        salons = salons.filter(id__in=salon_ids)
+        invalidate_salons(salon_ids)
+    return salons.update(
+        total_reviews=Coalesce(
+            Subquery(ratings.annotate(count=Count("id")).values("count")), 0
+        ),
+        total_rating=Coalesce(
+            Subquery(ratings.annotate(total=Sum("rating")).values("total")), 0
+        ),
+        vote_rate=Subquery(
+            ratings.annotate(average=Avg("rating")).values("average"),
+            output_field=FloatField(),
+        ),
+    )
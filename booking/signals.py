@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Booking
+from .services.availability import (
+    refresh_booking_in_index,
+    remove_booking_from_index,
+)
+
+
+@receiver(post_save, sender=Booking)
+def update_schedule_index_on_save(sender, instance, **kwargs):
+    refresh_booking_in_index(instance)
+
+
+@receiver(post_delete, sender=Booking)
+def update_schedule_index_on_delete(sender, instance, **kwargs):
+    remove_booking_from_index(instance)
@@ -1,3 +1,323 @@
+import csv
+import datetime
+import json
+from io import StringIO
+from itertools import count
+from unittest import mock
+
+from account.models import Address, Salon, User
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from service.models import Service, ServiceSalon
+
+from . import BookingErrorCode
+from .models import Booking, BookingService
+from .services import availability, export, ratings
+
+sequence = count()
+
+
+def create_address():
+    return Address.objects.create(
+        hamlet="1 Le Loi", ward="Ben Nghe", district="1", province="Ho Chi Minh"
+    )
+
+
+def create_salon():
+    n = next(sequence)
+    return Salon.objects.create(
+        username="salon%s" % n,
+        email="salon%s@example.com" % n,
+        salon_name="Salon %s" % n,
+        is_salon=True,
+        address=create_address(),
+    )
+
+
+def create_user():
+    n = next(sequence)
+    return User.objects.create(
+        username="user%s" % n, email="user%s@example.com" % n, address=create_address()
+    )
+
+
+class ListQueryCountTestCase(TestCase):
+    """
+    The list endpoints eager-load the relations their serializers render, so
+    their number of queries does not grow with the number of rows.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.salon = create_salon()
+        self.services = [
+            Service.objects.create(name="Service %s" % next(sequence)) for _ in range(2)
+        ]
+        for service in self.services:
+            ServiceSalon.objects.create(salon=self.salon, service=service)
+
+    def create_bookings(self, n, salon=None):
+        for _ in range(n):
+            booking = Booking.objects.create(
+                user=create_user(), salon=salon or self.salon
+            )
+            for service in self.services:
+                BookingService.objects.create(booking=booking, service=service)
+
+    def assertConstantQueries(self, url, user, create_rows, rows=10):
+        """
+        Requests ``url`` with one row, then with ``rows`` rows, and checks
+        both requests issue the same number of queries.
+        """
+        self.client.force_authenticate(user)
+        create_rows(1)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        create_rows(rows - 1)
+        with self.assertNumQueries(len(context)):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["data"]), rows)
+
+    def test_booking_list(self):
+        self.assertConstantQueries("/bookings/", create_user(), self.create_bookings)
+
+    def test_salon_bookings(self):
+        self.assertConstantQueries("/salonBookings/", self.salon, self.create_bookings)
+
+    def test_salon_list(self):
+        def create_salons(n):
+            for _ in range(n):
+                salon = create_salon()
+                ServiceSalon.objects.create(salon=salon, service=self.services[0])
+
+        Salon.objects.all().delete()
+        self.assertConstantQueries("/salons/", create_user(), create_salons)
+
+
+class IndexTestCase(TestCase):
+    def test_indexes_are_portable(self):
+        # MySQL ignores partial indexes (models.W037)
+        for index in Booking._meta.indexes:
+            self.assertIsNone(index.condition, index.name)
+
+    def test_hot_query_plans(self):
+        # Fails on a sort after reading rows or a full table scan
+        call_command("check_query_plans", stdout=StringIO())
+
+
+class ExportTestCase(TestCase):
+    def setUp(self):
+        self.salon = create_salon()
+        service = Service.objects.create(name="Haircut")
+        user = create_user()
+        user.first_name = '=HYPERLINK("http://example.com")'
+        user.save()
+        created_at = timezone.now() - datetime.timedelta(days=1)
+        self.bookings = []
+        # Two rows sharing a created_at straddle the first batch boundary
+        for i in range(5):
+            booking = Booking.objects.create(
+                user=user,
+                salon=self.salon,
+                created_at=created_at + datetime.timedelta(minutes=min(i, 2)),
+                start_at=datetime.datetime(2022, 6, 1, 3, i, tzinfo=timezone.utc),
+                review="-1 star" if i == 0 else "Nice",
+            )
+            BookingService.objects.create(booking=booking, service=service)
+            self.bookings.append(booking)
+        self.bookings.sort(key=lambda booking: (booking.created_at, booking.id))
+
+    def export(self, file_format):
+        with timezone.override("America/New_York"):
+            chunks = list(
+                export.stream_bookings(
+                    self.salon.bookings.all(), file_format, batch_size=2
+                )
+            )
+        return chunks, b"".join(chunks).decode()
+
+    def test_csv(self):
+        chunks, content = self.export("csv")
+        # The byte order mark, then one chunk per batch
+        self.assertEqual(len(chunks), 4)
+        self.assertTrue(content.startswith("\ufeff"))
+        rows = list(csv.DictReader(StringIO(content[1:])))
+        self.assertEqual(
+            [row["id"] for row in rows], [str(booking.id) for booking in self.bookings]
+        )
+        self.assertEqual(rows[0]["services"], "Haircut")
+        self.assertEqual(
+            rows[0]["customer_first_name"], '\'=HYPERLINK("http://example.com")'
+        )
+        self.assertEqual(
+            sorted(row["review"] for row in rows), ["'-1 star"] + ["Nice"] * 4
+        )
+        # In the salon's timezone, not the active one
+        self.assertEqual(
+            sorted(row["start_at"] for row in rows)[0], "2022-06-01T10:00:00+07:00"
+        )
+
+    def test_ndjson(self):
+        chunks, content = self.export("ndjson")
+        self.assertEqual(len(chunks), 3)
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(
+            [row["id"] for row in rows], [str(booking.id) for booking in self.bookings]
+        )
+        # Not a spreadsheet, the values are left as they are
+        self.assertEqual(
+            rows[0]["customer_first_name"], '=HYPERLINK("http://example.com")'
+        )
+        self.assertEqual(
+            sorted(row["start_at"] for row in rows)[0], "2022-06-01T10:00:00+07:00"
+        )
+
+    def test_day_start_ignores_active_timezone(self):
+        day = datetime.date(2022, 6, 1)
+        expected = export.get_day_start(day)
+        with timezone.override("America/New_York"):
+            self.assertEqual(export.get_day_start(day), expected)
+        self.assertEqual(
+            expected.astimezone(timezone.utc),
+            datetime.datetime(2022, 5, 31, 17, tzinfo=timezone.utc),
+        )
+
+
+class BookingCreateTestCase(TestCase):
+    def setUp(self):
+        self.salon = create_salon()
+        service = Service.objects.create(name="Haircut")
+        ServiceSalon.objects.create(salon=self.salon, service=service, duration=60)
+        self.service_ids = [str(service.pk)]
+        self.client = APIClient()
+        self.client.force_authenticate(create_user())
+        tomorrow = availability.get_local_date(timezone.now()) + datetime.timedelta(
+            days=1
+        )
+        self.start_at = availability.get_day_bounds(
+            tomorrow, datetime.time(10), datetime.time(10)
+        )[0]
+
+    def book(self, start_at):
+        return self.client.post(
+            "/bookings/",
+            {
+                "salon_id": str(self.salon.pk),
+                "service_ids": self.service_ids,
+                "start_at": start_at.isoformat(),
+            },
+            format="json",
+        )
+
+    def assertRejected(self, response, code):
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["code"], code)
+
+    def test_create(self):
+        self.assertEqual(self.book(self.start_at).status_code, 200)
+        self.assertRejected(
+            self.book(self.start_at + datetime.timedelta(minutes=30)),
+            BookingErrorCode.UNAVAILABLE,
+        )
+
+    def test_closed_salon(self):
+        self.salon.is_closed = True
+        self.salon.save()
+        self.assertRejected(self.book(self.start_at), BookingErrorCode.UNAVAILABLE)
+        self.assertFalse(Booking.objects.exists())
+
+    def test_start_in_past(self):
+        self.assertRejected(
+            self.book(self.start_at - datetime.timedelta(days=2)),
+            BookingErrorCode.INVALID,
+        )
+        self.assertFalse(Booking.objects.exists())
+
+
+@mock.patch("booking.services.availability.time.monotonic", return_value=0)
+class ScheduleIndexTestCase(TestCase):
+    def setUp(self):
+        self.salon = create_salon()
+        self.index = availability.SalonScheduleIndex(ttl=60, max_days=2)
+        self.today = availability.get_local_date(timezone.now())
+        self.days = [self.today + datetime.timedelta(days=i) for i in range(3)]
+        start_at, end_at = availability.get_day_bounds(
+            self.days[0], datetime.time(10), datetime.time(11)
+        )
+        self.booking = Booking.objects.create(
+            user=create_user(), salon=self.salon, start_at=start_at, end_at=end_at
+        )
+
+    def get_days(self):
+        return [day for _, day in self.index._days]
+
+    def test_max_days(self, monotonic):
+        for day in self.days:
+            self.index.get_day(self.salon.id, day)
+        self.assertEqual(self.get_days(), self.days[1:])
+        # The keys of the bookings of dropped days go with them
+        self.assertEqual(self.index._booking_keys, {})
+
+    def test_expired_days_dropped(self, monotonic):
+        self.index.get_day(self.salon.id, self.days[0])
+        self.assertIn(self.booking.id, self.index._booking_keys)
+        monotonic.return_value = 61
+        self.index.get_day(self.salon.id, self.days[1])
+        self.assertEqual(self.get_days(), [self.days[1]])
+        self.assertEqual(self.index._booking_keys, {})
+
+    def test_reload_moves_day_last(self, monotonic):
+        self.index.get_day(self.salon.id, self.days[0])
+        self.index.get_day(self.salon.id, self.days[1])
+        monotonic.return_value = 61
+        self.index.get_day(self.salon.id, self.days[0])
+        self.assertEqual(self.get_days(), [self.days[0]])
+
+    def test_past_days_not_kept(self, monotonic):
+        yesterday = self.today - datetime.timedelta(days=1)
+        self.assertEqual(self.index.get_day(self.salon.id, yesterday).busy, [])
+        self.assertEqual(self.get_days(), [])
+
+
+class SalonRatingTestCase(TestCase):
+    def setUp(self):
+        self.salon = create_salon()
+
+    def get_salon(self):
+        return Salon.objects.get(pk=self.salon.pk)
+
+    def test_single_update_of_child_table(self):
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(ratings.add_salon_rating(self.salon.id, 4), 1)
+        # The aggregates live on the salon table, its parent is not joined
+        self.assertEqual(len(context), 1)
+        sql = context.captured_queries[0]["sql"]
+        self.assertTrue(sql.startswith('UPDATE "account_salon" SET'), sql)
+        self.assertNotIn("account_baseuser", sql)
+
+    def test_mean(self):
+        applied = []
+        user = create_user()
+        for rating in (5, 4, 2, 5, 1):
+            ratings.add_salon_rating(self.salon.id, rating)
+            Booking.objects.create(user=user, salon=self.salon, rating=rating)
+            applied.append(rating)
+            salon = self.get_salon()
+            self.assertEqual(salon.total_reviews, len(applied))
+            self.assertEqual(salon.total_rating, sum(applied))
+            self.assertAlmostEqual(salon.vote_rate, sum(applied) / len(applied))
 
-# Create your tests here.
+        ratings.recompute_salon_ratings([self.salon.id])
+        recomputed = self.get_salon()
+        self.assertEqual(
+            (recomputed.total_reviews, recomputed.total_rating),
+            (salon.total_reviews, salon.total_rating),
+        )
+        self.assertAlmostEqual(recomputed.vote_rate, salon.vote_rate)
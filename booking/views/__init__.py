@@ -16,6 +16,7 @@ from ..serializers import (
     BookingReviewInputSerializer,
     BookingSerializer,
 )
+from ..services import availability, ratings
 from ..tasks import notifications as nf
 
 
@@ -27,15 +28,27 @@ class BookingViewSet(BaseViewSet):
     serializer_map = {
         "create": BookingCreateInputSerializer,
     }
+    query_budget_map = {
+        "list": 6,
+        "retrieve": 10,
+    }
 
     @transaction.atomic
     def create(self, request, *args, **kwargs):
         try:
             user = request.user
             data = request.data
+            input_serializer = BookingCreateInputSerializer(data=data)
+            input_serializer.is_valid(raise_exception=True)
             salon_id = data["salon_id"]
             service_ids = data["service_ids"]
-            salon = account_models.Salon.objects.filter(id=salon_id).first()
+            start_at = input_serializer.validated_data.get("start_at")
+            # Lock the salon row so concurrent bookings of the same slot serialize
+            salon = (
+                account_models.Salon.objects.select_for_update()
+                .filter(id=salon_id)
+                .first()
+            )
             if not salon:
                 return Response(
                     {
@@ -44,6 +57,24 @@ class BookingViewSet(BaseViewSet):
                     },
                     status=status.HTTP_400_BAD_REQUEST,
                 )
+            if salon.is_closed:
+                return Response(
+                    {
+                        "code": BookingErrorCode.UNAVAILABLE,
+                        "detail": "The salon is closed",
+                        "messages": "The salon is closed",
+                    },
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            if start_at and start_at < timezone.now():
+                return Response(
+                    {
+                        "code": BookingErrorCode.INVALID,
+                        "detail": "The booking time is in the past",
+                        "messages": "The booking time is in the past",
+                    },
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
             salon_services = salon.services.filter(service__in=service_ids)
             for service_id in service_ids:
                 if service_id not in [
@@ -62,8 +93,33 @@ class BookingViewSet(BaseViewSet):
                 [salon_service.price_amount for salon_service in salon_services],
                 0,
             )
+            end_at = None
+            if start_at:
+                end_at = start_at + availability.get_services_duration(salon_services)
+                if not availability.is_in_opening_hours(salon, start_at, end_at):
+                    return Response(
+                        {
+                            "code": BookingErrorCode.INVALID,
+                            "detail": "The booking time is outside the salon opening hours",
+                            "messages": "The booking time is outside the salon opening hours",
+                        },
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+                if availability.has_overlapping_booking(salon.id, start_at, end_at):
+                    return Response(
+                        {
+                            "code": BookingErrorCode.UNAVAILABLE,
+                            "detail": "The salon is not available at this time",
+                            "messages": "The salon is not available at this time",
+                        },
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
             booking = models.Booking.objects.create(
-                user_id=user.id, salon=salon, total_net_amount=total_net_amount
+                user_id=user.id,
+                salon=salon,
+                total_net_amount=total_net_amount,
+                start_at=start_at,
+                end_at=end_at,
             )
             booking_services = []
 
@@ -109,6 +165,7 @@ class BookingViewSet(BaseViewSet):
         return super().retrieve(request, *args, **kwargs)
 
     @action(detail=True, methods=["post"])
+    @transaction.atomic
     def confirm(self, request, *args, **kwargs):
         """
         Confirm the booking
@@ -146,6 +203,7 @@ class BookingViewSet(BaseViewSet):
         )
 
     @action(detail=True, methods=["post"])
+    @transaction.atomic
     def cancel(self, request, *args, **kwargs):
         """
         Cancel the booking
@@ -186,6 +244,7 @@ class BookingViewSet(BaseViewSet):
         )
 
     @action(detail=True, methods=["post"], url_path="requestToComplete")
+    @transaction.atomic
     def request_to_complete(self, request, *args, **kwargs):
         """
         Salon sends request to user to complete the booking
@@ -225,6 +284,7 @@ class BookingViewSet(BaseViewSet):
         )
 
     @action(detail=True, methods=["post"], url_path="markAsCompleted")
+    @transaction.atomic
     def mark_as_completed(self, request, *args, **kwargs):
         """
         User confirms that the booking was completed
@@ -312,22 +372,32 @@ class BookingViewSet(BaseViewSet):
         data = request.data
         serializer = BookingReviewInputSerializer(data=data)
         if serializer.is_valid():
-            rating = data["rating"]
+            rating = int(data["rating"])
             booking.rating = rating
             booking.review = data.get("review")
-            update_fields = ["rating", "review"]
+            booking.updated_at = timezone.now()
+            # Conditional update so a booking racing with itself is rated once
+            reviewed = models.Booking.objects.filter(
+                id=booking.id, rating__isnull=True
+            ).update(
+                rating=booking.rating,
+                review=booking.review,
+                updated_at=booking.updated_at,
+            )
+            if not reviewed:
+                return Response(
+                    {
+                        "code": BookingErrorCode.INVALID_ACTION,
+                        "detail": "This booking was reviewed before",
+                        "messages": "This booking was reviewed before",
+                    },
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
             if booking.status == BookingStatus.REQUEST_TO_COMPLETE:
                 booking.status = BookingStatus.COMPLETED
-                update_fields.append("status")
+                booking.save(update_fields=["status", "updated_at"])
                 nf.send_notify_to_salon_about_booking_completed(booking)
-            total_reviews = salon.total_reviews
-            vote_rate = salon.vote_rate
-            if vote_rate is None:
-                vote_rate = 0
-            salon.vote_rate = round((vote_rate * total_reviews + rating) / (total_reviews + 1), 3)
-            salon.total_reviews = total_reviews + 1
-            salon.save(update_fields=["vote_rate", "total_reviews"])
-            booking.save(update_fields=update_fields)
+            ratings.add_salon_rating(salon.id, rating)
             response = SalonReviewSerializer(booking)
             return Response(
                 {
@@ -10,12 +10,14 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+import json
 import os
 from datetime import timedelta
 from pathlib import Path
 
 import cloudinary.api
 import django_on_heroku
+from django.core.exceptions import ImproperlyConfigured
 from django_prices.utils.formatting import get_currency_fraction
 from dotenv import load_dotenv
 
@@ -58,6 +60,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "base.middleware.QueryStatsMiddleware",
+    "base.routers.ReplicaMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     # 'django.middleware.common.CommonMiddleware',
@@ -102,6 +106,9 @@ REST_FRAMEWORK = {
     "DEFAULT_RENDERER_CLASSES": ("base.renderers.ApiRenderer",),
 }
 
+API_PAGE_SIZE = int(os.getenv("API_PAGE_SIZE", 20))
+API_MAX_PAGE_SIZE = int(os.getenv("API_MAX_PAGE_SIZE", 100))
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=30),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
@@ -115,7 +122,8 @@ SIMPLE_JWT = {
 
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.mysql",
+        # Django's MySQL backend plus health checks and pooling, see base.db.pool
+        "ENGINE": "base.db.backends.mysql",
         "NAME": os.getenv("MYSQL_DATABASE", "p3lmzxp3vzvzxymn"),
         "USER": os.getenv("MYSQL_USER", "rv32bc012je8pkn2"),
         "PASSWORD": os.getenv("MYSQL_PASSWORD", "xgithrw87max1wwv"),
@@ -123,9 +131,30 @@ DATABASES = {
             "MYSQL_HOST", "bv2rebwf6zzsv341.cbetxkdyhwsb.us-east-1.rds.amazonaws.com"
         ),
         "PORT": os.getenv("MYSQL_PORT", "3306"),
+        # Seconds a thread keeps its connection open across requests
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": os.getenv("DB_CONN_HEALTH_CHECKS", "true").lower()
+        == "true",
+        # Connections shared by all threads, for ASGI or threaded workers. Set
+        # DB_CONN_MAX_AGE to 0 with it so requests hand their connection back.
+        "POOL_SIZE": int(os.getenv("DB_POOL_SIZE", 0)),
+        "POOL_TIMEOUT": float(os.getenv("DB_POOL_TIMEOUT", 10)),
+        "POOL_RECYCLE": int(os.getenv("DB_POOL_RECYCLE", 3600)),
     }
 }
 
+# read replicas, comma separated hosts sharing the primary's credentials
+DATABASE_REPLICAS = []
+for i, host in enumerate(filter(None, os.getenv("MYSQL_REPLICA_HOSTS", "").split(","))):
+    alias = "replica_%s" % (i + 1)
+    DATABASES[alias] = dict(
+        DATABASES["default"], HOST=host.strip(), TEST={"MIRROR": "default"}
+    )
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ["base.routers.ReplicaRouter"]
+# seconds during which a user who wrote reads from the primary
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", 5))
+
 AUTH_USER_MODEL = "account.BaseUser"
 
 # Password validation
@@ -187,6 +216,99 @@ DEFAULT_DECIMAL_PLACES = get_currency_fraction(DEFAULT_CURRENCY)
 DEFAULT_CURRENCY_CODE_LENGTH = 3
 DEFAULT_MAX_DIGITS = 12
 
+# booking
+BOOKING_SLOT_STEP_MINUTES = int(os.getenv("BOOKING_SLOT_STEP_MINUTES", 15))
+BOOKING_AVAILABILITY_INDEX_TTL = int(os.getenv("BOOKING_AVAILABILITY_INDEX_TTL", 60))
+# (salon, day) schedules kept in memory by each process
+BOOKING_AVAILABILITY_INDEX_SIZE = int(
+    os.getenv("BOOKING_AVAILABILITY_INDEX_SIZE", 10000)
+)
+BOOKING_EXPORT_BATCH_SIZE = int(os.getenv("BOOKING_EXPORT_BATCH_SIZE", 1000))
+
+# query instrumentation
+QUERY_STATS_ENABLED = os.getenv("QUERY_STATS_ENABLED", "true").lower() == "true"
+QUERY_STATS_SLOWEST = int(os.getenv("QUERY_STATS_SLOWEST", 3))
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+# the X-DB-* response headers expose SQL, keep them off in production
+QUERY_STATS_HEADERS = os.getenv("QUERY_STATS_HEADERS", "false").lower() == "true"
+# fail requests over their query budget instead of logging them, always on
+# under base.runner.TestRunner
+QUERY_BUDGET_STRICT = os.getenv("QUERY_BUDGET_STRICT", "false").lower() == "true"
+TEST_RUNNER = "base.runner.TestRunner"
+
+# cache, CACHE_BACKEND should be shared by all processes, e.g.
+# django.core.cache.backends.memcached.PyMemcacheCache
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "")
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKEND or "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
+SHARED_CACHE = CACHES["default"]["BACKEND"] not in (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+# The salon response cache and its ETags are off without a shared cache, the
+# invalidations of one process would not reach the others
+SALON_RESPONSE_CACHE_TIMEOUT = int(
+    os.getenv("SALON_RESPONSE_CACHE_TIMEOUT", 300 if SHARED_CACHE else 0)
+)
+if SALON_RESPONSE_CACHE_TIMEOUT and not SHARED_CACHE:
+    raise ImproperlyConfigured(
+        "SALON_RESPONSE_CACHE_TIMEOUT needs a CACHE_BACKEND shared by all processes"
+    )
+# The replica pins of the users who wrote live in the cache, one process
+# would not see the pins set by the others
+if DATABASE_REPLICAS and not SHARED_CACHE:
+    raise ImproperlyConfigured(
+        "MYSQL_REPLICA_HOSTS needs a CACHE_BACKEND shared by all processes"
+    )
+
+# salon search
+SALON_SEARCH_RADIUS = float(os.getenv("SALON_SEARCH_RADIUS", 10))  # km
+SALON_SEARCH_MAX_RADIUS = float(os.getenv("SALON_SEARCH_MAX_RADIUS", 100))  # km
+
+# google maps links
+MAPS_RESOLVE_TIMEOUT = float(os.getenv("MAPS_RESOLVE_TIMEOUT", 5))  # seconds
+MAPS_RESOLVE_CACHE_SIZE = int(os.getenv("MAPS_RESOLVE_CACHE_SIZE", 1024))
+MAPS_RESOLVE_WORKERS = int(os.getenv("MAPS_RESOLVE_WORKERS", 2))
+
+# notification bulk updates, rows per UPDATE
+NOTIFICATION_BULK_BATCH_SIZE = int(os.getenv("NOTIFICATION_BULK_BATCH_SIZE", 1000))
+
+# notification retention, rows past it are archived (or deleted) by
+# purge_notifications
+NOTIFICATION_RETENTION_DAYS = int(os.getenv("NOTIFICATION_RETENTION_DAYS", 180))
+NOTIFICATION_VERB_RETENTION_DAYS = json.loads(
+    os.getenv(
+        "NOTIFICATION_VERB_RETENTION_DAYS",
+        '{"booking_placed": 90, "booking_requested_to_complete": 90}',
+    )
+)
+NOTIFICATION_DELETED_RETENTION_DAYS = int(
+    os.getenv("NOTIFICATION_DELETED_RETENTION_DAYS", 7)
+)
+NOTIFICATION_MAX_PER_RECIPIENT = int(os.getenv("NOTIFICATION_MAX_PER_RECIPIENT", 1000))
+NOTIFICATION_ARCHIVE = os.getenv("NOTIFICATION_ARCHIVE", "true").lower() == "true"
+NOTIFICATION_PURGE_BATCH_SIZE = int(os.getenv("NOTIFICATION_PURGE_BATCH_SIZE", 1000))
+
+# notification outbox
+NOTIFICATION_OUTBOX_BATCH_SIZE = int(os.getenv("NOTIFICATION_OUTBOX_BATCH_SIZE", 100))
+NOTIFICATION_OUTBOX_WORKERS = int(os.getenv("NOTIFICATION_OUTBOX_WORKERS", 8))
+NOTIFICATION_OUTBOX_POLL_INTERVAL = float(
+    os.getenv("NOTIFICATION_OUTBOX_POLL_INTERVAL", 1)
+)
+NOTIFICATION_OUTBOX_LEASE_SECONDS = int(
+    os.getenv("NOTIFICATION_OUTBOX_LEASE_SECONDS", 60)
+)
+NOTIFICATION_OUTBOX_MAX_ATTEMPTS = int(os.getenv("NOTIFICATION_OUTBOX_MAX_ATTEMPTS", 5))
+NOTIFICATION_OUTBOX_RETRY_DELAY = int(os.getenv("NOTIFICATION_OUTBOX_RETRY_DELAY", 5))
+# days after which purge_notifications deletes sent and failed entries
+NOTIFICATION_OUTBOX_RETENTION_DAYS = int(
+    os.getenv("NOTIFICATION_OUTBOX_RETENTION_DAYS", 7)
+)
+
 # cloudinary
 cloudinary.config(
     cloud_name=os.getenv("CLOUDINARY_NAME"),
@@ -195,3 +317,23 @@ cloudinary.config(
 )
 CLOUDINARY_AVATAR_USER_FOLDER = os.getenv("CLOUDINARY_AVATAR_USER_FOLDER")
 CLOUDINARY_GALLERY_FOLDER = os.getenv("CLOUDINARY_GALLERY_FOLDER")
+
+# media uploads
+MEDIA_STORAGE = os.getenv("MEDIA_STORAGE", "base.services.storage.CloudinaryStorage")
+MEDIA_UPLOAD_WORKERS = int(os.getenv("MEDIA_UPLOAD_WORKERS", 4))
+MEDIA_CHUNK_SIZE = int(os.getenv("MEDIA_CHUNK_SIZE", 6 * 1024 * 1024))
+MEDIA_ROOT = os.getenv("MEDIA_ROOT", str(BASE_DIR / "media"))
+MEDIA_URL = os.getenv("MEDIA_URL", "/media/")
+IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", 2048))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", 85))
+IMAGE_SPOOL_MAX_MEMORY = int(os.getenv("IMAGE_SPOOL_MAX_MEMORY", 1024 * 1024))
+
+# firebase
+FIREBASE_CREDENTIALS_PATH = os.getenv(
+    "FIREBASE_CREDENTIALS_PATH",
+    str(BASE_DIR / "base" / "services" / "firebase-adminsdk.json"),
+)
+FIREBASE_TRANSPORT = os.getenv("FIREBASE_TRANSPORT", "base.firebase.FCMTransport")
+FIREBASE_SEND_WORKERS = int(os.getenv("FIREBASE_SEND_WORKERS", 4))
+FCM_TOKENS_PER_USER_LIMIT = int(os.getenv("FCM_TOKENS_PER_USER_LIMIT", 10))
+FCM_TOKEN_VALIDATION_TTL = int(os.getenv("FCM_TOKEN_VALIDATION_TTL", 24 * 60 * 60))
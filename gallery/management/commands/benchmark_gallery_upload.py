@@ -0,0 +1,69 @@
+import io
+import tempfile
+import time
+from pathlib import Path
+
+from base.services import storage
+from base.services.cloudinary import CloudinaryService
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks gallery photo uploads against a local filesystem stand-in "
+        "for Cloudinary"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--photos", type=int, default=10)
+        parser.add_argument(
+            "--size", type=int, default=4000, help="Width of the generated photos"
+        )
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=500,
+            help="Simulated upload round trip per photo (ms)",
+        )
+
+    def handle(self, *args, **options):
+        photos = [
+            self.generate_photo(i, options["size"]) for i in range(options["photos"])
+        ]
+        uploaded_bytes = sum(photo.size for photo in photos)
+        with tempfile.TemporaryDirectory() as root:
+            file_storage = storage.FileSystemStorage(
+                root=root, latency=options["latency"] / 1000
+            )
+            storage.set_storage(file_storage)
+            try:
+                started = time.perf_counter()
+                for photo in photos:
+                    CloudinaryService.upload_image(photo, "sequential/")
+                sequential = time.perf_counter() - started
+
+                started = time.perf_counter()
+                CloudinaryService.upload_images(photos, "concurrent/")
+                concurrent = time.perf_counter() - started
+            finally:
+                storage.set_storage(None)
+            stored_bytes = sum(
+                path.stat().st_size for path in Path(root, "concurrent").iterdir()
+            )
+
+        self.stdout.write(
+            "%s photos, %.1f MB uploaded, %.1f MB stored"
+            % (len(photos), uploaded_bytes / 1e6, stored_bytes / 1e6)
+        )
+        self.stdout.write("sequential: %.3fs" % sequential)
+        self.stdout.write("concurrent: %.3fs" % concurrent)
+
+    def generate_photo(self, index, width):
+        image = Image.effect_noise((width, width * 3 // 4), 64).convert("RGB")
+        content = io.BytesIO()
+        image.save(content, format="JPEG", quality=95)
+        return SimpleUploadedFile(
+            "photo-%s.jpg" % index, content.getvalue(), content_type="image/jpeg"
+        )
@@ -1,5 +1,12 @@
 from base import CoreErrorCode
+from django.db import models
 
 
 class NotificationErrorCode(CoreErrorCode):
     pass
+
+
+class PushNotificationStatus(models.TextChoices):
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
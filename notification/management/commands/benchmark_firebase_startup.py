@@ -0,0 +1,58 @@
+import subprocess
+import sys
+import time
+import timeit
+
+from base import firebase
+from django.core.management.base import BaseCommand
+
+IMPORT_SCRIPT = (
+    "import time; started = time.perf_counter(); "
+    "import firebase_admin.messaging; "
+    "print(time.perf_counter() - started)"
+)
+
+
+class Command(BaseCommand):
+    help = "Records Firebase import, initialisation and first push latency"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--token",
+            default="benchmark-token",
+            help="Registration token used for the dry-run pushes",
+        )
+        parser.add_argument(
+            "--local",
+            action="store_true",
+            help="Send through LocalFCMTransport instead of FCM",
+        )
+
+    def _time(self, func, *args, **kwargs):
+        started = time.perf_counter()
+        func(*args, **kwargs)
+        return time.perf_counter() - started
+
+    def handle(self, *args, **options):
+        import_time = float(
+            subprocess.check_output([sys.executable, "-c", IMPORT_SCRIPT]).strip()
+        )
+        self.stdout.write("import firebase_admin.messaging: %.3fs" % import_time)
+
+        if options["local"]:
+            firebase.set_transport(firebase.LocalFCMTransport())
+        try:
+            self.stdout.write(
+                "app initialisation: %.3fs" % self._time(firebase.get_firebase_app)
+            )
+            for attempt in ("first", "second"):
+                elapsed = self._time(
+                    firebase.send_multicast_batched, [options["token"]], dry_run=True
+                )
+                self.stdout.write("%s push: %.3fs" % (attempt, elapsed))
+        finally:
+            if options["local"]:
+                firebase.set_transport(None)
+
+        per_call = timeit.timeit(firebase.get_firebase_app, number=100000) / 100000
+        self.stdout.write("get_firebase_app per call: %.0fns" % (per_call * 1e9))
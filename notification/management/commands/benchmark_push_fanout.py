@@ -0,0 +1,56 @@
+import time
+from types import SimpleNamespace
+
+from base import firebase
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Benchmarks push notification fan-out against a local fake FCM transport"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipients", type=int, default=1000)
+        parser.add_argument("--tokens-per-recipient", type=int, default=3)
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=50,
+            help="Simulated FCM round trip per multicast request (ms)",
+        )
+
+    def handle(self, *args, **options):
+        recipients = [
+            SimpleNamespace(
+                fcm_tokens=[
+                    "token-%s-%s" % (i, j)
+                    for j in range(options["tokens_per_recipient"])
+                ]
+            )
+            for i in range(options["recipients"])
+        ]
+        transport = firebase.LocalFCMTransport(latency=options["latency"] / 1000)
+        firebase.set_transport(transport)
+        try:
+            started = time.perf_counter()
+            for recipient in recipients:
+                firebase.send_notify_multiple_recipient([recipient], "title", "body")
+            per_recipient = time.perf_counter() - started
+            per_recipient_requests = len(transport.sent_messages)
+
+            transport.sent_messages.clear()
+            started = time.perf_counter()
+            success_ids, failure_count = firebase.send_notify_multiple_recipient(
+                recipients, "title", "body"
+            )
+            batched = time.perf_counter() - started
+        finally:
+            firebase.set_transport(None)
+
+        self.stdout.write(
+            "per recipient: %.3fs, %s requests"
+            % (per_recipient, per_recipient_requests)
+        )
+        self.stdout.write(
+            "batched:       %.3fs, %s requests, %s delivered, %s failed"
+            % (batched, len(transport.sent_messages), len(success_ids), failure_count)
+        )
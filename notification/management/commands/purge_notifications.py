@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ...models import ConcatNotification
+from ...services.retention import get_table_size, purge_notifications
+
+
+class Command(BaseCommand):
+    help = (
+        "Archives (or deletes) the notifications past their retention: "
+        "soft-deleted ones, ones older than the TTL of their verb and ones "
+        "beyond the newest NOTIFICATION_MAX_PER_RECIPIENT of each recipient, "
+        "and deletes the push outbox entries sent or failed more than "
+        "NOTIFICATION_OUTBOX_RETENTION_DAYS ago"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.NOTIFICATION_PURGE_BATCH_SIZE,
+            help="Number of notifications removed per transaction",
+        )
+        parser.add_argument(
+            "--max-per-recipient",
+            type=int,
+            default=settings.NOTIFICATION_MAX_PER_RECIPIENT,
+            help="Number of newest notifications kept per recipient",
+        )
+        parser.add_argument(
+            "--delete",
+            action="store_true",
+            help="Delete the notifications instead of archiving them",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0,
+            help="Seconds to wait between batches, to spare the replicas",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Count the notifications to remove without removing them, a "
+            "notification matching several rules is counted once per rule",
+        )
+
+    def handle(self, *args, **options):
+        size_before = get_table_size(ConcatNotification)
+        stats = purge_notifications(
+            batch_size=options["batch_size"],
+            archive=settings.NOTIFICATION_ARCHIVE and not options["delete"],
+            dry_run=options["dry_run"],
+            sleep=options["sleep"],
+            max_per_recipient=options["max_per_recipient"],
+        )
+        for rule, count in sorted(stats.items()):
+            self.stdout.write("%s: %s" % (rule, count))
+        self.stdout.write(
+            "%s %s notifications"
+            % (
+                "Would remove" if options["dry_run"] else "Removed",
+                sum(stats.values()),
+            )
+        )
+        if size_before and not options["dry_run"]:
+            # MySQL refreshes information_schema sizes lazily, and freed pages
+            # are only returned to the OS by OPTIMIZE TABLE
+            size_after = get_table_size(ConcatNotification)
+            for name in ("data", "index"):
+                self.stdout.write(
+                    "Table %s size: %s -> %s bytes"
+                    % (name, size_before[name], size_after[name])
+                )
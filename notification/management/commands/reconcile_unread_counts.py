@@ -0,0 +1,34 @@
+from account.models import BaseUser
+from django.core.management.base import BaseCommand
+
+from ...models import reconcile_unread_counts
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the unread notification counter of every user from their "
+        "notifications"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of users updated per query",
+        )
+
+    def handle(self, *args, **options):
+        queryset = BaseUser.objects.order_by("pk").values_list("pk", flat=True)
+        updated = 0
+        last_id = None
+        while True:
+            batch = queryset
+            if last_id:
+                batch = batch.filter(pk__gt=last_id)
+            user_ids = list(batch[: options["batch_size"]])
+            if not user_ids:
+                break
+            last_id = user_ids[-1]
+            updated += reconcile_unread_counts(user_ids)
+        self.stdout.write("Reconciled unread counters of %s users" % updated)
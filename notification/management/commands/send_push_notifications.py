@@ -0,0 +1,53 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from base import firebase
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from ...tasks import process_push_outbox
+
+
+class Command(BaseCommand):
+    help = "Delivers queued push notifications from the outbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.NOTIFICATION_OUTBOX_BATCH_SIZE,
+            help="Number of outbox entries claimed per batch",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=settings.NOTIFICATION_OUTBOX_WORKERS,
+            help="Number of threads sending notifications concurrently",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=settings.NOTIFICATION_OUTBOX_POLL_INTERVAL,
+            help="Seconds to wait when the outbox is empty",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drain the outbox and exit instead of polling forever",
+        )
+
+    def handle(self, *args, **options):
+        firebase.warm_up()
+        total = 0
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            while True:
+                close_old_connections()
+                processed = process_push_outbox(executor, options["batch_size"])
+                total += processed
+                if processed:
+                    continue
+                if options["once"]:
+                    break
+                time.sleep(options["poll_interval"])
+        self.stdout.write("Processed %s push notifications" % total)
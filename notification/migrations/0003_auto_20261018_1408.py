@@ -0,0 +1,21 @@
+# Generated by Django 3.2.12 on 2026-10-18 14:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notification', '0002_auto_20261018_1400'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='concatnotification',
+            index=models.Index(fields=['recipient', 'created_at', 'id'], name='notificatio_recipie_a3b3fb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='concatnotification',
+            index=models.Index(fields=['recipient', 'deleted', 'unread', 'created_at', 'id'], name='notificatio_recipie_6e2b07_idx'),
+        ),
+    ]
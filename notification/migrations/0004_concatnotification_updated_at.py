@@ -0,0 +1,19 @@
+# Generated by Django 3.2.12 on 2026-10-18 14:24
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notification', '0003_auto_20261018_1408'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='concatnotification',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 3.2.12 on 2026-10-18 14:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('notification', '0004_concatnotification_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedNotification',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('unread', models.BooleanField(default=True)),
+                ('verb', models.CharField(choices=[('booking_placed', 'Booking Placed'), ('booking_confirmed', 'Booking Confirmed'), ('booking_canceled', 'Booking Canceled'), ('booking_requested_to_complete', 'Booking Requested To Complete'), ('booking_completed', 'Booking Completed')], max_length=255)),
+                ('deleted', models.BooleanField(default=False)),
+                ('data', models.JSONField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ('-created_at',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='concatnotification',
+            index=models.Index(fields=['verb', 'created_at'], name='notificatio_verb_b2f8c5_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivednotification',
+            name='recipient',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='archivednotification',
+            index=models.Index(fields=['recipient', 'created_at'], name='notificatio_recipie_6e8df7_idx'),
+        ),
+    ]
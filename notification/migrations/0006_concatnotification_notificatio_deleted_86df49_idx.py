@@ -0,0 +1,17 @@
+# Generated by Django 3.2.12 on 2026-10-18 15:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notification', '0005_auto_20261018_1440'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='concatnotification',
+            index=models.Index(fields=['deleted', 'updated_at'], name='notificatio_deleted_86df49_idx'),
+        ),
+    ]
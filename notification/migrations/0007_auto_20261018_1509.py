@@ -0,0 +1,23 @@
+# Generated by Django 3.2.12 on 2026-10-18 15:09
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notification', '0006_concatnotification_notificatio_deleted_86df49_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pushnotificationoutbox',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='pushnotificationoutbox',
+            index=models.Index(fields=['status', 'updated_at'], name='notificatio_status_db782f_idx'),
+        ),
+    ]
@@ -2,8 +2,48 @@ from account.models import BaseUser
 from base import NotificationVerbs
 from base.models import TimeStampedModel
 from django.conf import settings
-from django.db import models
-from django.db.models import JSONField, QuerySet
+from django.db import models, transaction
+from django.db.models import Count, F, JSONField, OuterRef, Q, QuerySet, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from . import PushNotificationStatus
+
+
+def add_unread_count(user_id, delta):
+    """Moves the unread notification counter of the user in a single UPDATE."""
+    if not delta:
+        return
+    count = F("unread_notification_count")
+    if delta < 0:
+        # Clamped before subtracting: on MySQL the column is unsigned, so a
+        # negative intermediate value fails instead of being clamped after
+        count = Greatest(count, -delta)
+    BaseUser.objects.filter(pk=user_id).update(unread_notification_count=count + delta)
+
+
+def reconcile_unread_counts(user_ids=None):
+    """
+    Recomputes the unread notification counters of the given users (all
+    users by default) from their notifications.
+    :return: Number of users updated.
+    """
+    users = BaseUser.objects.all()
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+    count = (
+        ConcatNotification.objects.unread()
+        .filter(recipient=OuterRef("pk"))
+        .order_by()
+        .values("recipient")
+        .annotate(count=Count("id"))
+        .values("count")
+    )
+    return users.update(
+        unread_notification_count=Coalesce(
+            Subquery(count, output_field=models.IntegerField()), 0
+        )
+    )
 
 
 class ConcatNotificationQueryset(QuerySet):
@@ -34,50 +74,85 @@ class ConcatNotificationQueryset(QuerySet):
         """
         return self.filter(deleted=False, unread=True)
 
+    def _update(self, user, delta, **changes):
+        """
+        Updates the notifications of the user (all users if not supplied) and
+        moves their unread counters by ``delta`` for every row updated.
+
+        Rows are updated by primary key in batches of at most
+        ``NOTIFICATION_BULK_BATCH_SIZE``, one short transaction each, so a
+        large account never holds its row locks for long. Batches are read in
+        the order of the (recipient, deleted, unread, created_at, id) index.
+        Each UPDATE applies the filters again, rows changed concurrently are
+        skipped and not counted.
+        :return: Number of notifications updated.
+        """
+        qs = self
+        if user:
+            qs = qs.filter(recipient=user)
+        batch_size = settings.NOTIFICATION_BULK_BATCH_SIZE
+        total = 0
+        last = None
+        while True:
+            batch = qs.order_by("created_at", "pk")
+            if last:
+                batch = batch.filter(
+                    Q(created_at__gt=last[1]) | Q(pk__gt=last[0]),
+                    created_at__gte=last[1],
+                )
+            rows = list(
+                batch.values_list("pk", "created_at", "recipient_id")[:batch_size]
+            )
+            if not rows:
+                break
+            last = rows[-1]
+            with transaction.atomic():
+                count = qs.filter(pk__in=[row[0] for row in rows]).update(
+                    updated_at=timezone.now(), **changes
+                )
+                if user:
+                    add_unread_count(user.pk, delta * count)
+                elif count and delta:
+                    reconcile_unread_counts({row[2] for row in rows})
+            total += count
+            if len(rows) < batch_size:
+                break
+        return total
+
     def unread_all(self, user=None):
         """
         Marks all notifications as unread for a user (if supplied)
         :param user: Notification recipient.
-        :return: Updates QuerySet as unread.
+        :return: Number of notifications updated.
         """
-        qs = self.read()
-        if user:
-            qs.filter(recipient=user)
-        qs.update(unread=True)
+        return self.read()._update(user, 1, unread=True)
 
     def read_all(self, user=None):
         """
         Marks all notifications as read for a user (if supplied)
         :param user: Notification recipient.
-        :return: Updates QuerySet as read.
+        :return: Number of notifications updated.
         """
-        qs = self.unread()
-        if user:
-            qs.filter(recipient=user)
-        qs.update(unread=False)
+        return self.unread()._update(user, -1, unread=False)
 
     def delete_all(self, user=None):
         """
         Method to soft-delete all notifications of a User (if supplied)
         :param user: Notification recipient.
-        :return: Updates QuerySet as soft-deleted.
+        :return: Number of notifications updated.
         """
-        qs = self.active()
-        if user:
-            qs.filter(recipient=user)
-
-        qs.update(deleted=True)
+        unread = self.unread()._update(user, -1, deleted=True)
+        return unread + self.read()._update(user, 0, deleted=True)
 
     def active_all(self, user=None):
         """
-        Method to soft-delete all notifications of a User (if supplied)
+        Method to restore all soft-deleted notifications of a User (if supplied)
         :param user: Notification recipient.
-        :return: Updates QuerySet as soft-deleted.
+        :return: Number of notifications updated.
         """
-        qs = self.deleted()
-        if user:
-            qs.filter(recipient=user)
-        qs.update(deleted=False)
+        unread = self.deleted().filter(unread=True)._update(user, 1, deleted=False)
+        read = self.deleted().filter(unread=False)._update(user, 0, deleted=False)
+        return unread + read
 
     def deleted(self):
         """
@@ -94,6 +169,7 @@ class ConcatNotification(TimeStampedModel):
         related_name="concat_notifications",
         on_delete=models.CASCADE,
     )
+    updated_at = models.DateTimeField(default=timezone.now)
     unread = models.BooleanField(default=True, blank=False, db_index=True)
     verb = models.CharField(choices=NotificationVerbs.choices, max_length=255)
     deleted = models.BooleanField(default=False, db_index=True)
@@ -102,13 +178,108 @@ class ConcatNotification(TimeStampedModel):
 
     class Meta(object):
         ordering = ("-created_at",)
+        indexes = [
+            models.Index(fields=["recipient", "created_at", "id"]),
+            models.Index(fields=["recipient", "deleted", "unread", "created_at", "id"]),
+            # Serve the retention purge, see notification.services.retention
+            models.Index(fields=["verb", "created_at"]),
+            models.Index(fields=["deleted", "updated_at"]),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Notifications created through bulk_create are not counted, see
+        # reconcile_unread_counts
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding and self.unread and not self.deleted:
+                add_unread_count(self.recipient_id, 1)
+
+    def _update(self, delta, condition, **changes):
+        """
+        Applies the changes if the notification still matches ``condition``
+        in the database, so concurrent requests count a change only once.
+        """
+        changes["updated_at"] = timezone.now()
+        with transaction.atomic():
+            updated = ConcatNotification.objects.filter(pk=self.pk, **condition).update(
+                **changes
+            )
+            if updated:
+                add_unread_count(self.recipient_id, delta)
+                for name, value in changes.items():
+                    setattr(self, name, value)
+        return updated
 
     def mark_as_read(self):
         if self.unread:
-            self.unread = False
-            self.save()
+            self._update(-1, {"unread": True, "deleted": False}, unread=False)
 
     def mark_as_unread(self):
         if not self.unread:
-            self.unread = True
-            self.save()
+            self._update(1, {"unread": False, "deleted": False}, unread=True)
+
+    def soft_delete(self):
+        if not self.deleted:
+            self._update(
+                -1, {"unread": True, "deleted": False}, deleted=True
+            ) or self._update(0, {"deleted": False}, deleted=True)
+
+
+class ArchivedNotification(TimeStampedModel):
+    """
+    Notifications moved out of ``ConcatNotification`` by the retention purge,
+    see ``notification.services.retention``. Keeps the original id.
+    """
+
+    recipient = models.ForeignKey(
+        BaseUser,
+        related_name="+",
+        on_delete=models.CASCADE,
+    )
+    updated_at = models.DateTimeField(default=timezone.now)
+    unread = models.BooleanField(default=True)
+    verb = models.CharField(choices=NotificationVerbs.choices, max_length=255)
+    deleted = models.BooleanField(default=False)
+    data = JSONField(blank=True, null=True)
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ("-created_at",)
+        indexes = [
+            models.Index(fields=["recipient", "created_at"]),
+        ]
+
+
+class PushNotificationOutbox(TimeStampedModel):
+    """
+    Push notifications waiting to be delivered by the outbox worker. Rows are
+    written in the same transaction as the change that triggers them.
+    """
+
+    recipient = models.ForeignKey(
+        BaseUser,
+        related_name="+",
+        on_delete=models.CASCADE,
+    )
+    title = models.CharField(max_length=255, blank=True)
+    body = models.TextField(blank=True)
+    data = JSONField(blank=True, null=True)
+    status = models.CharField(
+        max_length=32,
+        choices=PushNotificationStatus.choices,
+        default=PushNotificationStatus.PENDING,
+    )
+    updated_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True, null=True)
+
+    class Meta:
+        ordering = ("created_at",)
+        indexes = [
+            models.Index(fields=["status", "available_at"]),
+            # Serves the purge of sent and failed entries
+            models.Index(fields=["status", "updated_at"]),
+        ]
@@ -0,0 +1,236 @@
+import logging
+import time
+from collections import Counter
+from datetime import timedelta
+from functools import partial
+
+from base import NotificationVerbs
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .. import PushNotificationStatus
+from ..models import (
+    ArchivedNotification,
+    ConcatNotification,
+    PushNotificationOutbox,
+    add_unread_count,
+)
+
+logger = logging.getLogger(__name__)
+
+ARCHIVED_FIELDS = (
+    "id",
+    "created_at",
+    "updated_at",
+    "recipient_id",
+    "unread",
+    "verb",
+    "deleted",
+    "data",
+)
+
+
+def get_retention_days(verb):
+    return settings.NOTIFICATION_VERB_RETENTION_DAYS.get(
+        verb, settings.NOTIFICATION_RETENTION_DAYS
+    )
+
+
+def get_expired_rules(now=None):
+    """
+    Returns ``(rule, queryset)`` pairs of the notifications past their
+    retention: soft-deleted ones after NOTIFICATION_DELETED_RETENTION_DAYS,
+    the others after the TTL of their verb.
+    """
+    now = now or timezone.now()
+    rules = [
+        (
+            "deleted",
+            ConcatNotification.objects.filter(
+                deleted=True,
+                updated_at__lt=now
+                - timedelta(days=settings.NOTIFICATION_DELETED_RETENTION_DAYS),
+            ),
+        )
+    ]
+    for verb in NotificationVerbs.values:
+        rules.append(
+            (
+                "verb:%s" % verb,
+                ConcatNotification.objects.filter(
+                    verb=verb,
+                    created_at__lt=now - timedelta(days=get_retention_days(verb)),
+                ),
+            )
+        )
+    return rules
+
+
+def get_overflow_rules(max_per_recipient=None):
+    """
+    Returns ``(rule, queryset)`` pairs of the notifications beyond the
+    ``max_per_recipient`` newest of each recipient.
+    """
+    max_per_recipient = max_per_recipient or settings.NOTIFICATION_MAX_PER_RECIPIENT
+    recipients = (
+        ConcatNotification.objects.order_by()
+        .values("recipient")
+        .annotate(count=Count("id"))
+        .filter(count__gt=max_per_recipient)
+        .values_list("recipient", flat=True)
+    )
+    for recipient_id in list(recipients):
+        notifications = ConcatNotification.objects.filter(recipient_id=recipient_id)
+        # The newest notification past the cap, walked on the
+        # (recipient, created_at, id) index
+        cutoff = (
+            notifications.order_by("-created_at", "-id")
+            .values("created_at", "id")[max_per_recipient : max_per_recipient + 1]
+            .first()
+        )
+        if cutoff:
+            yield "max_per_recipient", notifications.filter(
+                Q(created_at__lt=cutoff["created_at"])
+                | Q(created_at=cutoff["created_at"], id__lte=cutoff["id"])
+            )
+
+
+def get_outbox_rules(now=None):
+    """
+    Returns ``(rule, queryset)`` pairs of the push outbox entries sent or
+    given up on more than NOTIFICATION_OUTBOX_RETENTION_DAYS ago.
+    """
+    now = now or timezone.now()
+    return [
+        (
+            "push_outbox",
+            PushNotificationOutbox.objects.filter(
+                status__in=[PushNotificationStatus.SENT, PushNotificationStatus.FAILED],
+                updated_at__lt=now
+                - timedelta(days=settings.NOTIFICATION_OUTBOX_RETENTION_DAYS),
+            ),
+        )
+    ]
+
+
+def delete_batch(queryset, batch_size):
+    """
+    Deletes up to ``batch_size`` rows of the queryset.
+    :return: Number of rows deleted.
+    """
+    ids = list(queryset.order_by().values_list("pk", flat=True)[:batch_size])
+    if ids:
+        queryset.model.objects.filter(pk__in=ids).delete()
+    return len(ids)
+
+
+def purge_batch(queryset, batch_size, archive=True):
+    """
+    Removes up to ``batch_size`` notifications of the queryset in one
+    transaction, copying them to ``ArchivedNotification`` first when
+    ``archive`` is set, and moves the unread counters of their recipients.
+    :return: Number of notifications removed.
+    """
+    with transaction.atomic():
+        rows = list(
+            queryset.order_by()
+            .select_for_update()
+            .values(*ARCHIVED_FIELDS)[:batch_size]
+        )
+        if not rows:
+            return 0
+        if archive:
+            archived_at = timezone.now()
+            ArchivedNotification.objects.bulk_create(
+                [ArchivedNotification(archived_at=archived_at, **row) for row in rows],
+                ignore_conflicts=True,
+            )
+        ConcatNotification.objects.filter(pk__in=[row["id"] for row in rows]).delete()
+        unread = Counter(
+            row["recipient_id"] for row in rows if row["unread"] and not row["deleted"]
+        )
+        for recipient_id, count in unread.items():
+            add_unread_count(recipient_id, -count)
+    return len(rows)
+
+
+def purge_notifications(
+    batch_size=None, archive=None, dry_run=False, sleep=0, max_per_recipient=None
+):
+    """
+    Enforces the retention policy of the notifications and of the push
+    outbox in batches of ``batch_size`` rows, each in its own short
+    transaction so the tables are never locked for long.
+    :return: Number of rows removed (or to remove on a dry run) per rule.
+    """
+    batch_size = batch_size or settings.NOTIFICATION_PURGE_BATCH_SIZE
+    if archive is None:
+        archive = settings.NOTIFICATION_ARCHIVE
+    stats = Counter()
+    purge = partial(purge_batch, batch_size=batch_size, archive=archive)
+    delete = partial(delete_batch, batch_size=batch_size)
+    rules = [
+        (get_expired_rules(), purge),
+        (get_overflow_rules(max_per_recipient), purge),
+        (get_outbox_rules(), delete),
+    ]
+    for querysets, remove_batch in rules:
+        for rule, queryset in querysets:
+            if dry_run:
+                stats[rule] += queryset.count()
+                continue
+            while True:
+                removed = remove_batch(queryset)
+                stats[rule] += removed
+                if removed < batch_size:
+                    break
+                if sleep:
+                    time.sleep(sleep)
+    stats = {rule: count for rule, count in stats.items() if count}
+    logger.info(
+        "Purged %s notifications",
+        sum(stats.values()),
+        extra={"notification_purge": {"rules": stats, "archive": archive}},
+    )
+    return stats
+
+
+def get_table_size(model):
+    """
+    Returns the ``data`` and ``index`` sizes of the model's table in bytes,
+    or None when the database does not report them.
+    """
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "mysql":
+            cursor.execute(
+                "SELECT data_length, index_length FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name = %s",
+                [table],
+            )
+        elif connection.vendor == "postgresql":
+            cursor.execute(
+                "SELECT pg_relation_size(%s), pg_indexes_size(%s)", [table, table]
+            )
+        elif connection.vendor == "sqlite":
+            try:
+                cursor.execute(
+                    "SELECT "
+                    "SUM(CASE WHEN name = %s THEN pgsize ELSE 0 END), "
+                    "SUM(CASE WHEN name != %s THEN pgsize ELSE 0 END) "
+                    "FROM dbstat WHERE name = %s OR name IN "
+                    "(SELECT name FROM sqlite_master "
+                    "WHERE type = 'index' AND tbl_name = %s)",
+                    [table, table, table, table],
+                )
+            except Exception:
+                # SQLite built without the dbstat virtual table
+                return None
+        else:
+            return None
+        row = cursor.fetchone()
+    if not row or row[0] is None:
+        return None
+    return {"data": int(row[0]), "index": int(row[1] or 0)}
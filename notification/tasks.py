@@ -1,6 +1,17 @@
+import datetime
+import logging
+
+from account.models import BaseUser
 from base import firebase
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import PushNotificationStatus
+from .models import ConcatNotification, PushNotificationOutbox
 
-from .models import ConcatNotification
+logger = logging.getLogger(__name__)
 
 
 def send_notification_in_app(recipient, data_message):
@@ -8,6 +19,19 @@ def send_notification_in_app(recipient, data_message):
     ConcatNotification.objects.create(recipient=recipient, verb=verb, data=data_message)
 
 
+def enqueue_push_notification(recipient, message_title, message_body, data_message):
+    """
+    Queues a push notification in the outbox. It is sent by the
+    ``send_push_notifications`` worker once the current transaction commits.
+    """
+    return PushNotificationOutbox.objects.create(
+        recipient=recipient,
+        title=message_title,
+        body=message_body,
+        data=data_message,
+    )
+
+
 def send_notify_single_recipient(recipient, data_message, in_app=True, send_push=True):
     verb = data_message.get("verb")
     if in_app:
@@ -15,9 +39,92 @@ def send_notify_single_recipient(recipient, data_message, in_app=True, send_push
     if send_push:
         title = data_message.get("message_title", "")
         body = data_message.get("message_body", "")
-        firebase.send_notify_multiple_recipient(
-            recipients=[recipient],
+        enqueue_push_notification(
+            recipient=recipient,
             message_title=title,
             message_body=body,
             data_message=data_message,
         )
+
+
+def claim_push_outbox_batch(batch_size):
+    """
+    Leases up to ``batch_size`` due outbox entries. Leased entries become due
+    again after ``NOTIFICATION_OUTBOX_LEASE_SECONDS``, so entries held by a
+    worker that dies are retried by the next one.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        entries = list(
+            PushNotificationOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status=PushNotificationStatus.PENDING, available_at__lte=now)
+            .order_by("available_at")[:batch_size]
+        )
+        if entries:
+            lease = datetime.timedelta(
+                seconds=settings.NOTIFICATION_OUTBOX_LEASE_SECONDS
+            )
+            PushNotificationOutbox.objects.filter(
+                id__in=[entry.id for entry in entries]
+            ).update(
+                attempts=F("attempts") + 1, available_at=now + lease, updated_at=now
+            )
+    for entry in entries:
+        entry.attempts += 1
+    return entries
+
+
+def _deliver_push_notification(entry, recipient):
+    firebase.send_notify_multiple_recipient(
+        recipients=[recipient],
+        message_title=entry.title,
+        message_body=entry.body,
+        data_message=entry.data,
+    )
+
+
+def _mark_failed(entry, error):
+    now = timezone.now()
+    update = {"last_error": str(error), "updated_at": now}
+    if entry.attempts >= settings.NOTIFICATION_OUTBOX_MAX_ATTEMPTS:
+        update["status"] = PushNotificationStatus.FAILED
+    else:
+        backoff = settings.NOTIFICATION_OUTBOX_RETRY_DELAY * 2 ** (entry.attempts - 1)
+        update["available_at"] = now + datetime.timedelta(seconds=backoff)
+    PushNotificationOutbox.objects.filter(id=entry.id).update(**update)
+
+
+def process_push_outbox(executor, batch_size=None):
+    """
+    Sends one batch of queued push notifications through ``executor``.
+    :return: Number of outbox entries processed.
+    """
+    entries = claim_push_outbox_batch(
+        batch_size or settings.NOTIFICATION_OUTBOX_BATCH_SIZE
+    )
+    if not entries:
+        return 0
+    recipients = BaseUser.objects.prefetch_related("device_tokens").in_bulk(
+        {entry.recipient_id for entry in entries}
+    )
+    futures = {}
+    for entry in entries:
+        recipient = recipients.get(entry.recipient_id)
+        if recipient:
+            futures[entry] = executor.submit(
+                _deliver_push_notification, entry, recipient
+            )
+
+    sent_ids = [entry.id for entry in entries if entry not in futures]
+    for entry, future in futures.items():
+        try:
+            future.result()
+            sent_ids.append(entry.id)
+        except Exception as e:
+            logger.warning("Push notification %s failed: %s", entry.id, e)
+            _mark_failed(entry, e)
+    now = timezone.now()
+    PushNotificationOutbox.objects.filter(id__in=sent_ids).update(
+        status=PushNotificationStatus.SENT, sent_at=now, updated_at=now
+    )
+    return len(entries)
@@ -1,3 +1,358 @@
-from django.test import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 
-# Create your tests here.
+from account.models import BaseUser, DeviceToken, User
+from base import firebase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import PushNotificationStatus
+from .models import (
+    ArchivedNotification,
+    ConcatNotification,
+    PushNotificationOutbox,
+    add_unread_count,
+    reconcile_unread_counts,
+)
+from .services.retention import purge_notifications
+from .tasks import (
+    claim_push_outbox_batch,
+    enqueue_push_notification,
+    process_push_outbox,
+)
+
+
+class UnreadCountTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="customer", email="customer@l")
+
+    def get_count(self):
+        return BaseUser.objects.get(pk=self.user.pk).unread_notification_count
+
+    def test_add_unread_count(self):
+        add_unread_count(self.user.pk, 3)
+        self.assertEqual(self.get_count(), 3)
+        add_unread_count(self.user.pk, -2)
+        self.assertEqual(self.get_count(), 1)
+
+    def test_decrement_below_zero_is_clamped(self):
+        add_unread_count(self.user.pk, -1)
+        self.assertEqual(self.get_count(), 0)
+        add_unread_count(self.user.pk, 1)
+        add_unread_count(self.user.pk, -5)
+        self.assertEqual(self.get_count(), 0)
+
+    def test_mark_as_read_with_drifted_counter(self):
+        notification = ConcatNotification.objects.create(
+            recipient=self.user, verb="booking_placed"
+        )
+        BaseUser.objects.filter(pk=self.user.pk).update(unread_notification_count=0)
+        notification.mark_as_read()
+        self.assertFalse(ConcatNotification.objects.get(pk=notification.pk).unread)
+        self.assertEqual(self.get_count(), 0)
+
+
+@override_settings(NOTIFICATION_BULK_BATCH_SIZE=3)
+class BulkUpdateTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="customer", email="customer@l")
+        self.other = User.objects.create(username="other", email="other@l")
+        created_at = timezone.now()
+        # Rows sharing a created_at exercise the keyset tie breaker
+        for i in range(8):
+            ConcatNotification.objects.create(
+                recipient=self.user,
+                verb="booking_placed",
+                unread=i % 4 != 0,
+                created_at=created_at if i % 2 else created_at - timedelta(minutes=i),
+            )
+        for i in range(5):
+            ConcatNotification.objects.create(
+                recipient=self.other, verb="booking_placed"
+            )
+
+    def get_count(self, user):
+        return BaseUser.objects.get(pk=user.pk).unread_notification_count
+
+    def assertCountsConsistent(self):
+        counts = [self.get_count(self.user), self.get_count(self.other)]
+        reconcile_unread_counts()
+        self.assertEqual(
+            counts, [self.get_count(self.user), self.get_count(self.other)]
+        )
+
+    def count_updates(self, context):
+        return sum(
+            query["sql"].startswith('UPDATE "notification_concatnotification"')
+            for query in context.captured_queries
+        )
+
+    def test_read_all(self):
+        self.assertEqual(self.get_count(self.user), 6)
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(ConcatNotification.objects.read_all(self.user), 6)
+        self.assertEqual(self.count_updates(context), 2)
+        self.assertFalse(
+            ConcatNotification.objects.filter(recipient=self.user, unread=True).exists()
+        )
+        self.assertEqual(
+            ConcatNotification.objects.filter(
+                recipient=self.other, unread=True
+            ).count(),
+            5,
+        )
+        self.assertEqual(self.get_count(self.user), 0)
+        self.assertEqual(self.get_count(self.other), 5)
+        self.assertCountsConsistent()
+
+    def test_delete_all(self):
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(ConcatNotification.objects.delete_all(self.user), 8)
+        # Unread and read rows are updated in separate passes
+        self.assertEqual(self.count_updates(context), 3)
+        self.assertFalse(
+            ConcatNotification.objects.filter(recipient=self.user).active().exists()
+        )
+        self.assertEqual(
+            ConcatNotification.objects.filter(recipient=self.other).active().count(), 5
+        )
+        self.assertEqual(self.get_count(self.user), 0)
+        self.assertEqual(self.get_count(self.other), 5)
+        self.assertCountsConsistent()
+
+        self.assertEqual(ConcatNotification.objects.active_all(self.user), 8)
+        self.assertEqual(self.get_count(self.user), 6)
+        self.assertCountsConsistent()
+
+    def test_read_all_users(self):
+        self.assertEqual(ConcatNotification.objects.read_all(), 11)
+        self.assertEqual(self.get_count(self.user), 0)
+        self.assertEqual(self.get_count(self.other), 0)
+        self.assertCountsConsistent()
+
+
+@override_settings(
+    NOTIFICATION_RETENTION_DAYS=30,
+    NOTIFICATION_VERB_RETENTION_DAYS={"booking_placed": 10},
+    NOTIFICATION_DELETED_RETENTION_DAYS=7,
+    NOTIFICATION_MAX_PER_RECIPIENT=4,
+    NOTIFICATION_PURGE_BATCH_SIZE=2,
+)
+class RetentionTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="customer", email="customer@l")
+        self.other = User.objects.create(username="other", email="other@l")
+        self.now = timezone.now()
+
+    def create(self, days, verb="booking_placed", recipient=None, **fields):
+        return ConcatNotification.objects.create(
+            recipient=recipient or self.user,
+            verb=verb,
+            created_at=self.now - timedelta(days=days),
+            **fields,
+        )
+
+    def get_count(self, user):
+        return BaseUser.objects.get(pk=user.pk).unread_notification_count
+
+    def assertPurged(self, purged, kept):
+        remaining = set(ConcatNotification.objects.values_list("pk", flat=True))
+        self.assertEqual(remaining & {n.pk for n in purged}, set())
+        self.assertEqual(remaining, {n.pk for n in kept})
+
+    def test_verb_ttl(self):
+        purged = [self.create(11), self.create(31, verb="booking_completed")]
+        kept = [self.create(9), self.create(29, verb="booking_completed")]
+        self.assertEqual(
+            purge_notifications(),
+            {"verb:booking_placed": 1, "verb:booking_completed": 1},
+        )
+        self.assertPurged(purged, kept)
+
+    def test_soft_deleted(self):
+        purged = self.create(1, deleted=True, updated_at=self.now - timedelta(days=8))
+        # Deleted recently, kept for a restore
+        kept = [
+            self.create(
+                20,
+                verb="booking_completed",
+                deleted=True,
+                updated_at=self.now - timedelta(days=6),
+            ),
+            self.create(1, updated_at=self.now - timedelta(days=8)),
+        ]
+        self.assertEqual(purge_notifications(), {"deleted": 1})
+        self.assertPurged([purged], kept)
+
+    def test_max_per_recipient(self):
+        # The two oldest, one sharing its created_at with a kept row
+        notifications = [self.create(2, unread=False) for _ in range(2)]
+        notifications += [self.create(1) for _ in range(4)]
+        ConcatNotification.objects.filter(pk=notifications[1].pk).update(
+            created_at=notifications[2].created_at
+        )
+        others = [self.create(3, recipient=self.other) for _ in range(4)]
+        ordered = sorted(
+            ConcatNotification.objects.filter(recipient=self.user),
+            key=lambda n: (n.created_at, n.pk),
+        )
+        self.assertEqual(purge_notifications(), {"max_per_recipient": 2})
+        self.assertPurged(ordered[:2], ordered[2:] + others)
+
+    def test_archive(self):
+        purged = [self.create(11), self.create(12, unread=False)]
+        purge_notifications(archive=True)
+        archived = ArchivedNotification.objects.order_by("created_at")
+        self.assertEqual(
+            list(archived.values_list("pk", "recipient", "verb", "unread")),
+            [
+                (purged[1].pk, self.user.pk, "booking_placed", False),
+                (purged[0].pk, self.user.pk, "booking_placed", True),
+            ],
+        )
+        self.assertFalse(ConcatNotification.objects.exists())
+
+    def test_delete(self):
+        self.create(11)
+        self.assertEqual(purge_notifications(archive=False), {"verb:booking_placed": 1})
+        self.assertFalse(ConcatNotification.objects.exists())
+        self.assertFalse(ArchivedNotification.objects.exists())
+
+    def test_dry_run(self):
+        kept = [self.create(11)]
+        self.assertEqual(purge_notifications(dry_run=True), {"verb:booking_placed": 1})
+        self.assertPurged([], kept)
+
+    def test_unread_counts(self):
+        # Expired: 3 unread across the batches, 1 read and 1 unread but
+        # soft-deleted which was not counted
+        for _ in range(3):
+            self.create(11)
+        self.create(11, unread=False)
+        self.create(1, deleted=True, updated_at=self.now - timedelta(days=8))
+        self.create(1)
+        self.create(31, verb="booking_completed", recipient=self.other)
+        self.create(1, recipient=self.other)
+        self.assertEqual(self.get_count(self.user), 4)
+
+        purge_notifications()
+        counts = [self.get_count(self.user), self.get_count(self.other)]
+        self.assertEqual(counts, [1, 1])
+        reconcile_unread_counts()
+        self.assertEqual(
+            counts, [self.get_count(self.user), self.get_count(self.other)]
+        )
+
+
+@override_settings(
+    NOTIFICATION_OUTBOX_LEASE_SECONDS=60,
+    NOTIFICATION_OUTBOX_MAX_ATTEMPTS=2,
+    NOTIFICATION_OUTBOX_RETRY_DELAY=5,
+    NOTIFICATION_OUTBOX_RETENTION_DAYS=7,
+)
+class PushOutboxTestCase(TestCase):
+    def setUp(self):
+        self.transport = firebase.LocalFCMTransport(
+            invalid_tokens=["unregistered"], unavailable_tokens=["unavailable"]
+        )
+        firebase.set_transport(self.transport)
+        self.addCleanup(firebase.set_transport, None)
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(self.executor.shutdown)
+
+    def enqueue(self, token):
+        user = User.objects.create(username=token, email="%s@l" % token)
+        DeviceToken.objects.register(user, token)
+        return enqueue_push_notification(
+            user, "Booking placed", "A booking was placed", {"verb": "booking_placed"}
+        )
+
+    def get(self, entry):
+        return PushNotificationOutbox.objects.get(pk=entry.pk)
+
+    def make_due(self, entry):
+        PushNotificationOutbox.objects.filter(pk=entry.pk).update(
+            available_at=timezone.now()
+        )
+
+    def test_worker_pass(self):
+        sent = self.enqueue("valid")
+        # Answered by FCM, retrying would not help
+        unregistered = self.enqueue("unregistered")
+        unavailable = self.enqueue("unavailable")
+        started_at = timezone.now()
+        with self.assertLogs(level="WARNING"):
+            self.assertEqual(process_push_outbox(self.executor), 3)
+
+        for entry in (sent, unregistered):
+            entry = self.get(entry)
+            self.assertEqual(entry.status, PushNotificationStatus.SENT)
+            self.assertGreaterEqual(entry.sent_at, started_at)
+        self.assertEqual(
+            sorted(message.tokens[0] for message in self.transport.sent_messages),
+            ["unregistered", "valid"],
+        )
+
+        # Retried after NOTIFICATION_OUTBOX_RETRY_DELAY
+        unavailable = self.get(unavailable)
+        self.assertEqual(unavailable.status, PushNotificationStatus.PENDING)
+        self.assertEqual(unavailable.attempts, 1)
+        self.assertIn("unavailable", unavailable.last_error)
+        self.assertGreater(unavailable.available_at, started_at + timedelta(seconds=4))
+        self.assertLessEqual(
+            unavailable.available_at, timezone.now() + timedelta(seconds=5)
+        )
+        self.assertEqual(process_push_outbox(self.executor), 0)
+
+    def test_give_up(self):
+        entry = self.enqueue("unavailable")
+        with self.assertLogs(level="WARNING"):
+            process_push_outbox(self.executor)
+            self.make_due(entry)
+            self.assertEqual(process_push_outbox(self.executor), 1)
+        entry = self.get(entry)
+        self.assertEqual(entry.status, PushNotificationStatus.FAILED)
+        self.assertEqual(entry.attempts, 2)
+        self.assertIsNone(entry.sent_at)
+
+        self.make_due(entry)
+        self.assertEqual(process_push_outbox(self.executor), 0)
+
+    def test_lease(self):
+        entry = self.enqueue("valid")
+        self.assertEqual(claim_push_outbox_batch(10), [entry])
+        # Leased to the first worker until NOTIFICATION_OUTBOX_LEASE_SECONDS
+        self.assertEqual(claim_push_outbox_batch(10), [])
+        self.assertGreater(
+            self.get(entry).available_at, timezone.now() + timedelta(seconds=55)
+        )
+
+        # Taken over once the lease of a dead worker expired
+        self.make_due(entry)
+        entries = claim_push_outbox_batch(10)
+        self.assertEqual(entries, [entry])
+        self.assertEqual(entries[0].attempts, 2)
+        self.assertEqual(self.get(entry).attempts, 2)
+
+    def test_purge(self):
+        entries = {
+            name: self.enqueue(name)
+            for name in ("sent", "failed", "recently_sent", "pending")
+        }
+        old = timezone.now() - timedelta(days=8)
+        for name, status, updated_at in [
+            ("sent", PushNotificationStatus.SENT, old),
+            ("failed", PushNotificationStatus.FAILED, old),
+            ("recently_sent", PushNotificationStatus.SENT, timezone.now()),
+            ("pending", PushNotificationStatus.PENDING, old),
+        ]:
+            PushNotificationOutbox.objects.filter(pk=entries[name].pk).update(
+                status=status, updated_at=updated_at
+            )
+        self.assertEqual(purge_notifications(), {"push_outbox": 2})
+        self.assertEqual(
+            set(PushNotificationOutbox.objects.values_list("pk", flat=True)),
+            {entries["recently_sent"].pk, entries["pending"].pk},
+        )
@@ -12,6 +12,11 @@ class NotificationViewSet(BaseViewSet):
     permission_classes = [IsAuthenticated]
     queryset = models.ConcatNotification.objects.active()
     serializer_class = NotificationSerializer
+    conditional_get_actions = ("list", "retrieve")
+    query_budget_map = {
+        "list": 5,
+        "unread_count": 2,
+    }
 
     def list(self, request, *args, **kwargs):
         try:
@@ -59,8 +64,7 @@ class NotificationViewSet(BaseViewSet):
                     },
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-            noti.deleted = True
-            noti.save(update_fields=("deleted",))
+            noti.soft_delete()
             return Response(
                 {
                     "detail": "Notification was removed",
@@ -76,6 +80,19 @@ class NotificationViewSet(BaseViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+    @action(detail=False, methods=["get"], url_path="unreadCount")
+    def unread_count(self, request, *args, **kwargs):
+        """
+        Returns the number of unread notifications of the requester, read
+        from the counter on the user row loaded by authentication.
+        """
+        return Response(
+            {
+                "detail": "Number of unread notifications",
+                "data": {"unread_count": request.user.unread_notification_count},
+            }
+        )
+
     @action(detail=False, methods=["delete"], url_path="deleteAll")
     def deleteAll(self, request, *args, **kwargs):
         try:
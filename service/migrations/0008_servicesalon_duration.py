@@ -0,0 +1,18 @@
+# Generated by Django 3.2.12 on 2026-10-18 13:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0007_alter_service_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servicesalon',
+            name='duration',
+            field=models.PositiveIntegerField(default=30, help_text='Thời lượng dịch vụ (phút)'),
+        ),
+    ]
@@ -6,6 +6,8 @@ from django.db import models
 from base.models import MoneyField
 from django.conf import settings
 
+DEFAULT_SERVICE_DURATION = 30
+
 
 class Service(TimeStampedModel):
     name = models.CharField(max_length=255, unique=True)
@@ -27,3 +29,6 @@ class ServiceSalon(models.Model):
         default=settings.DEFAULT_CURRENCY,
     )
     price = MoneyField(amount_field="price_amount", currency_field="currency")
+    duration = models.PositiveIntegerField(
+        default=DEFAULT_SERVICE_DURATION, help_text="Thời lượng dịch vụ (phút)"
+    )
@@ -1,4 +1,4 @@
-from base.serializers import MoneyField
+from base.serializers import EagerLoadingMixin, MoneyField
 from service import models
 from rest_framework import serializers
 
@@ -30,6 +30,7 @@ class ServiceSalonInputSerializer(serializers.ModelSerializer):
             "salon",
             "service",
             "price",
+            "duration",
         ]
 
     # def __init__(self, *args, **kwargs):
@@ -38,7 +39,9 @@ class ServiceSalonInputSerializer(serializers.ModelSerializer):
     #         many=many, *args, **kwargs)
 
 
-class ServiceSalonSerializer(serializers.ModelSerializer):
+class ServiceSalonSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ["service"]
+
     price = MoneyField()
 
     class Meta:
@@ -47,5 +50,6 @@ class ServiceSalonSerializer(serializers.ModelSerializer):
             "id",
             "service",
             "price",
+            "duration",
         ]
         depth = 1
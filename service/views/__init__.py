@@ -54,6 +54,7 @@ class ServiceViewSet(BaseViewSet):
                     salon_id=account.id,
                     price_amount=price.get("amount"),
                     currency=price.get("currency"),
+                    duration=data.get("duration", models.DEFAULT_SERVICE_DURATION),
                 )
                 service_salon = ServiceSalonInputSerializer(service_salon_object)
                 return Response(
@@ -158,6 +159,9 @@ class ServiceSalonViewSet(BaseViewSet):
                     salon_id=account.id,
                     price_amount=price.get("amount"),
                     currency=price.get("currency"),
+                    duration=service_infor.get(
+                        "duration", models.DEFAULT_SERVICE_DURATION
+                    ),
                 )
             return Response(
                 {